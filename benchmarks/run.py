@@ -0,0 +1,543 @@
+#!/usr/bin/env python3
+"""Benchmark zip2addr on a synthetic DB and print the results as JSON.
+
+A KEN_ALL-shaped CSV is generated locally (see synthetic.py) and built with
+scripts/generate_db.py. Every measurement then runs in a fresh interpreter
+(this script re-invoked with --phase) so cold starts are real and peak RSS is
+per phase:
+
+    build       generate_db rows/sec, DB and snapshot sizes
+    cold        import + first lookup, per backend and for module lookup()
+    latency     per-call p50/p99 of uncached and cached lookups per backend
+    throughput  Zip2AddrService lookups/sec on 1 and --threads threads, and
+                lookup_many() and lookup_columns() codes/sec
+    async       AsyncZip2AddrService lookups/sec with asyncio.gather() over
+                batches of 1000 coroutines on --threads worker threads
+    match       AddressMatcher.candidates() queries/sec and whether it
+                reaches the 5k queries/sec target, and per backend
+                Zip2AddrService.match() queries/sec for 1 and 10 results and
+                top-1 accuracy on addresses with typos
+    memory      bytes per record of each backend's data (the memory
+                backend's objects, the DB or snapshot file) and of the RSS
+                growth from loading it and looking up every code
+    cli         `zip2addr <code>` process wall time and --batch lines/sec
+    server      `zip2addr serve` keep-alive GET latency and req/sec, and
+                POST /lookup codes/sec, per backend
+
+The library is imported from this checkout's src/, so checking out another
+version and re-running gives comparable numbers.
+
+Usage: python benchmarks/run.py [--rows N] [--out results.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+SRC = os.path.join(ROOT, "src")
+BACKENDS = ("sqlite", "memory", "snapshot")
+# Share of lookup codes that have no rows
+MISS_RATE = 0.1
+# Coroutines gathered at once by the async phase
+ASYNC_CONCURRENCY = 1000
+# Addresses matched by the match phase, the share of them given a typo or
+# without the prefecture, and the queries/sec AddressMatcher.candidates()
+# must reach on one core
+MATCH_QUERIES = 2000
+MATCH_TYPO_RATE = 0.3
+MATCH_NO_PREF_RATE = 0.3
+MATCH_TARGET_PER_SEC = 5000
+
+
+def _peak_rss() -> int:
+    """Peak resident set size of this process in bytes (0 if unknown)."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return 0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def _rss() -> int:
+    """Current resident set size in bytes (the peak without /proc)."""
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return _peak_rss()
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    samples = sorted(samples)
+    n = len(samples)
+    return {
+        "p50": samples[n // 2],
+        "p99": samples[min(n - 1, n * 99 // 100)],
+        "mean": statistics.fmean(samples),
+    }
+
+
+def _read_codes(path: str) -> List[str]:
+    with open(path, encoding="utf-8") as fh:
+        return fh.read().split()
+
+
+# -- phases, each run in its own interpreter ---------------------------------
+
+
+def phase_build(args) -> Dict[str, Any]:
+    sys.path.insert(0, os.path.join(ROOT, "scripts"))
+    import generate_db
+
+    from zip2addr.snapshot import snapshot_path, write_snapshot
+
+    start = time.perf_counter()
+    rows = generate_db.create_db(args.csv, args.db)
+    seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    write_snapshot(args.db)
+    snapshot_seconds = time.perf_counter() - start
+    return {
+        "rows": rows,
+        "seconds": seconds,
+        "rows_per_sec": rows / seconds,
+        "db_bytes": os.path.getsize(args.db),
+        "snapshot_seconds": snapshot_seconds,
+        "snapshot_bytes": os.path.getsize(snapshot_path(args.db)),
+        "peak_rss_bytes": _peak_rss(),
+    }
+
+
+def phase_cold(args) -> Dict[str, Any]:
+    code = _read_codes(args.codes)[0]
+    start = time.perf_counter()
+    from zip2addr.api import Zip2AddrService, lookup
+
+    imported = time.perf_counter()
+    if args.backend == "module":
+        lookup(code, db_path=args.db)
+    else:
+        Zip2AddrService(args.db, backend=args.backend).lookup(code)
+    done = time.perf_counter()
+    return {
+        "import_ms": (imported - start) * 1e3,
+        "first_lookup_ms": (done - imported) * 1e3,
+    }
+
+
+def _time_calls(fn, codes: List[str]) -> List[float]:
+    clock = time.perf_counter_ns
+    samples = []
+    for code in codes:
+        t = clock()
+        fn(code)
+        samples.append((clock() - t) / 1e3)
+    return samples
+
+
+def phase_latency(args) -> Dict[str, Any]:
+    from zip2addr.api import Zip2AddrService, lookup
+
+    codes = _read_codes(args.codes)
+    if args.backend == "module":
+        # Connects per call, so a subset is enough for stable percentiles
+        samples = _time_calls(lambda c: lookup(c, db_path=args.db), codes[:2000])
+        return {"uncached_us": _percentiles(samples), "peak_rss_bytes": _peak_rss()}
+    result: Dict[str, Any] = {}
+    with Zip2AddrService(args.db, backend=args.backend, cache_size=0) as service:
+        service.lookup(codes[0])  # load the backend outside the timings
+        result["uncached_us"] = _percentiles(_time_calls(service.lookup, codes))
+    with Zip2AddrService(
+        args.db, backend=args.backend, cache_size=len(codes)
+    ) as service:
+        for code in codes:
+            service.lookup(code)
+        result["cached_us"] = _percentiles(_time_calls(service.lookup, codes))
+    result["peak_rss_bytes"] = _peak_rss()
+    return result
+
+
+def phase_throughput(args) -> Dict[str, Any]:
+    from zip2addr.api import Zip2AddrService
+
+    codes = _read_codes(args.codes)
+    result: Dict[str, Any] = {}
+    with Zip2AddrService(
+        args.db, backend=args.backend, cache_size=0, pool_size=args.threads
+    ) as service:
+        service.lookup(codes[0])
+        for threads in sorted({1, args.threads}):
+            shares = [codes[i::threads] for i in range(threads)]
+
+            def run(share: List[str]) -> None:
+                for code in share:
+                    service.lookup(code)
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                list(pool.map(run, shares))
+            seconds = time.perf_counter() - start
+            result[f"threads_{threads}_lookups_per_sec"] = len(codes) / seconds
+        start = time.perf_counter()
+        service.lookup_many(codes)
+        result["lookup_many_codes_per_sec"] = len(codes) / (
+            time.perf_counter() - start
+        )
+        # Load the index outside the timed call
+        service.columnar_index
+        start = time.perf_counter()
+        service.lookup_columns(codes)
+        result["lookup_columns_codes_per_sec"] = len(codes) / (
+            time.perf_counter() - start
+        )
+    result["peak_rss_bytes"] = _peak_rss()
+    return result
+
+
+def phase_async(args) -> Dict[str, Any]:
+    import asyncio
+
+    from zip2addr.aio import AsyncZip2AddrService
+
+    codes = _read_codes(args.codes)
+
+    async def run() -> float:
+        async with AsyncZip2AddrService(
+            args.db, max_workers=args.threads, backend=args.backend, cache_size=0
+        ) as service:
+            await service.lookup(codes[0])
+            start = time.perf_counter()
+            for i in range(0, len(codes), ASYNC_CONCURRENCY):
+                batch = codes[i : i + ASYNC_CONCURRENCY]
+                await asyncio.gather(*(service.lookup(code) for code in batch))
+            return time.perf_counter() - start
+
+    seconds = asyncio.run(run())
+    return {
+        "concurrency": ASYNC_CONCURRENCY,
+        "lookups_per_sec": len(codes) / seconds,
+        "peak_rss_bytes": _peak_rss(),
+    }
+
+
+def _match_queries(db: str, n: int, seed: int) -> List[List[str]]:
+    """Return ``n`` (zipcode, address) pairs, some mistyped or shortened."""
+    import sqlite3
+
+    with sqlite3.connect(db) as conn:
+        rows = conn.execute(
+            "SELECT zipcode, prefecture, city, town FROM postal"
+        ).fetchall()
+    rng = random.Random(seed)
+    chars = sorted({c for r in rows for c in r[2] + (r[3] or "")})
+    queries = []
+    for zipcode, prefecture, city, town in rng.sample(rows, min(n, len(rows))):
+        place = city + (town or "")
+        if rng.random() < MATCH_TYPO_RATE:
+            i = rng.randrange(len(place))
+            place = place[:i] + rng.choice(chars) + place[i + 1 :]
+        if rng.random() >= MATCH_NO_PREF_RATE:
+            place = prefecture + place
+        queries.append([zipcode, place + "1丁目2-3"])
+    return queries
+
+
+def phase_match(args) -> Dict[str, Any]:
+    from zip2addr.api import Zip2AddrService
+
+    queries = _match_queries(args.db, MATCH_QUERIES, args.seed)
+    texts = [q for _, q in queries]
+    result: Dict[str, Any] = {"queries": len(texts)}
+    with Zip2AddrService(args.db, backend=args.backend, cache_size=0) as service:
+        matcher = service.matcher
+        service.lookup(queries[0][0])
+        start = time.perf_counter()
+        for text in texts:
+            matcher.candidates(text)
+        per_sec = len(texts) / (time.perf_counter() - start)
+        for limit in (1, 10):
+            start = time.perf_counter()
+            results = [service.match(text, limit) for text in texts]
+            seconds = time.perf_counter() - start
+            result[f"match_limit_{limit}_per_sec"] = len(texts) / seconds
+    top1 = sum(
+        bool(found) and found[0].address.zipcode == zipcode
+        for (zipcode, _), found in zip(queries, results)
+    )
+    result.update(
+        {
+            "index_build_seconds": matcher.build_time,
+            "index_load_seconds": matcher.load_time,
+            "index_bytes": matcher.index_bytes,
+            "candidates_per_sec": per_sec,
+            "top1_accuracy": top1 / len(texts),
+            "target_per_sec": MATCH_TARGET_PER_SEC,
+            "meets_target": per_sec >= MATCH_TARGET_PER_SEC,
+            "peak_rss_bytes": _peak_rss(),
+        }
+    )
+    return result
+
+
+def phase_memory(args) -> Dict[str, Any]:
+    import sqlite3
+
+    from zip2addr.api import Zip2AddrService
+    from zip2addr.snapshot import snapshot_path
+
+    codes = _read_codes(args.codes)
+    with sqlite3.connect(args.db) as conn:
+        records = conn.execute("SELECT COUNT(*) FROM postal").fetchone()[0]
+    before = _rss()
+    with Zip2AddrService(args.db, backend=args.backend, cache_size=0) as service:
+        for code in codes:
+            service.lookup(code)
+        growth = _rss() - before
+        if args.backend == "memory":
+            data_bytes = service.backend.stats()["memory_bytes"]
+        elif args.backend == "snapshot":
+            data_bytes = os.path.getsize(snapshot_path(args.db))
+        else:
+            data_bytes = os.path.getsize(args.db)
+    return {
+        "records": records,
+        "data_bytes": data_bytes,
+        "data_bytes_per_record": data_bytes / records,
+        "rss_growth_bytes": growth,
+        "rss_bytes_per_record": growth / records,
+    }
+
+
+PHASES = {
+    "build": phase_build,
+    "cold": phase_cold,
+    "latency": phase_latency,
+    "throughput": phase_throughput,
+    "async": phase_async,
+    "match": phase_match,
+    "memory": phase_memory,
+}
+
+
+# -- driver -------------------------------------------------------------------
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [SRC, env.get("PYTHONPATH")]))
+    return env
+
+
+def _run_phase(args, phase: str, backend: str = "") -> Dict[str, Any]:
+    cmd = [
+        sys.executable,
+        os.path.abspath(__file__),
+        "--phase",
+        phase,
+        "--csv",
+        args.csv,
+        "--db",
+        args.db,
+        "--codes",
+        args.codes,
+        "--threads",
+        str(args.threads),
+        "--seed",
+        str(args.seed),
+    ]
+    if backend:
+        cmd += ["--backend", backend]
+    proc = subprocess.run(
+        cmd, env=_env(), capture_output=True, text=True, check=True
+    )
+    return json.loads(proc.stdout)
+
+
+def _bench_cli(args) -> Dict[str, Any]:
+    """Time the installed-style CLI entry point (it reads the bundled DB)."""
+    codes = _read_codes(args.codes)
+    cmd = [sys.executable, "-m", "zip2addr.cli"]
+    env = _env()
+    samples = []
+    for code in codes[: args.repeat * 4]:
+        start = time.perf_counter()
+        subprocess.run(cmd + [code], env=env, capture_output=True)
+        samples.append((time.perf_counter() - start) * 1e3)
+    start = time.perf_counter()
+    subprocess.run(
+        cmd + ["--batch"],
+        env=env,
+        input="\n".join(codes) + "\n",
+        capture_output=True,
+        text=True,
+    )
+    seconds = time.perf_counter() - start
+    python = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], env=env)
+        python.append((time.perf_counter() - start) * 1e3)
+    return {
+        "invocation_ms": _percentiles(samples),
+        "python_startup_ms": statistics.median(python),
+        "batch_lines_per_sec": len(codes) / seconds,
+        "bundled_db": os.path.exists(os.path.join(SRC, "zip2addr", "zip2addr.db")),
+    }
+
+
+def _bench_server(args, backend: str) -> Dict[str, Any]:
+    """Time `zip2addr serve` from one keep-alive client connection."""
+    import http.client
+    import signal
+
+    codes = _read_codes(args.codes)
+    cmd = [sys.executable, "-m", "zip2addr.cli", "serve", "--port", "0"]
+    cmd += ["--db", args.db, "--backend", backend]
+    proc = subprocess.Popen(cmd, env=_env(), stderr=subprocess.PIPE, text=True)
+    try:
+        # "Serving on http://host:port (...)"
+        address = proc.stderr.readline().split()[2].rsplit("/", 1)[1]
+        host, port = address.rsplit(":", 1)
+        conn = http.client.HTTPConnection(host, int(port))
+        samples = []
+        start = time.perf_counter()
+        for code in codes:
+            t = time.perf_counter()
+            conn.request("GET", "/lookup/" + code)
+            conn.getresponse().read()
+            samples.append((time.perf_counter() - t) * 1e3)
+        seconds = time.perf_counter() - start
+        batch = 1000
+        start = time.perf_counter()
+        for i in range(0, len(codes), batch):
+            conn.request("POST", "/lookup", body=json.dumps(codes[i : i + batch]))
+            conn.getresponse().read()
+        post_seconds = time.perf_counter() - start
+        conn.close()
+    finally:
+        proc.send_signal(signal.SIGINT)
+        proc.wait()
+    return {
+        "get_ms": _percentiles(samples),
+        "get_requests_per_sec": len(codes) / seconds,
+        "post_codes_per_sec": len(codes) / post_seconds,
+    }
+
+
+def _write_codes(csv_path: str, path: str, n: int, seed: int) -> None:
+    import csv
+
+    with open(csv_path, newline="", encoding="utf-8") as fh:
+        zipcodes = [row[2] for row in csv.reader(fh)]
+    rng = random.Random(seed)
+    codes = []
+    for _ in range(n):
+        if rng.random() < MISS_RATE:
+            codes.append(f"{rng.randrange(10_000_000):07d}")
+        else:
+            codes.append(rng.choice(zipcodes))
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write("\n".join(codes) + "\n")
+
+
+def _version() -> str:
+    sys.path.insert(0, SRC)
+    import zip2addr
+
+    return zip2addr.__version__
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=124_000, help="synthetic rows")
+    parser.add_argument("--lookups", type=int, default=20_000, help="codes timed")
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=5, help="cold start runs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--workdir", help="keep generated files here")
+    parser.add_argument("--out", help="write JSON here instead of stdout")
+    parser.add_argument("--phase", choices=sorted(PHASES), help=argparse.SUPPRESS)
+    parser.add_argument("--csv", help=argparse.SUPPRESS)
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    parser.add_argument("--codes", help=argparse.SUPPRESS)
+    parser.add_argument("--backend", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.phase:
+        print(json.dumps(PHASES[args.phase](args)))
+        return 0
+
+    sys.path.insert(0, HERE)
+    import synthetic
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = args.workdir or tmp
+        os.makedirs(workdir, exist_ok=True)
+        args.csv = os.path.join(workdir, "ken_all.csv")
+        args.db = os.path.join(workdir, "zip2addr.db")
+        args.codes = os.path.join(workdir, "codes.txt")
+        synthetic.write_csv(args.csv, args.rows, args.seed)
+        _write_codes(args.csv, args.codes, args.lookups, args.seed)
+
+        backends = [b for b in args.backends.split(",") if b]
+        results: Dict[str, Any] = {
+            "meta": {
+                "version": _version(),
+                "python": platform.python_version(),
+                "implementation": platform.python_implementation(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "rows": args.rows,
+                "lookups": args.lookups,
+                "threads": args.threads,
+                "seed": args.seed,
+            },
+            "build": _run_phase(args, "build"),
+            "cold": {},
+            "latency": {},
+            "throughput": {},
+            "async": {},
+            "match": {},
+            "memory": {},
+            "server": {},
+        }
+        for backend in ["module"] + backends:
+            runs = [_run_phase(args, "cold", backend) for _ in range(args.repeat)]
+            results["cold"][backend] = {
+                key: statistics.median(r[key] for r in runs) for key in runs[0]
+            }
+            results["latency"][backend] = _run_phase(args, "latency", backend)
+        for backend in backends:
+            results["throughput"][backend] = _run_phase(args, "throughput", backend)
+            results["async"][backend] = _run_phase(args, "async", backend)
+            results["match"][backend] = _run_phase(args, "match", backend)
+            results["memory"][backend] = _run_phase(args, "memory", backend)
+            results["server"][backend] = _bench_server(args, backend)
+        results["cli"] = _bench_cli(args)
+
+    text = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
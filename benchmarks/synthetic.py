@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""Write a synthetic CSV shaped like utf_ken_all.csv.
+
+Rows follow the layout read by scripts/generate_db.py: 47 prefectures, cities
+whose first row is the "以下に掲載がない場合" catch-all, kanji town names with
+occasional "（…丁目）" annotations, and a share of zipcodes spanning several
+rows (multiple_town = 1). The output depends only on ``rows`` and ``seed``,
+so runs on different machines and versions build identical DBs.
+
+Usage: python benchmarks/synthetic.py out.csv [rows]
+"""
+
+import csv
+import random
+import sys
+from typing import List, Tuple
+
+PREFECTURES = [
+    ("北海道", "ﾎｯｶｲﾄﾞｳ"), ("青森県", "ｱｵﾓﾘｹﾝ"), ("岩手県", "ｲﾜﾃｹﾝ"),
+    ("宮城県", "ﾐﾔｷﾞｹﾝ"), ("秋田県", "ｱｷﾀｹﾝ"), ("山形県", "ﾔﾏｶﾞﾀｹﾝ"),
+    ("福島県", "ﾌｸｼﾏｹﾝ"), ("茨城県", "ｲﾊﾞﾗｷｹﾝ"), ("栃木県", "ﾄﾁｷﾞｹﾝ"),
+    ("群馬県", "ｸﾞﾝﾏｹﾝ"), ("埼玉県", "ｻｲﾀﾏｹﾝ"), ("千葉県", "ﾁﾊﾞｹﾝ"),
+    ("東京都", "ﾄｳｷｮｳﾄ"), ("神奈川県", "ｶﾅｶﾞﾜｹﾝ"), ("新潟県", "ﾆｲｶﾞﾀｹﾝ"),
+    ("富山県", "ﾄﾔﾏｹﾝ"), ("石川県", "ｲｼｶﾜｹﾝ"), ("福井県", "ﾌｸｲｹﾝ"),
+    ("山梨県", "ﾔﾏﾅｼｹﾝ"), ("長野県", "ﾅｶﾞﾉｹﾝ"), ("岐阜県", "ｷﾞﾌｹﾝ"),
+    ("静岡県", "ｼｽﾞｵｶｹﾝ"), ("愛知県", "ｱｲﾁｹﾝ"), ("三重県", "ﾐｴｹﾝ"),
+    ("滋賀県", "ｼｶﾞｹﾝ"), ("京都府", "ｷｮｳﾄﾌ"), ("大阪府", "ｵｵｻｶﾌ"),
+    ("兵庫県", "ﾋｮｳｺﾞｹﾝ"), ("奈良県", "ﾅﾗｹﾝ"), ("和歌山県", "ﾜｶﾔﾏｹﾝ"),
+    ("鳥取県", "ﾄｯﾄﾘｹﾝ"), ("島根県", "ｼﾏﾈｹﾝ"), ("岡山県", "ｵｶﾔﾏｹﾝ"),
+    ("広島県", "ﾋﾛｼﾏｹﾝ"), ("山口県", "ﾔﾏｸﾞﾁｹﾝ"), ("徳島県", "ﾄｸｼﾏｹﾝ"),
+    ("香川県", "ｶｶﾞﾜｹﾝ"), ("愛媛県", "ｴﾋﾒｹﾝ"), ("高知県", "ｺｳﾁｹﾝ"),
+    ("福岡県", "ﾌｸｵｶｹﾝ"), ("佐賀県", "ｻｶﾞｹﾝ"), ("長崎県", "ﾅｶﾞｻｷｹﾝ"),
+    ("熊本県", "ｸﾏﾓﾄｹﾝ"), ("大分県", "ｵｵｲﾀｹﾝ"), ("宮崎県", "ﾐﾔｻﾞｷｹﾝ"),
+    ("鹿児島県", "ｶｺﾞｼﾏｹﾝ"), ("沖縄県", "ｵｷﾅﾜｹﾝ"),
+]  # fmt: skip
+
+# Kanji and their readings used to compose city and town names
+SYLLABLES = [
+    ("山", "ﾔﾏ"), ("川", "ｶﾜ"), ("田", "ﾀ"), ("中", "ﾅｶ"), ("島", "ｼﾏ"),
+    ("本", "ﾓﾄ"), ("村", "ﾑﾗ"), ("松", "ﾏﾂ"), ("井", "ｲ"), ("上", "ｶﾐ"),
+    ("下", "ｼﾓ"), ("北", "ｷﾀ"), ("南", "ﾐﾅﾐ"), ("東", "ﾋｶﾞｼ"), ("西", "ﾆｼ"),
+    ("大", "ｵｵ"), ("小", "ｺ"), ("原", "ﾊﾗ"), ("野", "ﾉ"), ("新", "ｼﾝ"),
+    ("高", "ﾀｶ"), ("石", "ｲｼ"), ("木", "ｷ"), ("林", "ﾊﾔｼ"), ("森", "ﾓﾘ"),
+    ("宮", "ﾐﾔ"), ("沢", "ｻﾜ"), ("浜", "ﾊﾏ"), ("崎", "ｻｷ"), ("橋", "ﾊｼ"),
+    ("谷", "ﾀﾆ"), ("江", "ｴ"), ("池", "ｲｹ"), ("坂", "ｻｶ"), ("岡", "ｵｶ"),
+    ("藤", "ﾌｼﾞ"), ("長", "ﾅｶﾞ"), ("吉", "ﾖｼ"), ("青", "ｱｵ"), ("白", "ｼﾛ"),
+    ("平", "ﾋﾗ"), ("和", "ﾜ"), ("泉", "ｲｽﾞﾐ"), ("桜", "ｻｸﾗ"), ("緑", "ﾐﾄﾞﾘ"),
+]  # fmt: skip
+
+CITY_SUFFIXES = [("市", "ｼ"), ("町", "ﾁｮｳ"), ("村", "ﾑﾗ")]
+TOWN_SUFFIXES = [("", ""), ("町", "ﾏﾁ"), ("台", "ﾀﾞｲ"), ("通", "ﾄﾞｵﾘ")]
+# Real KEN_ALL averages ~67 rows per city and ~1.1 rows per zipcode
+TOWNS_PER_CITY = 67
+MULTI_ROW_RATE = 0.08
+CHOME_RATE = 0.05
+
+
+def _name(rng: random.Random, suffixes) -> Tuple[str, str]:
+    parts = rng.sample(SYLLABLES, rng.randint(2, 3))
+    suffix = rng.choice(suffixes)
+    kanji = "".join(p[0] for p in parts) + suffix[0]
+    kana = "".join(p[1] for p in parts) + suffix[1]
+    return kanji, kana
+
+
+def generate(rows: int, seed: int = 0) -> List[List[str]]:
+    """Return ``rows`` KEN_ALL-shaped rows, ordered by zipcode."""
+    rng = random.Random(seed)
+    out: List[List[str]] = []
+    cities = max(1, rows // TOWNS_PER_CITY)
+    for c in range(cities):
+        pref_no = c * len(PREFECTURES) // cities
+        pref, pref_kana = PREFECTURES[pref_no]
+        city, city_kana = _name(rng, CITY_SUFFIXES)
+        jis = f"{pref_no + 1:02d}{c % 1000:03d}"
+        # Spread cities over the zipcode space, keeping the order by zipcode
+        base = 10000 + c * (9_990_000 // cities)
+        zipcode = base
+        n = rows * (c + 1) // cities - rows * c // cities
+        for i in range(n):
+            if i == 0:
+                town, town_kana = "以下に掲載がない場合", "ｲｶﾆｹｲｻｲｶﾞﾅｲﾊﾞｱｲ"
+                multi = chome = 0
+            else:
+                town, town_kana = _name(rng, TOWN_SUFFIXES)
+                chome = int(rng.random() < CHOME_RATE)
+                if chome:
+                    # KEN_ALL writes these digits full-width
+                    town += f"（１～{chr(0xFF10 + rng.randint(2, 9))}丁目）"
+                multi = int(i > 1 and rng.random() < MULTI_ROW_RATE)
+                if not multi:
+                    zipcode += rng.randint(1, 30)
+            code = f"{zipcode:07d}"
+            out.append(
+                [
+                    jis,
+                    code[:3] + "  ",
+                    code,
+                    pref_kana,
+                    city_kana,
+                    town_kana,
+                    pref,
+                    city,
+                    town,
+                    "0",
+                    "0",
+                    str(chome),
+                    str(multi),
+                    "0",
+                    "0",
+                ]
+            )
+    return out
+
+
+def write_csv(path: str, rows: int, seed: int = 0) -> int:
+    """Write ``generate(rows, seed)`` to ``path`` and return the row count."""
+    data = generate(rows, seed)
+    with open(path, "w", newline="", encoding="utf-8") as fh:
+        csv.writer(fh, lineterminator="\n").writerows(data)
+    return len(data)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: synthetic.py out.csv [rows]")
+        sys.exit(2)
+    write_csv(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 124_000)
@@ -1,95 +1,418 @@
 #!/usr/bin/env python3
-"""Generate sqlite DB from utf_ken_all.csv (minimal implementation).
+"""Generate sqlite DB from utf_ken_all.csv.
 
-Usage: python scripts/generate_db.py utf_ken_all.csv out.db
+Town names are cleaned on the way in (see clean_rows): rows KEN_ALL splits
+over several lines are merged, placeholder towns such as "以下に掲載がない場合"
+become empty, and parenthesized annotations move from ``town`` to
+``town_note`` (Zip2Addr.chome_numbers expands the 丁目 ranges there).
+
+Rows are streamed into a single executemany() inside one transaction with
+journaling and syncing disabled, and the finished file atomically replaces
+``out.db``. See SCHEMA_SQL for the layout; the ``meta`` table records the
+data version and build id.
+
+Usage: python scripts/generate_db.py [--snapshot] [--ngram-index]
+    [--search-indexes] [--data-version V] utf_ken_all.csv out.db
+
+With --snapshot, the binary snapshot read by the "snapshot" backend is also
+written next to out.db (as out.snap); without it, an existing out.snap is
+removed. With --ngram-index, the tables of NGRAM_SQL store the index used by
+``Zip2AddrService.match``, which otherwise builds it in memory on first use;
+storing it adds about 12MB and a couple of seconds to a full KEN_ALL build.
+With --search-indexes, the name columns searched by ``Zip2AddrService.search``
+are indexed as well (see create_indexes).
 """
 
+import argparse
 import csv
+import os
 import sqlite3
 import sys
+import time
+import uuid
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+# Use the library from this checkout so the n-gram index is built with the
+# same text normalization the installed package queries it with
+_SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, os.path.abspath(_SRC))
+
+from zip2addr.matcher import build_index, ngrams, postings_to_blob  # noqa: E402
+from zip2addr.schema import SCHEMA_VERSION  # noqa: E402
+from zip2addr.snapshot import snapshot_path, write_snapshot  # noqa: E402
+
+
+class _IntMap(dict):
+    """Memoized ``int(v) if v.isdigit() else None`` for the few flag values."""
 
+    def __missing__(self, key: str) -> Optional[int]:
+        value = self[key] = int(key) if key.isdigit() else None
+        return value
 
-def create_db(csv_path: str, out_db: str):
-    # Recreate DB from scratch to ensure full replace semantics
-    conn = sqlite3.connect(out_db)
-    cur = conn.cursor()
-    cur.execute("DROP TABLE IF EXISTS postal")
-    cur.execute(
-        """
-        CREATE TABLE postal (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            zipcode TEXT,
-            jis_code TEXT,
-            old_postal_code TEXT,
-            pref_kana TEXT,
-            city_kana TEXT,
-            town_kana TEXT,
-            prefecture TEXT,
-            city TEXT,
-            town TEXT,
-            multiple_postal INTEGER,
-            koaza INTEGER,
-            chome INTEGER,
-            multiple_town INTEGER,
-            update_status INTEGER,
-            change_reason INTEGER
+
+def iter_rows(lines: Iterable[str]) -> Iterator[Tuple]:
+    """Yield Japan Post CSV lines as tuples in the legacy postal column order.
+
+    zipcode, jis_code, old_postal_code, pref_kana, city_kana, town_kana,
+    prefecture, city, town, multiple_postal, koaza, chome, multiple_town,
+    update_status, change_reason
+    """
+    ints = _IntMap()
+    strip = str.strip
+    for row in csv.reader(lines):
+        # Japan Post CSV columns (1-based): 1=jis,2=old5,3=zip7,4=pref_kana,5=city_kana,6=town_kana,7=pref,8=city,9=town,10=multi_postal,11=koaza,12=chome,13=multi_town,14=update_status,15=change_reason
+        if len(row) < 3:
+            continue
+        if len(row) < 15:
+            row += [""] * (15 - len(row))
+        v = list(map(strip, row))
+        yield (
+            v[2].replace("-", ""),
+            v[0],
+            v[1],
+            v[3],
+            v[4],
+            v[5],
+            v[6],
+            v[7],
+            v[8],
+            ints[v[9]],
+            ints[v[10]],
+            ints[v[11]],
+            ints[v[12]],
+            ints[v[13]],
+            ints[v[14]],
         )
-        """
-    )
-    # create index on zipcode for fast lookup
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_postal_zipcode ON postal(zipcode)")
-    with open(csv_path, newline="", encoding="utf-8") as fh:
-        reader = csv.reader(fh)
-        for row in reader:
-            # Japan Post CSV columns (1-based): 1=jis,2=old5,3=zip7,4=pref_kana,5=city_kana,6=town_kana,7=pref,8=city,9=town,10=multi_postal,11=koaza,12=chome,13=multi_town,14=update_status,15=change_reason
-            if len(row) < 3:
+
+
+# Town values standing for "the rest of the area" rather than a town name
+_PLACEHOLDER = "以下に掲載がない場合"
+_PLACEHOLDER_SUFFIXES = ("の次に番地がくる場合", "一円")
+
+
+def merge_continuations(rows: Iterable[Tuple]) -> Iterator[Tuple]:
+    """Join town names KEN_ALL splits over consecutive rows of one zipcode.
+
+    A town too long for one line opens "（" on its first row and closes it on
+    a later one; the rows in between only carry the rest of the name.
+    """
+    pending: Optional[Tuple] = None
+    for r in rows:
+        if pending is not None:
+            if r[0] == pending[0]:
+                kana = pending[5]
+                # The kana is repeated on every row for some towns
+                if not kana.endswith(r[5]):
+                    kana += r[5]
+                pending = pending[:5] + (kana,) + pending[6:8] + (pending[8] + r[8],)
+                pending += r[9:]
+                if "）" in r[8]:
+                    yield pending
+                    pending = None
                 continue
-            postal = row[2].strip().replace("-", "")
-
-            def val(i):
-                return row[i].strip() if i < len(row) else ""
-
-            jis = val(0)
-            old5 = val(1)
-            pref_kana = val(3)
-            city_kana = val(4)
-            town_kana = val(5)
-            pref = val(6)
-            city = val(7)
-            town = val(8)
-            multi_postal = int(val(9)) if val(9).isdigit() else None
-            koaza = int(val(10)) if val(10).isdigit() else None
-            chome = int(val(11)) if val(11).isdigit() else None
-            multi_town = int(val(12)) if val(12).isdigit() else None
-            update_status = int(val(13)) if val(13).isdigit() else None
-            change_reason = int(val(14)) if val(14).isdigit() else None
-
-            cur.execute(
-                "INSERT INTO postal(zipcode, jis_code, old_postal_code, pref_kana, city_kana, town_kana, prefecture, city, town, multiple_postal, koaza, chome, multiple_town, update_status, change_reason) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                (
-                    postal,
-                    jis,
-                    old5,
-                    pref_kana,
-                    city_kana,
-                    town_kana,
-                    pref,
-                    city,
-                    town,
-                    multi_postal,
-                    koaza,
-                    chome,
-                    multi_town,
-                    update_status,
-                    change_reason,
-                ),
-            )
-    conn.commit()
-    conn.close()
+            # Unclosed at a zipcode change: keep what there is
+            yield pending
+            pending = None
+        if "（" in r[8] and "）" not in r[8]:
+            pending = r
+        else:
+            yield r
+    if pending is not None:
+        yield pending
+
+
+def clean_town(town: str, kana: str) -> Tuple[str, str, Optional[str]]:
+    """Return (town, town_kana, town_note) with annotations split off.
+
+    Placeholder towns become empty and keep their text as the note. A
+    parenthesized part moves to the note, except floors of a building
+    ("（１階）"), which stay part of the name.
+    """
+    if town == _PLACEHOLDER or (
+        town.endswith(_PLACEHOLDER_SUFFIXES) and len(town) > 2
+    ):
+        return "", "", town
+    i = town.find("（")
+    if i < 0:
+        return town, kana, None
+    note = town[i + 1 :]
+    if note.endswith("）"):
+        note = note[:-1]
+    j = kana.find("(")
+    if note.endswith("階") or note.endswith("階層不明"):
+        return town[:i] + note, kana.replace("(", "").replace(")", ""), None
+    return town[:i], kana[:j] if j >= 0 else kana, note
+
+
+def clean_rows(rows: Iterable[Tuple]) -> Iterator[Tuple]:
+    """Merge and clean iter_rows() tuples; each gains town_note at the end."""
+    for r in merge_continuations(rows):
+        town, kana, note = clean_town(r[8], r[5])
+        yield r[:5] + (kana,) + r[6:8] + (town,) + r[9:15] + (note,)
+
+
+SCHEMA_SQL = """
+CREATE TABLE pref (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    kana TEXT NOT NULL
+);
+CREATE TABLE city (
+    id INTEGER PRIMARY KEY,
+    pref_id INTEGER NOT NULL REFERENCES pref(id),
+    jis_code TEXT NOT NULL,
+    name TEXT NOT NULL,
+    kana TEXT NOT NULL
+);
+-- Clustered on zipcode: a lookup is one seek into the primary key B-tree.
+-- seq keeps the CSV order of rows sharing a zipcode. town_note holds the
+-- annotation split off the town name, e.g. "１～３丁目" or "以下に掲載がない場合".
+CREATE TABLE address (
+    zipcode TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    city_id INTEGER NOT NULL REFERENCES city(id),
+    old_postal_code TEXT,
+    town_kana TEXT,
+    town TEXT,
+    multiple_postal INTEGER,
+    koaza INTEGER,
+    chome INTEGER,
+    multiple_town INTEGER,
+    update_status INTEGER,
+    change_reason INTEGER,
+    town_note TEXT,
+    PRIMARY KEY (zipcode, seq)
+) WITHOUT ROWID;
+-- Flat view with the original postal table columns for ad-hoc queries
+CREATE VIEW postal AS
+SELECT zipcode, city.jis_code AS jis_code, old_postal_code,
+    pref.kana AS pref_kana, city.kana AS city_kana, town_kana,
+    pref.name AS prefecture, city.name AS city, town, multiple_postal, koaza,
+    chome, multiple_town, update_status, change_reason, town_note
+FROM address
+JOIN city ON city.id = address.city_id
+JOIN pref ON pref.id = city.pref_id;
+"""
+
+
+def create_schema(conn: sqlite3.Connection):
+    conn.executescript(SCHEMA_SQL)
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+
+def insert_rows(conn: sqlite3.Connection, rows: Iterable[Tuple]) -> int:
+    """Insert clean_rows() tuples, factoring out prefecture and city strings."""
+    prefs: Dict[Tuple[str, str], int] = {}
+    cities: Dict[Tuple[int, str, str, str], int] = {}
+    seqs: Dict[str, int] = {}
+
+    def addresses() -> Iterator[Tuple]:
+        for r in rows:
+            zipcode = r[0]
+            pref_key = (r[6], r[3])
+            pref_id = prefs.get(pref_key)
+            if pref_id is None:
+                pref_id = prefs[pref_key] = len(prefs) + 1
+            city_key = (pref_id, r[1], r[7], r[4])
+            city_id = cities.get(city_key)
+            if city_id is None:
+                city_id = cities[city_key] = len(cities) + 1
+            seq = seqs.get(zipcode, 0)
+            seqs[zipcode] = seq + 1
+            yield (zipcode, seq, city_id, r[2], r[5], r[8]) + r[9:16]
+
+    count = conn.executemany(
+        "INSERT INTO address VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        addresses(),
+    ).rowcount
+    conn.executemany(
+        "INSERT INTO pref(id, name, kana) VALUES (?, ?, ?)",
+        ((i, name, kana) for (name, kana), i in prefs.items()),
+    )
+    conn.executemany(
+        "INSERT INTO city(id, pref_id, jis_code, name, kana) VALUES (?, ?, ?, ?, ?)",
+        ((i,) + key for key, i in cities.items()),
+    )
+    return count
+
+
+def create_indexes(conn: sqlite3.Connection, search: bool = False):
+    # Secondary indexes, built after the load so inserts do not have to
+    # maintain them row by row. Lookups only need the primary key; the city_id
+    # index keeps Zip2AddrService.search() by prefecture or city off a full
+    # scan. With ``search``, the city and town name columns are indexed too
+    # (about 7.5MB for KEN_ALL); without them such searches scan the tables.
+    # Entries of WITHOUT ROWID indexes end with the primary key, so equality
+    # matches come back already in (zipcode, seq) order.
+    conn.execute("CREATE INDEX idx_address_city ON address(city_id)")
+    if search:
+        conn.execute("CREATE INDEX idx_city_pref ON city(pref_id)")
+        conn.execute("CREATE INDEX idx_city_name ON city(name)")
+        conn.execute("CREATE INDEX idx_city_kana ON city(kana)")
+        conn.execute("CREATE INDEX idx_address_town ON address(town)")
+        conn.execute("CREATE INDEX idx_address_town_kana ON address(town_kana)")
+
+
+NGRAM_SQL = """
+CREATE TABLE ngram_doc (
+    id INTEGER PRIMARY KEY,
+    zipcode TEXT NOT NULL,
+    ordinal INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    grams INTEGER NOT NULL
+);
+CREATE TABLE ngram (
+    gram TEXT PRIMARY KEY,
+    ids BLOB NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def create_ngram_index(conn: sqlite3.Connection) -> int:
+    """Store the bigram index used by zip2addr.matcher; return its byte size."""
+    for stmt in NGRAM_SQL.split(";"):
+        if stmt.strip():
+            conn.execute(stmt)
+    rows = conn.execute(
+        "SELECT zipcode, pref.name, city.name, town FROM address "
+        "JOIN city ON city.id = address.city_id "
+        "JOIN pref ON pref.id = city.pref_id ORDER BY zipcode, seq"
+    ).fetchall()
+    docs, postings = build_index(rows)
+    conn.executemany(
+        "INSERT INTO ngram_doc VALUES (?, ?, ?, ?, ?)",
+        (
+            (i, d.zipcode, d.ordinal, d.text, len(set(ngrams(d.text))))
+            for i, d in enumerate(docs)
+        ),
+    )
+    blobs = [(g, postings_to_blob(ids)) for g, ids in postings.items()]
+    conn.executemany("INSERT INTO ngram VALUES (?, ?)", blobs)
+    return sum(len(b) for _, b in blobs)
+
+
+META_SQL = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID
+"""
+
+
+def write_meta(conn: sqlite3.Connection, data_version: Optional[str] = None):
+    """Record ``data_version`` (default: today as YYYYMMDD) in the meta table.
+
+    Also stores a new ``build_id``, so snapshots and caches of the previous
+    contents can tell they are stale, and creates the table, which DBs built
+    before it existed lack.
+    """
+    conn.execute(META_SQL)
+    conn.executemany(
+        "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+        [
+            ("data_version", data_version or time.strftime("%Y%m%d")),
+            ("build_id", uuid.uuid4().hex),
+        ],
+    )
+
+
+def create_db(
+    csv_path: str,
+    out_db: str,
+    snapshot: bool = False,
+    data_version: Optional[str] = None,
+    ngram_index: bool = False,
+    search_indexes: bool = False,
+) -> int:
+    """Build ``out_db`` from ``csv_path`` and return the number of rows.
+
+    With ``snapshot``, also write ``snapshot_path(out_db)`` from the new DB;
+    otherwise an existing snapshot there is removed.
+    With ``ngram_index``, store the n-gram index used by match(); with
+    ``search_indexes``, index the name columns used by search().
+    ``data_version`` is stored in the meta table (default: today's date).
+    """
+    start = time.perf_counter()
+    # Build next to the target and swap it in at the end, so readers of an
+    # existing DB never see a half-written file
+    tmp_db = out_db + ".tmp"
+    if os.path.exists(tmp_db):
+        os.remove(tmp_db)
+    conn = sqlite3.connect(tmp_db, isolation_level=None)
+    try:
+        # The file is discarded on failure, so journaling and fsync buy nothing
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-65536")
+        # executescript() commits first, so the schema goes in before BEGIN
+        create_schema(conn)
+        conn.execute("BEGIN")
+        with open(csv_path, newline="", encoding="utf-8") as fh:
+            count = insert_rows(conn, clean_rows(iter_rows(fh)))
+        create_indexes(conn, search_indexes)
+        if ngram_index:
+            create_ngram_index(conn)
+        write_meta(conn, data_version)
+        conn.execute("COMMIT")
+        conn.execute("ANALYZE")
+        conn.execute("VACUUM")
+        conn.close()
+    except BaseException:
+        conn.close()
+        os.remove(tmp_db)
+        raise
+    os.replace(tmp_db, out_db)
+    elapsed = time.perf_counter() - start
+    print(
+        f"Wrote {count} rows to {out_db} in {elapsed:.2f}s "
+        f"({count / max(elapsed, 1e-9):.0f} rows/sec)",
+        file=sys.stderr,
+    )
+    snap = snapshot_path(out_db)
+    if snapshot:
+        start = time.perf_counter()
+        write_snapshot(out_db, snap)
+        print(
+            f"Wrote snapshot {snap} ({os.path.getsize(snap)} bytes) "
+            f"in {time.perf_counter() - start:.2f}s",
+            file=sys.stderr,
+        )
+    elif os.path.exists(snap):
+        # A snapshot of the previous DB would no longer match it
+        os.remove(snap)
+        print(f"Removed stale snapshot {snap}", file=sys.stderr)
+    return count
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 3:
-        print("Usage: generate_db.py input.csv out.db")
-        sys.exit(2)
-    create_db(sys.argv[1], sys.argv[2])
+    parser = argparse.ArgumentParser(description="Generate sqlite DB from KEN_ALL")
+    parser.add_argument("csv_path", help="utf_ken_all.csv")
+    parser.add_argument("out_db", help="DB to write")
+    parser.add_argument(
+        "--snapshot",
+        action="store_true",
+        help="Also write the memory-mapped snapshot next to the DB",
+    )
+    parser.add_argument(
+        "--ngram-index",
+        action="store_true",
+        help="Also store the n-gram index used by match (faster first match)",
+    )
+    parser.add_argument(
+        "--search-indexes",
+        action="store_true",
+        help="Also index the city and town names (faster search by name)",
+    )
+    parser.add_argument(
+        "--data-version", help="Data version to record (default: today, YYYYMMDD)"
+    )
+    args = parser.parse_args()
+    create_db(
+        args.csv_path,
+        args.out_db,
+        snapshot=args.snapshot,
+        data_version=args.data_version,
+        ngram_index=args.ngram_index,
+        search_indexes=args.search_indexes,
+    )
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""Apply Japan Post monthly diff files to a DB built by generate_db.py.
+
+Besides utf_ken_all.csv, Japan Post publishes the rows added and deleted each
+month (utf_add_YYMM.csv and utf_del_YYMM.csv, same layout). Applying them
+takes seconds, where regenerating the whole DB rebuilds every table.
+
+The DB is copied, the deletions and then the additions are applied to the
+copy in one transaction, the n-gram index is rebuilt, the new data version is
+recorded in the meta table, and the copy atomically replaces the DB. Readers
+never see a partial update: open connections keep reading the old file until
+they are reopened, e.g. by ``Zip2AddrService.reload()`` or ``watch()``. A
+snapshot next to the DB is rewritten as well.
+
+Usage: python scripts/update_db.py [--add utf_add.csv] [--del utf_del.csv]
+    [--data-version V] [--snapshot] zip2addr.db
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import time
+from contextlib import closing
+from typing import Dict, Iterable, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generate_db import (  # noqa: E402
+    SCHEMA_VERSION,
+    clean_rows,
+    create_ngram_index,
+    iter_rows,
+    write_meta,
+)
+from zip2addr.schema import read_data_version, read_version  # noqa: E402
+from zip2addr.snapshot import snapshot_path, write_snapshot  # noqa: E402
+
+
+def delete_rows(conn: sqlite3.Connection, rows: Iterable[Tuple]) -> Tuple[int, int]:
+    """Delete one address per clean_rows() tuple; return (deleted, unmatched).
+
+    A row matches on zipcode, JIS city code, town, town kana and note, which
+    is what identifies a line of KEN_ALL.
+    """
+    deleted = unmatched = 0
+    for r in rows:
+        found = conn.execute(
+            "SELECT seq FROM address JOIN city ON city.id = address.city_id "
+            "WHERE zipcode = ? AND city.jis_code = ? AND town = ? AND town_kana = ? "
+            "AND town_note IS ? ORDER BY seq LIMIT 1",
+            (r[0], r[1], r[8], r[5], r[15]),
+        ).fetchone()
+        if found is None:
+            unmatched += 1
+            continue
+        key = (r[0], found[0])
+        conn.execute("DELETE FROM address WHERE zipcode = ? AND seq = ?", key)
+        deleted += 1
+    return deleted, unmatched
+
+
+def add_rows(conn: sqlite3.Connection, rows: Iterable[Tuple]) -> int:
+    """Insert clean_rows() tuples after the existing rows of their zipcode."""
+    prefs: Dict[Tuple[str, str], int] = {
+        (name, kana): i for i, name, kana in conn.execute("SELECT * FROM pref")
+    }
+    cities: Dict[Tuple[int, str, str, str], int] = {
+        key[1:]: key[0]
+        for key in conn.execute("SELECT id, pref_id, jis_code, name, kana FROM city")
+    }
+    seqs: Dict[str, int] = {}
+    count = 0
+    for r in rows:
+        zipcode = r[0]
+        pref_key = (r[6], r[3])
+        pref_id = prefs.get(pref_key)
+        if pref_id is None:
+            pref_id = prefs[pref_key] = conn.execute(
+                "INSERT INTO pref(name, kana) VALUES (?, ?)", pref_key
+            ).lastrowid
+        city_key = (pref_id, r[1], r[7], r[4])
+        city_id = cities.get(city_key)
+        if city_id is None:
+            city_id = cities[city_key] = conn.execute(
+                "INSERT INTO city(pref_id, jis_code, name, kana) VALUES (?, ?, ?, ?)",
+                city_key,
+            ).lastrowid
+        seq = seqs.get(zipcode)
+        if seq is None:
+            seq = conn.execute(
+                "SELECT COALESCE(MAX(seq) + 1, 0) FROM address WHERE zipcode = ?",
+                (zipcode,),
+            ).fetchone()[0]
+        seqs[zipcode] = seq + 1
+        conn.execute(
+            "INSERT INTO address VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (zipcode, seq, city_id, r[2], r[5], r[8]) + r[9:16],
+        )
+        count += 1
+    return count
+
+
+def prune(conn: sqlite3.Connection):
+    """Drop cities and prefectures no address refers to any more."""
+    conn.execute("DELETE FROM city WHERE id NOT IN (SELECT city_id FROM address)")
+    conn.execute("DELETE FROM pref WHERE id NOT IN (SELECT pref_id FROM city)")
+    # Earlier builds also expanded town notes into a chome table nothing read;
+    # it would go stale now that the rows are no longer kept in step
+    conn.execute("DROP TABLE IF EXISTS chome")
+
+
+def rebuild_ngram_index(conn: sqlite3.Connection):
+    # Doc ids and ordinals shift with every change, so the (small) index is
+    # rebuilt rather than patched. DBs built without it are left alone.
+    if conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'ngram_doc'"
+    ).fetchone():
+        conn.execute("DROP TABLE ngram_doc")
+        conn.execute("DROP TABLE ngram")
+        create_ngram_index(conn)
+
+
+def _read(path: Optional[str]) -> Tuple:
+    if path is None:
+        return ()
+    with open(path, newline="", encoding="utf-8") as fh:
+        return tuple(clean_rows(iter_rows(fh)))
+
+
+def apply_diff(
+    db_path: str,
+    add_csv: Optional[str] = None,
+    del_csv: Optional[str] = None,
+    data_version: Optional[str] = None,
+    snapshot: bool = False,
+) -> Tuple[int, int]:
+    """Apply Japan Post add/delete files to ``db_path``; return (added, deleted).
+
+    Deletions are applied first, so a row changed in place (listed in both
+    files) ends up with its new values. ``data_version`` is recorded in the
+    meta table (default: today's date). The snapshot is rewritten if it
+    exists or ``snapshot`` is set.
+    """
+    start = time.perf_counter()
+    # Parse both files before touching the DB so a bad file changes nothing
+    deletions = _read(del_csv)
+    additions = _read(add_csv)
+    with closing(sqlite3.connect(db_path)) as conn:
+        schema_version = read_version(conn)
+        if schema_version < SCHEMA_VERSION:
+            raise ValueError(
+                f"{db_path} uses schema version {schema_version}; "
+                "regenerate it with generate_db.py"
+            )
+        previous = read_data_version(conn)
+
+    tmp_db = db_path + ".tmp"
+    shutil.copyfile(db_path, tmp_db)
+    conn = sqlite3.connect(tmp_db, isolation_level=None)
+    try:
+        # As in generate_db: the copy is discarded on failure
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("BEGIN")
+        deleted, unmatched = delete_rows(conn, deletions)
+        added = add_rows(conn, additions)
+        prune(conn)
+        rebuild_ngram_index(conn)
+        write_meta(conn, data_version)
+        version = read_data_version(conn)
+        conn.execute("COMMIT")
+        conn.close()
+    except BaseException:
+        conn.close()
+        os.remove(tmp_db)
+        raise
+    os.replace(tmp_db, db_path)
+    if unmatched:
+        print(f"Warning: {unmatched} deleted row(s) not found", file=sys.stderr)
+    print(
+        f"Updated {db_path} from {previous or 'unknown'} to {version}: "
+        f"+{added} -{deleted} rows in {time.perf_counter() - start:.2f}s",
+        file=sys.stderr,
+    )
+    snap = snapshot_path(db_path)
+    if snapshot or os.path.exists(snap):
+        write_snapshot(db_path, snap)
+        print(f"Wrote snapshot {snap}", file=sys.stderr)
+    return added, deleted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Apply Japan Post add/delete files to a zip2addr DB"
+    )
+    parser.add_argument("db_path", help="DB to update in place")
+    parser.add_argument("--add", dest="add_csv", help="utf_add_YYMM.csv")
+    parser.add_argument("--del", dest="del_csv", help="utf_del_YYMM.csv")
+    parser.add_argument(
+        "--data-version", help="Data version to record (default: today, YYYYMMDD)"
+    )
+    parser.add_argument(
+        "--snapshot",
+        action="store_true",
+        help="Also write the snapshot if the DB does not have one yet",
+    )
+    args = parser.parse_args()
+    if not args.add_csv and not args.del_csv:
+        parser.error("nothing to apply; pass --add and/or --del")
+    apply_diff(
+        args.db_path,
+        args.add_csv,
+        args.del_csv,
+        data_version=args.data_version,
+        snapshot=args.snapshot,
+    )
@@ -1,7 +1,40 @@
-from importlib.metadata import version
+from typing import TYPE_CHECKING, Any, List
 
-__version__ = version("zip2addr-jp")
+# Attributes are resolved on first access (PEP 562) so that importing the
+# package, e.g. for the CLI, does not pay for importlib.metadata or the
+# sqlite/unicodedata imports of the API modules until they are used.
+if TYPE_CHECKING:
+    from .api import Zip2Addr, lookup, lookup_many  # noqa: F401
 
-from .api import Zip2Addr, lookup  # re-export for convenience
+    __version__: str
 
-__all__ = ["Zip2Addr", "lookup"]
+__all__ = ["Zip2Addr", "lookup", "lookup_many"]
+
+_API = frozenset(__all__)
+
+
+def _read_version() -> str:
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        return version("zip2addr-jp")
+    except PackageNotFoundError:
+        # Imported from a source checkout, e.g. by scripts/generate_db.py
+        return "0.0.0"
+
+
+def __getattr__(name: str) -> Any:
+    if name == "__version__":
+        value = _read_version()
+    elif name in _API:
+        from . import api
+
+        value = getattr(api, name)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | _API | {"__version__"})
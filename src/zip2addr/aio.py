@@ -0,0 +1,111 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from .api import Zip2AddrService, _is_valid_postal, _normalize_postal
+from .backends import MemoryBackend, Results
+from .cache import LRUCache
+from .models import Zip2Addr
+from .schema import _CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncZip2AddrService:
+    """asyncio front end for Zip2AddrService.
+
+    Results already in memory (hits in the in-process cache, and the memory
+    backend) are answered on the event loop; other lookups, including disk
+    cache reads and the decoding of snapshot records, run on a dedicated pool
+    of ``max_workers`` threads, each of which ends up holding its own pooled
+    read-only connection. Concurrent lookups of
+    the same normalized code share a single query.
+
+    Args:
+        db_path: optional path to sqlite DB; if omitted use bundled db
+        max_workers: number of threads running DB work
+        max_concurrency: optional limit on DB calls queued or running at once;
+            further lookups wait on the event loop
+        **kwargs: passed on to Zip2AddrService (cache_size, backend, ...)
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        max_workers: int = 4,
+        max_concurrency: Optional[int] = None,
+        **kwargs: Any,
+    ):
+        if max_workers < 1:
+            raise ValueError("max_workers must be >= 1")
+        if max_concurrency is not None and max_concurrency < 1:
+            raise ValueError("max_concurrency must be >= 1")
+        kwargs.setdefault("pool_size", max_workers)
+        self.service = Zip2AddrService(db_path, **kwargs)
+        self.max_workers = max_workers
+        self.max_concurrency = max_concurrency
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="zip2addr"
+        )
+        # Created on first use so they bind to the running loop (Python 3.9)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._inflight: Dict[str, "asyncio.Future[Results]"] = {}
+
+    @property
+    def pending(self) -> int:
+        """Number of distinct codes currently being queried."""
+        return len(self._inflight)
+
+    async def _run(self, fn: Callable, *args: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        if self.max_concurrency is None:
+            return await loop.run_in_executor(self._executor, fn, *args)
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            return await loop.run_in_executor(self._executor, fn, *args)
+
+    async def lookup(self, postal_code: str) -> List[Zip2Addr]:
+        if not postal_code:
+            return []
+        key = _normalize_postal(postal_code)
+        if not _is_valid_postal(key):
+            return []
+        service = self.service
+        cache = service._cache
+        fetch = service._get
+        if isinstance(cache, LRUCache) or (
+            cache is None and isinstance(service._backend, MemoryBackend)
+        ):
+            results = service._peek(key)
+            if results is not None:
+                return list(results)
+            fetch = service._fetch
+        fut = self._inflight.get(key)
+        if fut is None:
+            fut = asyncio.ensure_future(self._run(fetch, key))
+            self._inflight[key] = fut
+            fut.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            logger.debug("Joining in-flight lookup for: %s", key)
+        # A cancelled caller must not cancel the query other callers share
+        return list(await asyncio.shield(fut))
+
+    async def lookup_many(
+        self, postal_codes: Iterable[str], chunk_size: int = _CHUNK_SIZE
+    ) -> List[List[Zip2Addr]]:
+        """Lookup many postal codes; see ``Zip2AddrService.lookup_many``."""
+        codes = list(postal_codes)
+        return await self._run(self.service.lookup_many, codes, chunk_size)
+
+    async def aclose(self) -> None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._executor.shutdown)
+        self.service.close()
+
+    async def __aenter__(self) -> "AsyncZip2AddrService":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
@@ -1,16 +1,100 @@
-import importlib.resources
+import importlib
 import logging
 import os
 import sqlite3
-import unicodedata
-from typing import List, Optional
+import threading
+import time
+from contextlib import closing
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
 from .models import Zip2Addr
+from .pool import _readonly_uri
+from .render import NOT_FOUND, Rendered, render
+from .schema import (
+    _CHUNK_SIZE,
+    queries_for,
+    read_build_id,
+    read_data_version,
+    read_version,
+)
+
+if TYPE_CHECKING:
+    # Imported on first use: a single lookup through lookup(), as the CLI
+    # does, needs neither the service's backends, caches and stats nor the
+    # matcher, which pulls in unicodedata
+    from .backends import (
+        MemoryBackend,
+        Results,
+        SharedBackend,
+        SnapshotBackend,
+        SQLiteBackend,
+    )
+    from .cache import CacheInfo, LRUCache, TieredCache
+    from .columnar import ColumnarIndex, Columns
+    from .matcher import AddressMatcher, Match
+    from .snapshot import Snapshot
+    from .stats import ServiceStats
+
+    Backend = Union[SQLiteBackend, MemoryBackend, SnapshotBackend, SharedBackend]
+    Cache = Union[LRUCache, TieredCache]
 
 logger = logging.getLogger(__name__)
 
+# Backend classes by name, in the module that defines them
+_BACKENDS = {
+    "sqlite": "SQLiteBackend",
+    "memory": "MemoryBackend",
+    "snapshot": "SnapshotBackend",
+    "shared": "SharedBackend",
+}
+
+# Names this module used to import eagerly, resolved on first access (PEP 562)
+_LAZY = {
+    "MemoryBackend": "backends",
+    "Results": "backends",
+    "SharedBackend": "backends",
+    "SnapshotBackend": "backends",
+    "SQLiteBackend": "backends",
+    "CacheInfo": "cache",
+    "DiskCache": "cache",
+    "LRUCache": "cache",
+    "TieredCache": "cache",
+    "Snapshot": "snapshot",
+    "matches_db": "snapshot",
+    "snapshot_path": "snapshot",
+    "ServiceStats": "stats",
+}
+
+
+def __getattr__(name: str) -> Any:
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module("." + module, __package__), name)
+    globals()[name] = value
+    return value
+
+
+_PACKAGE_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "zip2addr.db")
+
 
 def _get_db_path() -> str:
+    # A regular install keeps the DB next to this module; checking for it
+    # first avoids importing importlib.resources on every CLI start
+    if os.path.exists(_PACKAGE_DB):
+        return _PACKAGE_DB
+    import importlib.resources
+
     # Use importlib.resources to locate the bundled DB safely even when
     # installed from a wheel (which may store package data in zip files).
     db_resource = importlib.resources.files("zip2addr").joinpath("zip2addr.db")
@@ -19,13 +103,76 @@ def _get_db_path() -> str:
         return str(p)
 
 
+def _file_id(path: str) -> Optional[Tuple[int, int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+# (file ids of the bundled DB and snapshot, snapshot if it matches the DB)
+_bundled: Optional[Tuple[Tuple[Any, Any], Optional["Snapshot"]]] = None
+
+
+def _bundled_snapshot() -> Optional["Snapshot"]:
+    # Shipped next to the bundled DB when generated with --snapshot and used
+    # by lookup()/lookup_many() without a db_path. Two stat() calls per use
+    # notice a rebuilt or updated DB or a rewritten snapshot; the snapshot is
+    # then mapped again, and only used while it matches the DB.
+    global _bundled
+    db_path = _get_db_path()
+    # snapshot_path() of the bundled .db, without loading zip2addr.snapshot
+    # where no snapshot is shipped
+    path = os.path.splitext(db_path)[0] + ".snap"
+    ids = (_file_id(db_path), _file_id(path))
+    state = _bundled
+    if state is not None and state[0] == ids:
+        return state[1]
+    snapshot = None
+    if None not in ids:
+        from .snapshot import Snapshot, matches_db
+
+        try:
+            snapshot = Snapshot(path)
+        except (OSError, ValueError) as e:
+            logger.debug("Cannot use snapshot %s: %s", path, e)
+        if snapshot is not None and not matches_db(snapshot, db_path):
+            logger.debug("Snapshot %s does not match %s", path, db_path)
+            snapshot.close()
+            snapshot = None
+    if snapshot is not None:
+        logger.debug("Using snapshot: %s", path)
+    # Snapshots handed out earlier stay mapped until they are collected
+    _bundled = (ids, snapshot)
+    return snapshot
+
+
+_DIGITS = frozenset("0123456789")
+# Full-width digits become ASCII; hyphens/dashes, spaces and the postal mark
+# are dropped. Any other character is dropped by the slow path.
+_POSTAL_TABLE = str.maketrans(
+    "０１２３４５６７８９",
+    "0123456789",
+    "-－‐‑‒–—―−ｰー 　〒",
+)
+
+
 def _normalize_postal(postal_code: str) -> str:
-    # Normalize unicode, convert full-width to half-width where applicable, remove non-digits
-    s = unicodedata.normalize("NFKC", postal_code)
-    # keep only digits
-    normalized = "".join(ch for ch in s if ch.isdigit())
-    logger.debug(f"Normalized postal code: {postal_code} -> {normalized}")
-    return normalized
+    # Fast path: plain ASCII input such as "1000001" or "100-0001", and
+    # full-width input such as "１００－０００１", via one str.translate call
+    s = postal_code.translate(_POSTAL_TABLE)
+    if s.isascii() and s.isdigit():
+        return s
+    # Keep ASCII digits only. This is checked on the characters as given, not
+    # after NFKC: that would turn "²", "①" or "⓪" into digits too, and
+    # str.isdigit() also accepts digits of other scripts such as "١"
+    return "".join(ch for ch in s if ch in _DIGITS)
+
+
+def _is_valid_postal(key: str) -> bool:
+    # Normalized keys only contain ASCII digits; Japanese postal codes have 7
+    return len(key) == 7
 
 
 def lookup(postal_code: str, db_path: Optional[str] = None) -> List[Zip2Addr]:
@@ -35,38 +182,715 @@ def lookup(postal_code: str, db_path: Optional[str] = None) -> List[Zip2Addr]:
         postal_code: postal code string (with or without hyphen, full/half width allowed)
         db_path: optional path to sqlite DB; if omitted use bundled db
     """
-    logger.debug(f"Looking up postal code: {postal_code}")
+    logger.debug("Looking up postal code: %s", postal_code)
     if not postal_code:
         logger.debug("Empty postal code provided")
         return []
     key = _normalize_postal(postal_code)
+    if not _is_valid_postal(key):
+        logger.debug("Invalid postal code: %s", postal_code)
+        return []
+    snapshot = None if db_path else _bundled_snapshot()
+    if snapshot is not None:
+        return list(snapshot.get(key))
     db = db_path or _get_db_path()
-    logger.debug(f"Using database: {db}")
+    logger.debug("Using database: %s", db)
     if not os.path.exists(db):
-        logger.debug(f"Database file not found: {db}")
+        logger.debug("Database file not found: %s", db)
         return []
     results: List[Zip2Addr] = []
     with sqlite3.connect(db) as conn:
         cur = conn.cursor()
-        logger.debug(f"Querying database for zipcode: {key}")
-        cur.execute(
-            "SELECT zipcode, jis_code, old_postal_code, pref_kana, city_kana, town_kana, prefecture, city, town, multiple_postal, koaza, chome, multiple_town, update_status, change_reason FROM postal WHERE zipcode = ?",
-            (key,),
-        )
+        logger.debug("Querying database for zipcode: %s", key)
+        cur.execute(queries_for(conn).select_one, (key,))
         rows = cur.fetchall()
-        logger.debug(f"Found {len(rows)} result(s)")
+        logger.debug("Found %d result(s)", len(rows))
         for r in rows:
             results.append(Zip2Addr.from_row(r))
     return results
 
 
+def _read_build_id(db_path: str) -> Optional[str]:
+    try:
+        with closing(sqlite3.connect(_readonly_uri(db_path), uri=True)) as conn:
+            build = read_build_id(conn)
+    except sqlite3.Error:  # e.g. a snapshot without its DB
+        build = None
+    if build is None:
+        # DBs without a build id may be rewritten under the same data
+        # version; any rebuild or update changes the file
+        file_id = _file_id(db_path)
+        if file_id is None:
+            return None
+        build = "{:x}-{:x}-{:x}".format(*file_id)
+    return build
+
+
+def _cache_version(db_path: str) -> str:
+    """Identify the data in ``db_path`` for keying persistent caches."""
+    with closing(sqlite3.connect(_readonly_uri(db_path), uri=True)) as conn:
+        schema = read_version(conn)
+        data = read_data_version(conn)
+    # Entries pickled before Zip2Addr gained a field would load without it
+    n_fields = len(Zip2Addr.__slots__)
+    return f"{n_fields}:{schema}:{data}:{_read_build_id(db_path)}"
+
+
+def _read_data_version(db_path: str) -> Optional[str]:
+    try:
+        with closing(sqlite3.connect(_readonly_uri(db_path), uri=True)) as conn:
+            version = read_data_version(conn)
+    except sqlite3.Error:  # e.g. a snapshot without its DB
+        version = None
+    if version is None and os.path.abspath(db_path) == _PACKAGE_DB:
+        # Bundled DBs built before the meta table: use the release's stamp
+        try:
+            from .data_version import DATA_DATE  # type: ignore[import-not-found]
+        except ImportError:
+            return None
+        return str(DATA_DATE) or None
+    return version
+
+
+def _normalize_keys(postal_codes: Iterable[str]) -> List[str]:
+    # Inputs repeat heavily in bulk jobs, so normalize each distinct string once
+    memo: Dict[str, str] = {}
+    keys = []
+    for code in postal_codes:
+        key = memo.get(code)
+        if key is None:
+            key = _normalize_postal(code) if code else ""
+            # Invalid codes map to "", which is never queried
+            if not _is_valid_postal(key):
+                key = ""
+            memo[code] = key
+        keys.append(key)
+    return keys
+
+
+def lookup_many(
+    postal_codes: Iterable[str],
+    db_path: Optional[str] = None,
+    chunk_size: int = _CHUNK_SIZE,
+) -> List[List[Zip2Addr]]:
+    """Lookup many postal codes over a single connection.
+
+    Inputs are normalized and de-duplicated, then fetched ``chunk_size`` codes
+    per query.
+
+    Args:
+        postal_codes: iterable of postal code strings
+        db_path: optional path to sqlite DB; if omitted use bundled db
+        chunk_size: number of distinct codes per query
+
+    Returns:
+        One list of Zip2Addr per input, in input order.
+    """
+    keys = _normalize_keys(postal_codes)
+    snapshot = None if db_path else _bundled_snapshot()
+    if snapshot is not None:
+        found = snapshot.get_many([k for k in dict.fromkeys(keys) if k])
+        return [list(found.get(k, ())) for k in keys]
+    db = db_path or _get_db_path()
+    if not os.path.exists(db):
+        logger.debug("Database file not found: %s", db)
+        return [[] for _ in keys]
+    from .backends import _fetch_many
+
+    unique = [k for k in dict.fromkeys(keys) if k]
+    with closing(sqlite3.connect(db)) as conn:
+        found = _fetch_many(conn, queries_for(conn), unique, chunk_size)
+    logger.debug(
+        "Found %d of %d distinct postal code(s)", len(found), len(unique)
+    )
+    return [list(found.get(k, ())) for k in keys]
+
+
 class Zip2AddrService:
-    """Service wrapper for DB path and caching."""
+    """Service wrapper for DB path and caching.
 
-    def __init__(self, db_path: Optional[str] = None):
+    The backend is opened on first use and reused across calls. With the
+    default ``"sqlite"`` backend lookups share a pool of read-only connections
+    instead of connecting per call like the module-level ``lookup``; the
+    ``"memory"`` backend loads the whole DB into a dict once, and the
+    ``"snapshot"`` backend memory-maps the binary snapshot stored next to the
+    DB (see ``zip2addr.snapshot``), and the ``"shared"`` backend reads one
+    copy of it held in shared memory by pre-forked workers (see
+    ``zip2addr.shared``). Call ``close()``
+    (or use the service as a context manager) to release it; a closed service
+    reopens its backend on the next lookup.
+
+    Results from the SQLite backend are kept in a bounded LRU cache keyed by
+    the normalized postal code, including empty results for codes with no
+    match. With ``disk_cache`` they are also written through to a
+    ``DiskCache`` file that later processes on the host read from, keyed by
+    the DB's data version so that a changed DB never serves stale results
+    (see ``zip2addr.cache``). The memory, snapshot and shared backends are
+    not cached. ``lookup_json``
+    keeps the rendered JSON of each zipcode in a second cache of the same size,
+    whatever the backend.
+
+    With ``stats`` enabled, ``service.stats`` collects counters (lookups,
+    cache hits and misses, rows returned) and latency histograms per stage:
+    normalization, connection acquire, query and row conversion; see
+    ``zip2addr.stats``. When disabled no clocks are read.
+
+    Args:
+        db_path: optional path to sqlite DB; if omitted use bundled db
+        pool_size: number of idle connections kept for reuse
+        cache_size: maximum number of cached postal codes; 0 disables caching
+        cache_ttl: optional lifetime of a cached result in seconds
+        backend: ``"sqlite"``, ``"memory"``, ``"snapshot"`` or ``"shared"``
+        stats: True or a ServiceStats to record instrumentation into
+        disk_cache: optional path of a cache file shared with other processes
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        pool_size: int = 4,
+        cache_size: int = 1024,
+        cache_ttl: Optional[float] = None,
+        backend: str = "sqlite",
+        stats: Union[bool, "ServiceStats"] = False,
+        disk_cache: Optional[str] = None,
+    ):
+        if backend not in _BACKENDS:
+            raise ValueError(
+                f"Unknown backend: {backend!r} (expected one of {list(_BACKENDS)})"
+            )
         self.db_path = db_path or _get_db_path()
-        logger.debug(f"Initialized Zip2AddrService with db_path: {self.db_path}")
+        self.pool_size = pool_size
+        self.backend_name = backend
+        self._backend: Optional["Backend"] = None
+        self._matcher: Optional["AddressMatcher"] = None
+        self._columnar: Optional["ColumnarIndex"] = None
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.disk_cache = disk_cache
+        self._data_version: Optional[str] = None
+        self._build_id: Optional[str] = None
+        self._cache = self._new_cache(self.db_path)
+        self._json_cache = self._new_json_cache()
+        self._watcher: Optional[threading.Event] = None
+        from .stats import ServiceStats
+
+        if isinstance(stats, ServiceStats):
+            self.stats: Optional[ServiceStats] = stats
+        else:
+            self.stats = ServiceStats() if stats else None
+        self._lock = threading.Lock()
+        logger.debug("Initialized Zip2AddrService with db_path: %s", self.db_path)
+
+    def _backend_class(self) -> Any:
+        from . import backends
+
+        return getattr(backends, _BACKENDS[self.backend_name])
+
+    def _new_cache(self, db_path: str) -> Optional["Cache"]:
+        if not self._backend_class().cacheable:
+            return None
+        from .cache import DiskCache, LRUCache, TieredCache
+
+        memory = (
+            LRUCache(self.cache_size, self.cache_ttl) if self.cache_size > 0 else None
+        )
+        if self.disk_cache is None or not os.path.exists(db_path):
+            return memory
+        disk = DiskCache(self.disk_cache, _cache_version(db_path))
+        return TieredCache([memory, disk] if memory is not None else [disk])
+
+    def _new_json_cache(self) -> Optional["LRUCache"]:
+        if self.cache_size > 0:
+            from .cache import LRUCache
+
+            return LRUCache(self.cache_size, self.cache_ttl)
+        return None
+
+    def _open_backend(self, db_path: str) -> Optional["Backend"]:
+        from .snapshot import snapshot_path
+
+        path = db_path
+        if self.backend_name == "snapshot":
+            path = snapshot_path(path)
+        if not os.path.exists(path):
+            logger.debug("Database file not found: %s", path)
+            return None
+        cls = self._backend_class()
+        backend: Backend
+        if self.backend_name == "snapshot":
+            backend = cls(path, db_path)
+        elif self.backend_name == "shared":
+            backend = cls(path)
+        elif self.backend_name == "memory":
+            backend = cls(db_path)
+        else:
+            backend = cls(db_path, self.pool_size)
+        backend.service_stats = self.stats
+        return backend
+
+    def _get_backend(self) -> Optional["Backend"]:
+        backend = self._backend
+        if backend is not None:
+            return backend
+        with self._lock:
+            if self._backend is None:
+                self._backend = self._open_backend(self.db_path)
+                if self._backend is not None:
+                    self._data_version = _read_data_version(self.db_path)
+                    self._build_id = _read_build_id(self.db_path)
+            return self._backend
+
+    @property
+    def data_version(self) -> Optional[str]:
+        """Japan Post data version of the DB being served.
+
+        This is the version recorded by ``generate_db.py``/``update_db.py``
+        (e.g. "20241031"), or ``DATA_DATE`` of the release for a bundled DB
+        without one; None if unknown. Before the backend is loaded it is read
+        from the file at ``db_path``.
+        """
+        if self._backend is None:
+            return _read_data_version(self.db_path)
+        return self._data_version
+
+    @property
+    def build_id(self) -> Optional[str]:
+        """Identifies the build of the DB being served.
+
+        Unlike ``data_version`` it changes whenever the DB is rebuilt or
+        updated, even from the same data: it is the id recorded by
+        ``generate_db.py``/``update_db.py``, or a token for the file for DBs
+        without one; None without a DB. Like ``data_version`` it is read from
+        the file at ``db_path`` before the backend is loaded.
+        """
+        if self._backend is None:
+            return _read_build_id(self.db_path)
+        return self._build_id
+
+    @property
+    def backend(self) -> Optional["Backend"]:
+        """The loaded backend (loading it if needed), or None without a DB."""
+        return self._get_backend()
 
     def lookup(self, postal_code: str) -> List[Zip2Addr]:
-        logger.debug(f"Service lookup called for: {postal_code}")
-        return lookup(postal_code, db_path=self.db_path)
+        logger.debug("Service lookup called for: %s", postal_code)
+        if self.stats is not None:
+            return self._lookup_timed(postal_code, self.stats)
+        if not postal_code:
+            return []
+        key = _normalize_postal(postal_code)
+        if not _is_valid_postal(key):
+            return []
+        return list(self._get(key))
+
+    def _lookup_timed(
+        self, postal_code: str, stats: "ServiceStats"
+    ) -> List[Zip2Addr]:
+        clock = time.perf_counter
+        start = clock()
+        key = _normalize_postal(postal_code) if postal_code else ""
+        normalized = clock()
+        if not _is_valid_postal(key):
+            stats.record(
+                (("normalize", normalized - start),), (("lookups", 1), ("invalid", 1))
+            )
+            return []
+        counts = [("lookups", 1)]
+        # Same as _peek, with the cache counters batched into one record() call
+        cache = self._cache
+        if cache is not None:
+            results = cache.get(key)
+            counts.append(("cache_hits" if results is not None else "cache_misses", 1))
+        else:
+            results = self._peek(key)
+        if results is None:
+            results = self._fetch(key)
+        counts.append(("rows", len(results)))
+        stats.record(
+            (("normalize", normalized - start), ("lookup", clock() - start)), counts
+        )
+        return list(results)
+
+    def _peek(self, key: str) -> Optional["Results"]:
+        """Return results for a valid key if they need no DB access, else None."""
+        cache = self._cache
+        if cache is not None:
+            results = cache.get(key)
+            if self.stats is not None:
+                hit = results is not None
+                self.stats.incr("cache_hits" if hit else "cache_misses")
+            return results
+        backend = self._backend
+        if backend is not None and not backend.cacheable:
+            return backend.get(key)
+        return None
+
+    def _get(self, key: str) -> "Results":
+        results = self._peek(key)
+        return self._fetch(key) if results is None else results
+
+    def _fetch(self, key: str) -> "Results":
+        # Read before the backend: see reload()
+        cache = self._cache
+        backend = self._get_backend()
+        if backend is None:
+            return ()
+        results = backend.get(key)
+        if cache is not None:
+            cache.put(key, results)
+        return results
+
+    def lookup_many(
+        self, postal_codes: Iterable[str], chunk_size: int = _CHUNK_SIZE
+    ) -> List[List[Zip2Addr]]:
+        """Lookup many postal codes; see module-level ``lookup_many``.
+
+        Cached codes are served from the cache and the rest are fetched from
+        the backend in one call.
+        """
+        stats = self.stats
+        if stats is None:
+            return self._lookup_many(postal_codes, chunk_size)
+        start = time.perf_counter()
+        results = self._lookup_many(postal_codes, chunk_size)
+        stats.incr("lookup_many_codes", len(results))
+        stats.incr("rows", sum(len(r) for r in results))
+        stats.observe("lookup_many", time.perf_counter() - start)
+        return results
+
+    def _lookup_many(
+        self, postal_codes: Iterable[str], chunk_size: int
+    ) -> List[List[Zip2Addr]]:
+        keys = _normalize_keys(postal_codes)
+        cache = self._cache
+        backend = self._get_backend()
+        if backend is None:
+            return [[] for _ in keys]
+        results: Dict[str, "Results"] = {"": ()}
+        missing = []
+        for key in dict.fromkeys(keys):
+            if key in results:
+                continue
+            cached = cache.get(key) if cache is not None else None
+            if cached is not None:
+                results[key] = cached
+            else:
+                missing.append(key)
+        if cache is not None and self.stats is not None:
+            self.stats.incr("cache_misses", len(missing))
+            self.stats.incr("cache_hits", len(results) - 1)
+        if missing:
+            found = backend.get_many(missing, chunk_size)
+            for key in missing:
+                res = found.get(key, ())
+                results[key] = res
+                if cache is not None:
+                    cache.put(key, res)
+        return [list(results[k]) for k in keys]
+
+    def lookup_json(self, postal_code: str, as_list: bool = False) -> bytes:
+        """Return the UTF-8 JSON of a lookup, as the CLI or server emit it.
+
+        By default this is the CLI form: ``null``, one object, or a list for
+        zipcodes with several rows. With ``as_list`` it is always a list.
+        The JSON is rendered from DB rows without building Zip2Addr objects
+        and memoized per zipcode.
+        """
+        key = _normalize_postal(postal_code) if postal_code else ""
+        if not _is_valid_postal(key):
+            return NOT_FOUND[as_list]
+        cache = self._json_cache
+        rendered = cache.get(key) if cache is not None else None
+        if rendered is None:
+            rendered = self._render([key], _CHUNK_SIZE, cache)[key]
+        elif self.stats is not None:
+            self.stats.incr("json_cache_hits")
+        return rendered[as_list]
+
+    def lookup_json_many(
+        self,
+        postal_codes: Iterable[str],
+        as_list: bool = False,
+        chunk_size: int = _CHUNK_SIZE,
+    ) -> List[bytes]:
+        """``lookup_json`` for many codes; uncached codes are fetched at once."""
+        keys = _normalize_keys(postal_codes)
+        cache = self._json_cache
+        rendered: Dict[str, Rendered] = {"": NOT_FOUND}
+        missing = []
+        for key in dict.fromkeys(keys):
+            if key in rendered:
+                continue
+            cached = cache.get(key) if cache is not None else None
+            if cached is not None:
+                rendered[key] = cached
+            else:
+                missing.append(key)
+        if self.stats is not None:
+            self.stats.incr("json_cache_hits", len(rendered) - 1)
+        if missing:
+            rendered.update(self._render(missing, chunk_size, cache))
+        return [rendered[k][as_list] for k in keys]
+
+    def _render(
+        self, keys: List[str], chunk_size: int, cache: Optional["LRUCache"]
+    ) -> Dict[str, Rendered]:
+        backend = self._get_backend()
+        found = backend.get_dicts(keys, chunk_size) if backend is not None else {}
+        rendered = {}
+        for key in keys:
+            r = rendered[key] = render(found.get(key, ()))
+            if cache is not None:
+                cache.put(key, r)
+        if self.stats is not None:
+            self.stats.incr("json_cache_misses", len(keys))
+        return rendered
+
+    def iter_search(
+        self,
+        zipcode: Optional[str] = None,
+        *,
+        prefecture: Optional[str] = None,
+        city: Optional[str] = None,
+        town: Optional[str] = None,
+        pref_kana: Optional[str] = None,
+        city_kana: Optional[str] = None,
+        town_kana: Optional[str] = None,
+        prefix: bool = False,
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> Iterator[Zip2Addr]:
+        """Stream addresses matching all given criteria, ordered by zipcode.
+
+        Args:
+            zipcode: leading digits of the postal code (normalized like lookup)
+            prefecture, city, town, pref_kana, city_kana, town_kana: values the
+                address fields must equal, or start with when ``prefix`` is set
+            prefix: match the text criteria by prefix instead of exactly
+            limit: maximum number of results
+            offset: number of matching results to skip
+        """
+        criteria = {
+            name: value
+            for name, value in (
+                ("prefecture", prefecture),
+                ("city", city),
+                ("town", town),
+                ("pref_kana", pref_kana),
+                ("city_kana", city_kana),
+                ("town_kana", town_kana),
+            )
+            if value is not None
+        }
+        if zipcode is not None:
+            key = _normalize_postal(zipcode)
+            if (zipcode and not key) or len(key) > 7:
+                return iter(())
+            criteria["zipcode"] = key
+        backend = self._get_backend()
+        if backend is None:
+            return iter(())
+        return backend.search(criteria, prefix, limit, offset)
+
+    def search(
+        self, zipcode: Optional[str] = None, *, limit: Optional[int] = 100, **kwargs
+    ) -> List[Zip2Addr]:
+        """Return one page of ``iter_search`` results (100 by default)."""
+        return list(self.iter_search(zipcode, limit=limit, **kwargs))
+
+    @property
+    def matcher(self) -> Optional["AddressMatcher"]:
+        """The address matcher (loading it if needed), or None without a DB."""
+        matcher = self._matcher
+        if matcher is not None:
+            return matcher
+        with self._lock:
+            if self._matcher is None and os.path.exists(self.db_path):
+                from .matcher import AddressMatcher
+
+                self._matcher = AddressMatcher.from_db(self.db_path)
+            return self._matcher
+
+    def match(self, address: str, limit: int = 10) -> List["Match"]:
+        """Return rows best matching a free-text address, best first.
+
+        Tolerates variant kanji, missing 丁目 and street numbers, and typos;
+        see ``AddressMatcher``. The index is loaded on first use.
+        """
+        from .matcher import Match
+
+        matcher = self.matcher
+        if matcher is None:
+            return []
+        candidates = matcher.candidates(address, limit)
+        found = self.lookup_many([doc.zipcode for doc, _ in candidates])
+        matches = []
+        for (doc, score), rows in zip(candidates, found):
+            if doc.ordinal < len(rows):
+                matches.append(Match(rows[doc.ordinal], score))
+        return matches
+
+    @property
+    def columnar_index(self) -> Optional["ColumnarIndex"]:
+        """The columnar index (loading it if needed), or None without a DB."""
+        columnar = self._columnar
+        if columnar is not None:
+            return columnar
+        with self._lock:
+            if self._columnar is None and os.path.exists(self.db_path):
+                from .columnar import ColumnarIndex
+
+                self._columnar = ColumnarIndex.from_db(self.db_path)
+            return self._columnar
+
+    def lookup_columns(
+        self, postal_codes: Iterable, numpy: Optional[bool] = None
+    ) -> "Columns":
+        """Return JIS code, prefecture, city and town columns for many codes.
+
+        Meant for millions of codes: no Zip2Addr is built and the cache is
+        bypassed; see ``zip2addr.columnar``. The index is loaded on first use.
+        """
+        index = self.columnar_index
+        if index is None:
+            from .columnar import ColumnarIndex
+
+            index = ColumnarIndex.from_rows(())
+        return index.lookup(postal_codes, numpy)
+
+    def cache_info(self) -> "CacheInfo":
+        """Return hit/miss/eviction counters and the current cache size."""
+        if self._cache is None:
+            from .cache import CacheInfo
+
+            return CacheInfo(0, 0, 0, 0, 0)
+        return self._cache.info()
+
+    def cache_tier_info(self) -> List["CacheInfo"]:
+        """Return the counters of each cache tier, in-process tier first."""
+        from .cache import TieredCache
+
+        if isinstance(self._cache, TieredCache):
+            return self._cache.tier_info()
+        return [self.cache_info()] if self._cache is not None else []
+
+    def cache_clear(self) -> None:
+        if self._cache is not None:
+            self._cache.clear()
+        if self._json_cache is not None:
+            self._json_cache.clear()
+
+    def reload(self, db_path: Optional[str] = None) -> None:
+        """Switch to the current contents of ``db_path`` (default: the same path).
+
+        ``scripts/update_db.py`` and ``generate_db.py`` replace the DB file
+        rather than write to it, so an open backend keeps serving the old
+        data until it is reloaded. The new backend is opened (for the memory
+        backend, loaded) before it replaces the old one, so lookups never
+        wait for it; lookups already running finish against the old backend,
+        which is released when the last of them returns. The caches start
+        empty, and the disk cache, if any, switches to the new data version;
+        the previous one's connection is closed.
+
+        With the shared backend each process loads its own copy of the new
+        index; preload it again in the parent to share it with new workers.
+        """
+        path = db_path or self.db_path
+        if self.backend_name == "shared":
+            # preload() would return the index of the replaced file
+            from .shared import release
+
+            release(path)
+        backend = self._open_backend(path)
+        version = _read_data_version(path) if backend is not None else None
+        build_id = _read_build_id(path) if backend is not None else None
+        cache = self._new_cache(path)
+        json_cache = self._new_json_cache()
+        with self._lock:
+            # Lookups read the cache before the backend, so one that sees the
+            # new cache also uses the new backend and never fills it with old
+            # results. The old backend is left to the lookups still using it.
+            self._backend = backend
+            self.db_path = path
+            self._data_version = version
+            self._build_id = build_id
+            old_cache, self._cache = self._cache, cache
+            self._json_cache = json_cache
+            self._matcher = None
+            self._columnar = None
+        from .cache import TieredCache
+
+        if isinstance(old_cache, TieredCache):
+            # Release the disk cache's connection. A lookup still holding the
+            # old cache reconnects, and that connection goes with the cache.
+            old_cache.close()
+        logger.debug("Reloaded %s (data version %s)", path, version)
+
+    def watch(self, interval: float = 60.0) -> None:
+        """Reload whenever the DB file or its snapshot is replaced.
+
+        A daemon thread compares the files' inode, size and mtime every
+        ``interval`` seconds and calls ``reload()`` once a change has held
+        for one more interval, so a DB and snapshot written one after the
+        other (as by ``update_db.py``) are picked up together. A failed
+        reload is logged and the old data kept. ``close()`` stops watching.
+        """
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        stop = threading.Event()
+        # Taken now, so a file replaced right after this call is noticed
+        state = self._file_state()
+        with self._lock:
+            previous, self._watcher = self._watcher, stop
+        if previous is not None:
+            previous.set()
+        threading.Thread(
+            target=self._watch,
+            args=(stop, interval, state),
+            name="zip2addr-watch",
+            daemon=True,
+        ).start()
+
+    def _file_state(self) -> Tuple[Optional[Tuple[int, int, int]], ...]:
+        from .snapshot import snapshot_path
+
+        return (_file_id(self.db_path), _file_id(snapshot_path(self.db_path)))
+
+    def _watch(
+        self, stop: threading.Event, interval: float, state: Tuple[Any, ...]
+    ) -> None:
+        pending = None
+        while not stop.wait(interval):
+            current = self._file_state()
+            if current == state or current != pending:
+                # Unchanged, or changed since the last check: wait for it to settle
+                pending = None if current == state else current
+                continue
+            try:
+                self.reload()
+            except Exception as e:
+                logger.warning("Reloading %s failed: %s", self.db_path, e)
+            state = current
+            pending = None
+
+    def close(self) -> None:
+        with self._lock:
+            backend, self._backend = self._backend, None
+            self._matcher = None
+            self._columnar = None
+            watcher, self._watcher = self._watcher, None
+        if watcher is not None:
+            watcher.set()
+        if backend is not None:
+            backend.close()
+        from .cache import TieredCache
+
+        if isinstance(self._cache, TieredCache):
+            self._cache.close()
+
+    def __enter__(self) -> "Zip2AddrService":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,373 @@
+import dataclasses
+import logging
+import sqlite3
+import sys
+import time
+from contextlib import closing
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from .models import Zip2Addr
+from .pool import ConnectionPool, _readonly_uri
+from .render import row_dict
+from .schema import _CHUNK_SIZE, Queries, queries_for
+from .shared import preload
+from .snapshot import Snapshot, build_snapshot, matches_db
+from .stats import ServiceStats
+
+logger = logging.getLogger(__name__)
+
+Results = Tuple[Zip2Addr, ...]
+
+
+def _fetch_many(
+    conn: sqlite3.Connection,
+    queries: Queries,
+    keys: Sequence[str],
+    chunk_size: int = _CHUNK_SIZE,
+    convert: Callable[[Sequence], Any] = Zip2Addr.from_row,
+) -> Dict[str, List[Any]]:
+    """Fetch rows for distinct keys with one ``IN (...)`` query per chunk.
+
+    Rows are passed through ``convert`` (building Zip2Addr by default).
+    """
+    found: Dict[str, List[Any]] = {}
+    for i in range(0, len(keys), chunk_size):
+        chunk = keys[i : i + chunk_size]
+        # Full chunks share the same SQL text and so the same prepared statement
+        sql = queries.select_in.format(",".join("?" * len(chunk)))
+        for r in conn.execute(sql, chunk):
+            found.setdefault(r[0], []).append(convert(r))
+    return found
+
+
+def _prefix_upper(prefix: str) -> str:
+    # Smallest string greater than every string starting with prefix, so that
+    # "col >= prefix AND col < upper" is an index range scan
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _search_sql(
+    queries: Queries,
+    criteria: Dict[str, str],
+    prefix: bool,
+    limit: Optional[int],
+    offset: int,
+) -> Tuple[str, List]:
+    where = []
+    params: List = []
+    for name, value in criteria.items():
+        col = queries.fields[name]
+        if name == "zipcode" or prefix:
+            if value:
+                where.append(f"{col} >= ? AND {col} < ?")
+                params += [value, _prefix_upper(value)]
+        else:
+            where.append(f"{col} = ?")
+            params.append(value)
+    sql = queries.columns
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += queries.order
+    if limit is not None or offset:
+        sql += " LIMIT ? OFFSET ?"
+        params += [-1 if limit is None else limit, offset]
+    return sql, params
+
+
+class SQLiteBackend:
+    """Query the SQLite DB through a pool of read-only connections."""
+
+    name = "sqlite"
+    # Every lookup costs a query, so results are worth caching
+    cacheable = True
+    # Set by Zip2AddrService when instrumentation is enabled
+    service_stats: Optional[ServiceStats] = None
+
+    def __init__(self, db_path: str, pool_size: int = 4):
+        self.db_path = db_path
+        self.pool = ConnectionPool(db_path, size=pool_size)
+        with self.pool.connection() as conn:
+            self.queries = queries_for(conn)
+
+    def get(self, key: str) -> Results:
+        stats = self.service_stats
+        if stats is not None:
+            return self._get_timed(key, stats)
+        with self.pool.connection() as conn:
+            rows = conn.execute(self.queries.select_one, (key,)).fetchall()
+        return tuple(Zip2Addr.from_row(r) for r in rows)
+
+    def _get_timed(self, key: str, stats: ServiceStats) -> Results:
+        clock = time.perf_counter
+        t0 = clock()
+        conn = self.pool.acquire()
+        t1 = clock()
+        try:
+            rows = conn.execute(self.queries.select_one, (key,)).fetchall()
+        finally:
+            self.pool.release(conn)
+        t2 = clock()
+        results = tuple(Zip2Addr.from_row(r) for r in rows)
+        t3 = clock()
+        stats.record((("acquire", t1 - t0), ("query", t2 - t1), ("convert", t3 - t2)))
+        return results
+
+    def get_many(
+        self, keys: Sequence[str], chunk_size: int = _CHUNK_SIZE
+    ) -> Dict[str, Results]:
+        stats = self.service_stats
+        if stats is None:
+            with self.pool.connection() as conn:
+                found = _fetch_many(conn, self.queries, keys, chunk_size)
+            return {k: tuple(v) for k, v in found.items()}
+        clock = time.perf_counter
+        t0 = clock()
+        conn = self.pool.acquire()
+        t1 = clock()
+        try:
+            # Rows are converted while fetching, so "query" includes it here
+            found = _fetch_many(conn, self.queries, keys, chunk_size)
+        finally:
+            self.pool.release(conn)
+        stats.record((("acquire", t1 - t0), ("query", clock() - t1)))
+        return {k: tuple(v) for k, v in found.items()}
+
+    def get_dicts(
+        self, keys: Sequence[str], chunk_size: int = _CHUNK_SIZE
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """Like ``get_many`` but return ``to_dict()`` mappings, built from rows."""
+        with self.pool.connection() as conn:
+            return _fetch_many(conn, self.queries, keys, chunk_size, row_dict)
+
+    def search(
+        self,
+        criteria: Dict[str, str],
+        prefix: bool = False,
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> Iterator[Zip2Addr]:
+        sql, params = _search_sql(self.queries, criteria, prefix, limit, offset)
+        # The connection stays checked out until the caller finishes iterating
+        with self.pool.connection() as conn:
+            for r in conn.execute(sql, params):
+                yield Zip2Addr.from_row(r)
+
+    def close(self) -> None:
+        self.pool.close()
+
+
+def _scan(
+    groups: Iterable[Tuple[str, Results]],
+    criteria: Dict[str, str],
+    prefix: bool,
+    limit: Optional[int],
+    offset: int,
+) -> Iterator[Zip2Addr]:
+    """Filter (zipcode, rows) groups given in zipcode order by ``criteria``."""
+    zip_prefix = criteria.get("zipcode", "")
+    others = [(n, v) for n, v in criteria.items() if n != "zipcode"]
+    skipped = 0
+    produced = 0
+    for key, rows in groups:
+        if not key.startswith(zip_prefix):
+            continue
+        for r in rows:
+            if prefix:
+                match = all((getattr(r, n) or "").startswith(v) for n, v in others)
+            else:
+                match = all(getattr(r, n) == v for n, v in others)
+            if not match:
+                continue
+            if skipped < offset:
+                skipped += 1
+                continue
+            if limit is not None and produced >= limit:
+                return
+            produced += 1
+            yield r
+
+
+def _to_dicts(found: Dict[str, Results]) -> Dict[str, List[Dict[str, Any]]]:
+    return {k: [r.to_dict() for r in rows] for k, rows in found.items()}
+
+
+def _deep_sizeof(index: Dict[str, Results]) -> int:
+    """Approximate bytes held by the index, counting shared objects once."""
+    names = [f.name for f in dataclasses.fields(Zip2Addr)]
+    seen = set()
+    total = sys.getsizeof(index)
+    for key, rows in index.items():
+        objs = [key, rows]
+        for r in rows:
+            objs.append(r)
+            objs.append(getattr(r, "__dict__", None))
+            objs.extend(getattr(r, n) for n in names)
+        for o in objs:
+            if o is not None and id(o) not in seen:
+                seen.add(id(o))
+                total += sys.getsizeof(o)
+    return total
+
+
+class MemoryBackend:
+    """Hold the whole DB in a dict keyed by zipcode.
+
+    The table is read once when the backend is created; afterwards ``get`` is a
+    single dict probe returning already built Zip2Addr instances.
+    """
+
+    name = "memory"
+    # A dict probe is as cheap as a cache hit
+    cacheable = False
+    service_stats: Optional[ServiceStats] = None
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        start = time.perf_counter()
+        grouped: Dict[str, List[Zip2Addr]] = {}
+        with closing(sqlite3.connect(_readonly_uri(db_path), uri=True)) as conn:
+            for r in conn.execute(queries_for(conn).select_all):
+                grouped.setdefault(r[0], []).append(Zip2Addr.from_row(r))
+        self._index: Dict[str, Results] = {k: tuple(v) for k, v in grouped.items()}
+        self._sorted_keys: Optional[List[str]] = None
+        self.records = sum(len(v) for v in self._index.values())
+        self.load_time = time.perf_counter() - start
+        self.memory_bytes = _deep_sizeof(self._index)
+        logger.debug(
+            "Loaded %d record(s) into memory in %.3fs (%d bytes)",
+            self.records,
+            self.load_time,
+            self.memory_bytes,
+        )
+
+    def get(self, key: str) -> Results:
+        stats = self.service_stats
+        if stats is not None:
+            start = time.perf_counter()
+            results = self._index.get(key, ())
+            stats.observe("query", time.perf_counter() - start)
+            return results
+        return self._index.get(key, ())
+
+    def get_many(
+        self, keys: Sequence[str], chunk_size: int = _CHUNK_SIZE
+    ) -> Dict[str, Results]:
+        index = self._index
+        return {k: index[k] for k in keys if k in index}
+
+    def get_dicts(
+        self, keys: Sequence[str], chunk_size: int = _CHUNK_SIZE
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        return _to_dicts(self.get_many(keys))
+
+    def search(
+        self,
+        criteria: Dict[str, str],
+        prefix: bool = False,
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> Iterator[Zip2Addr]:
+        # No secondary indexes in memory: scan every record in zipcode order
+        if self._sorted_keys is None:
+            self._sorted_keys = sorted(self._index)
+        index = self._index
+        groups = ((k, index[k]) for k in self._sorted_keys)
+        return _scan(groups, criteria, prefix, limit, offset)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "records": self.records,
+            "keys": len(self._index),
+            "load_time": self.load_time,
+            "memory_bytes": self.memory_bytes,
+        }
+
+    def close(self) -> None:
+        self._index = {}
+
+
+class SnapshotBackend:
+    """Binary-search a memory-mapped snapshot written by ``write_snapshot``.
+
+    Opening is a single ``mmap`` call, so the first lookup costs about as much
+    as any other, and processes mapping the same file share its pages. Rows
+    are decoded only for the zipcodes looked up.
+    """
+
+    name = "snapshot"
+    # Decoding a few records is cheap, and a cache would keep pages of
+    # decoded objects per process that the mapping otherwise shares
+    cacheable = False
+    service_stats: Optional[ServiceStats] = None
+
+    def __init__(self, path: str, db_path: Optional[str] = None):
+        self.path = path
+        snapshot = Snapshot(path)
+        if db_path is not None and not matches_db(snapshot, db_path):
+            # Left behind by an earlier build of the DB: its rows are out of
+            # date, so index the DB in memory as the shared backend does
+            logger.warning("Snapshot %s does not match %s; rebuilding", path, db_path)
+            snapshot.close()
+            snapshot = Snapshot.from_bytes(build_snapshot(db_path)[0], path)
+        self.snapshot = snapshot
+        self.records = snapshot.n_records
+
+    def get(self, key: str) -> Results:
+        stats = self.service_stats
+        if stats is not None:
+            start = time.perf_counter()
+            results = self.snapshot.get(key)
+            # Decoding happens inside the snapshot, so it counts as query time
+            stats.observe("query", time.perf_counter() - start)
+            return results
+        return self.snapshot.get(key)
+
+    def get_many(
+        self, keys: Sequence[str], chunk_size: int = _CHUNK_SIZE
+    ) -> Dict[str, Results]:
+        return self.snapshot.get_many(keys)
+
+    def get_dicts(
+        self, keys: Sequence[str], chunk_size: int = _CHUNK_SIZE
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        return _to_dicts(self.snapshot.get_many(keys))
+
+    def search(
+        self,
+        criteria: Dict[str, str],
+        prefix: bool = False,
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> Iterator[Zip2Addr]:
+        # Zipcode criteria bound the scan; other fields are checked per row
+        groups = self.snapshot.iter_from(criteria.get("zipcode", ""))
+        return _scan(groups, criteria, prefix, limit, offset)
+
+    def close(self) -> None:
+        self.snapshot.close()
+
+
+class SharedBackend(SnapshotBackend):
+    """SnapshotBackend over the shared index of ``zip2addr.shared.preload``."""
+
+    name = "shared"
+
+    def __init__(self, db_path: str):
+        self.path = db_path
+        self.snapshot = preload(db_path)
+        self.records = self.snapshot.n_records
+
+    def close(self) -> None:
+        # The index is shared by every service in the process (and by forked
+        # workers); shared.release() drops it
+        pass
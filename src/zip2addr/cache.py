@@ -0,0 +1,271 @@
+"""Result caches for Zip2AddrService.
+
+``LRUCache`` is the in-process cache. ``DiskCache`` keeps results in a local
+SQLite file that short-lived processes on one host share, and
+``TieredCache`` chains tiers: lookups try each tier in order and copy a hit
+into the tiers before it, and stores write through to every tier. Any object
+with the ``CacheTier`` methods can be a tier.
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, List, NamedTuple, Optional, Protocol, Sequence
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    currsize: int
+    maxsize: int
+
+
+class LRUCache:
+    """Bounded, thread-safe LRU cache with an optional time-to-live.
+
+    Args:
+        maxsize: maximum number of entries; the least recently used entry is
+            evicted when full
+        ttl: optional lifetime of an entry in seconds
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        if maxsize < 1:
+            raise ValueError("maxsize must be >= 1")
+        if ttl is not None and ttl <= 0:
+            raise ValueError("ttl must be positive")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self._misses += 1
+                return default
+            expires, value = entry
+            if expires is not None and expires <= time.monotonic():
+                del self._data[key]
+                self._misses += 1
+                return default
+            self._data.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._hits = self._misses = self._evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(
+                self._hits, self._misses, self._evictions, len(self._data), self.maxsize
+            )
+
+
+class CacheTier(Protocol):
+    def get(self, key: Hashable, default: Any = None) -> Any: ...
+
+    def put(self, key: Hashable, value: Any) -> None: ...
+
+    def clear(self) -> None: ...
+
+    def info(self) -> CacheInfo: ...
+
+
+class DiskCache:
+    """Cache in a local SQLite file, shared by the processes of one host.
+
+    Entries are keyed by ``version`` and the (string) key, so processes
+    reading different data never see each other's results; entries of other
+    versions are dropped when the file is opened. Values are pickled, so only
+    point it at files this host writes. Errors reading or writing the file
+    (e.g. while another process holds a lock) count as misses and are
+    otherwise ignored. The file is opened on first use.
+
+    Args:
+        path: cache file, created if missing
+        version: data version the cached values belong to
+        timeout: seconds to wait for another process's write lock
+    """
+
+    def __init__(self, path: str, version: str, timeout: float = 1.0):
+        self.path = path
+        self.version = version
+        self.timeout = timeout
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = self._conn
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path,
+                timeout=self.timeout,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                # Losing the last writes in a power cut only costs misses
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS cache (version TEXT, key TEXT, "
+                    "value BLOB, PRIMARY KEY (version, key)) WITHOUT ROWID"
+                )
+                conn.execute("DELETE FROM cache WHERE version != ?", (self.version,))
+            except sqlite3.Error:
+                conn.close()
+                raise
+            self._conn = conn
+        return conn
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            try:
+                row = (
+                    self._connect()
+                    .execute(
+                        "SELECT value FROM cache WHERE version = ? AND key = ?",
+                        (self.version, key),
+                    )
+                    .fetchone()
+                )
+            except sqlite3.Error as e:
+                logger.debug("Disk cache read failed: %s", e)
+                row = None
+            if row is None:
+                self._misses += 1
+                return default
+            self._hits += 1
+        # Imported here, as LRUCache users never need pickle
+        import pickle
+
+        return pickle.loads(row[0])
+
+    def put(self, key: Hashable, value: Any) -> None:
+        import pickle
+
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            try:
+                self._connect().execute(
+                    "INSERT OR REPLACE INTO cache VALUES (?, ?, ?)",
+                    (self.version, key, data),
+                )
+            except sqlite3.Error as e:
+                logger.debug("Disk cache write failed: %s", e)
+
+    def clear(self) -> None:
+        """Drop this version's entries, for every process sharing the file."""
+        with self._lock:
+            try:
+                self._connect().execute(
+                    "DELETE FROM cache WHERE version = ?", (self.version,)
+                )
+            except sqlite3.Error as e:
+                logger.debug("Disk cache clear failed: %s", e)
+            self._hits = self._misses = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            try:
+                return self._connect().execute(
+                    "SELECT COUNT(*) FROM cache WHERE version = ?", (self.version,)
+                ).fetchone()[0]
+            except sqlite3.Error:
+                return 0
+
+    def info(self) -> CacheInfo:
+        # The file is not bounded: it holds at most one entry per 7-digit code
+        return CacheInfo(self._hits, self._misses, 0, len(self), 0)
+
+    def close(self) -> None:
+        with self._lock:
+            conn, self._conn = self._conn, None
+        if conn is not None:
+            conn.close()
+
+
+class TieredCache:
+    """Read-through, write-through chain of cache tiers, fastest first.
+
+    Args:
+        tiers: e.g. ``[LRUCache(...), DiskCache(...)]``
+    """
+
+    def __init__(self, tiers: Sequence[CacheTier]):
+        if not tiers:
+            raise ValueError("at least one tier is required")
+        self.tiers = list(tiers)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        for i, tier in enumerate(self.tiers):
+            value = tier.get(key, _MISSING)
+            if value is not _MISSING:
+                for upper in self.tiers[:i]:
+                    upper.put(key, value)
+                return value
+        return default
+
+    def put(self, key: Hashable, value: Any) -> None:
+        for tier in self.tiers:
+            tier.put(key, value)
+
+    def clear(self) -> None:
+        for tier in self.tiers:
+            tier.clear()
+
+    def __len__(self) -> int:
+        return len(self.tiers[0])  # type: ignore[arg-type]
+
+    def info(self) -> CacheInfo:
+        """Combined counters; a hit in any tier is a hit.
+
+        Sizes are those of the first tier.
+        """
+        infos = self.tier_info()
+        return CacheInfo(
+            sum(i.hits for i in infos),
+            infos[-1].misses,
+            sum(i.evictions for i in infos),
+            infos[0].currsize,
+            infos[0].maxsize,
+        )
+
+    def tier_info(self) -> List[CacheInfo]:
+        """Counters of each tier; a tier's misses are the lookups it passed on."""
+        return [tier.info() for tier in self.tiers]
+
+    def close(self) -> None:
+        for tier in self.tiers:
+            close = getattr(tier, "close", None)
+            if close is not None:
+                close()
@@ -1,15 +1,241 @@
-import argparse
+import dataclasses
+import itertools
 import json
 import logging
-from typing import Optional
+import sys
+from typing import IO, Iterable, Iterator, List, Optional
 
-from . import __version__
-from .api import Zip2AddrService
+from .api import Zip2AddrService, lookup
+from .models import Zip2Addr
+
+
+def _to_output(res: List[Zip2Addr]):
+    if not res:
+        return None
+    # Convert list of Zip2Addr objects to list of dicts
+    results = [r.to_dict() for r in res]
+    # Output single result as dict if only one, otherwise as list
+    return results[0] if len(results) == 1 else results
+
+
+def _iter_chunks(lines: Iterable[str], size: int) -> Iterator[List[str]]:
+    it = iter(lines)
+    while True:
+        chunk = [line.strip() for line in itertools.islice(it, size)]
+        if not chunk:
+            return
+        yield chunk
+
+
+def _run_batch(
+    service: Zip2AddrService, fh: IO[str], out: IO[str], fmt: str, chunk_size: int
+) -> None:
+    """Stream one result per input line, looking up ``chunk_size`` lines at a time."""
+    writer = None
+    if fmt == "csv":
+        import csv
+
+        fields = [f.name for f in dataclasses.fields(Zip2Addr)]
+        writer = csv.writer(out, lineterminator="\n")
+        writer.writerow(["postal"] + fields)
+    if writer is None:
+        # Pre-rendered JSON goes straight to the byte stream when there is one
+        buffer = getattr(out, "buffer", None)
+        for chunk in _iter_chunks(fh, chunk_size):
+            data = b"\n".join(service.lookup_json_many(chunk)) + b"\n"
+            if buffer is not None:
+                out.flush()
+                buffer.write(data)
+            else:
+                out.write(data.decode("utf-8"))
+        return
+    for chunk in _iter_chunks(fh, chunk_size):
+        for postal, res in zip(chunk, service.lookup_many(chunk)):
+            if not res:
+                writer.writerow([postal])
+            else:
+                for r in res:
+                    writer.writerow([postal] + list(r.to_dict().values()))
+
+
+def _print_result(res: List[Zip2Addr]) -> int:
+    if not res:
+        print(json.dumps(None))
+        return 1
+    print(json.dumps(_to_output(res), ensure_ascii=False))
+    return 0
+
+
+def _serve_main(argv: List[str]) -> int:
+    import argparse
+
+    from .server import MAX_BATCH, serve
+
+    parser = argparse.ArgumentParser(
+        prog="zip2addr serve", description="Serve postal code lookups over HTTP"
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="(default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8080, help="(default: 8080)")
+    parser.add_argument("--db", help="DB path (default: bundled DB)")
+    parser.add_argument(
+        "--backend",
+        choices=["sqlite", "memory", "snapshot", "shared"],
+        default="sqlite",
+        help="Lookup backend (default: sqlite)",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        help="Worker threads per process (default: one per connection)",
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=1,
+        help="Worker processes sharing the socket (default: 1)",
+    )
+    parser.add_argument(
+        "--max-batch",
+        type=int,
+        default=MAX_BATCH,
+        help=f"Most codes per POST /lookup (default: {MAX_BATCH})",
+    )
+    parser.add_argument(
+        "--max-age",
+        type=int,
+        default=86400,
+        help="Cache-Control max-age in seconds (default: 86400)",
+    )
+    parser.add_argument(
+        "--watch",
+        type=float,
+        metavar="SECONDS",
+        help="Reload the DB when its file is replaced, checking this often",
+    )
+    parser.add_argument("--debug", action="store_true", help="Enable debug logging")
+    args = parser.parse_args(argv)
+    if args.threads is not None and args.threads < 1:
+        parser.error("--threads must be >= 1")
+    if args.watch is not None and args.watch <= 0:
+        parser.error("--watch must be positive")
+    if args.processes < 1:
+        parser.error("--processes must be >= 1")
+    if args.debug:
+        logging.basicConfig(
+            level=logging.DEBUG,
+            format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        )
+    serve(
+        args.host,
+        args.port,
+        db_path=args.db,
+        threads=args.threads,
+        processes=args.processes,
+        max_batch=args.max_batch,
+        max_age=args.max_age,
+        watch=args.watch,
+        backend=args.backend,
+    )
+    return 0
+
+
+def _enrich_main(argv: List[str]) -> int:
+    import argparse
+
+    from .enrich import DEFAULT_FIELDS, enrich
+
+    parser = argparse.ArgumentParser(
+        prog="zip2addr enrich",
+        description="Append address columns to a CSV file, looked up by postal code",
+    )
+    parser.add_argument("input", help="Input CSV with a header row (- for stdin)")
+    parser.add_argument(
+        "-o", "--output", default="-", help="Output CSV (default: stdout)"
+    )
+    parser.add_argument(
+        "-c", "--column", required=True, help="Header name of the postal code column"
+    )
+    parser.add_argument(
+        "--fields",
+        default=",".join(DEFAULT_FIELDS),
+        help=f"Comma-separated fields to append (default: {','.join(DEFAULT_FIELDS)})",
+    )
+    parser.add_argument("--prefix", default="", help="Prefix for the new column names")
+    parser.add_argument(
+        "--delimiter", default=",", help="Field delimiter (default: ,)"
+    )
+    parser.add_argument(
+        "--encoding", default="utf-8", help="File encoding (default: utf-8)"
+    )
+    parser.add_argument(
+        "-j",
+        "--processes",
+        type=int,
+        help="Worker processes (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=10000,
+        help="Lines per worker task (default: 10000)",
+    )
+    parser.add_argument("--db", help="DB path (default: bundled DB)")
+    parser.add_argument(
+        "--backend",
+        choices=["sqlite", "memory", "snapshot", "shared"],
+        default="sqlite",
+        help="Lookup backend (default: sqlite)",
+    )
+    args = parser.parse_args(argv)
+    if args.processes is not None and args.processes < 1:
+        parser.error("--processes must be >= 1")
+    if args.chunk_size < 1:
+        parser.error("--chunk-size must be >= 1")
+    try:
+        stats = enrich(
+            args.input,
+            args.output,
+            args.column,
+            fields=tuple(f.strip() for f in args.fields.split(",") if f.strip()),
+            processes=args.processes,
+            chunk_size=args.chunk_size,
+            db_path=args.db,
+            backend=args.backend,
+            delimiter=args.delimiter,
+            prefix=args.prefix,
+            encoding=args.encoding,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    print(
+        f"Enriched {stats.rows} rows ({stats.matched} matched) in "
+        f"{stats.seconds:.2f}s ({stats.rows_per_sec:.0f} rows/sec)",
+        file=sys.stderr,
+    )
+    return 0
 
 
 def main(argv: Optional[list[str]] = None) -> int:
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv and argv[0] == "serve":
+        return _serve_main(argv[1:])
+    if argv and argv[0] == "enrich":
+        return _enrich_main(argv[1:])
+    # Fast path for the common `zip2addr 100-0001`: a single lookup needs no
+    # argument parsing, logging setup or connection pool. It reads the same
+    # data as the flagged form below, through lookup().
+    if len(argv) == 1 and not argv[0].startswith("-"):
+        return _print_result(lookup(argv[0]))
+
+    import argparse
+
+    from . import __version__
+
     parser = argparse.ArgumentParser(
-        description="Lookup Japanese address from postal code"
+        description="Lookup Japanese address from postal code",
+        epilog="Run `zip2addr serve --help` for the HTTP server and "
+        "`zip2addr enrich --help` to add address columns to a CSV file.",
     )
     parser.add_argument(
         "postal", nargs="?", help="Postal code to lookup (with or without hyphen)"
@@ -20,10 +246,38 @@ def main(argv: Optional[list[str]] = None) -> int:
         version=f"%(prog)s {__version__}",
     )
     parser.add_argument("--debug", action="store_true", help="Enable debug logging")
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Read one postal code per line and stream one result per line",
+    )
+    parser.add_argument(
+        "-i",
+        "--input",
+        default="-",
+        help="Input file for --batch (default: stdin)",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["jsonl", "csv"],
+        default="jsonl",
+        help="Output format for --batch (default: jsonl)",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=10000,
+        help="Number of lines looked up at a time in --batch (default: 10000)",
+    )
     args = parser.parse_args(argv)
 
     # Check if postal code was provided
-    if not args.postal:
+    if args.batch:
+        if args.postal:
+            parser.error("postal code cannot be combined with --batch")
+        if args.chunk_size < 1:
+            parser.error("--chunk-size must be >= 1")
+    elif not args.postal:
         parser.error("postal code is required")
 
     # Configure logging based on debug flag
@@ -33,16 +287,15 @@ def main(argv: Optional[list[str]] = None) -> int:
             format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
         )
 
-    service = Zip2AddrService()
-    res = service.lookup(args.postal)
-    if not res:
-        print(json.dumps(None))
-        return 1
-    # Convert list of Zip2Addr objects to list of dicts
-    results = [r.to_dict() for r in res]
-    # Output single result as dict if only one, otherwise as list
-    output = results[0] if len(results) == 1 else results
-    print(json.dumps(output, ensure_ascii=False))
+    if not args.batch:
+        return _print_result(lookup(args.postal))
+
+    with Zip2AddrService() as service:
+        if args.input == "-":
+            _run_batch(service, sys.stdin, sys.stdout, args.format, args.chunk_size)
+        else:
+            with open(args.input, encoding="utf-8") as fh:
+                _run_batch(service, fh, sys.stdout, args.format, args.chunk_size)
     return 0
 
 
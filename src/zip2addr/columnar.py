@@ -0,0 +1,242 @@
+"""Columnar bulk lookups for analytics.
+
+``ColumnarIndex`` keeps one row per zipcode as parallel columns (sorted
+zipcodes, JIS city code, prefecture and city indexes, town) and answers a
+whole batch of codes with one binary search per code, returning columns
+instead of Zip2Addr objects::
+
+    service = Zip2AddrService()
+    cols = service.lookup_columns(codes)
+    names = [service.columnar_index.prefectures[i] for i in cols.prefecture]
+
+With NumPy installed the search is ``numpy.searchsorted`` and the columns
+are NumPy arrays; otherwise ``bisect`` runs over ``array`` columns and the
+results are ``array`` objects (and a list for towns). Either way codes with
+no match get -1 (None for towns). For a zipcode spanning several towns the
+first one is used.
+"""
+
+import logging
+import sqlite3
+import time
+from array import array
+from bisect import bisect_left
+from contextlib import closing
+from functools import lru_cache
+from numbers import Integral
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from .api import _is_valid_postal, _normalize_postal
+from .pool import _readonly_uri
+from .schema import queries_for
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def _numpy() -> Any:
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+class Columns(NamedTuple):
+    # JIS X 0401/0402 city code, e.g. 13101
+    jis_code: Any
+    # Index into ColumnarIndex.prefectures
+    prefecture: Any
+    # Index into ColumnarIndex.cities
+    city: Any
+    town: Any
+
+
+def _int_code(value: Any) -> int:
+    if type(value) is int:
+        return value
+    if isinstance(value, Integral):
+        # NumPy and pandas integer scalars, e.g. from Series.tolist() of ints
+        return int(value)
+    key = _normalize_postal(value) if value else ""
+    return int(key) if _is_valid_postal(key) else -1
+
+
+def _int_codes(codes: Iterable[Any]) -> array:
+    # Codes repeat heavily in bulk jobs, so convert each distinct value once
+    memo: Dict[Any, int] = {}
+    out = array("i")
+    for code in codes:
+        n = memo.get(code)
+        if n is None:
+            n = memo[code] = _int_code(code)
+        out.append(n)
+    return out
+
+
+class ColumnarIndex:
+    """Parallel columns for the first row of every zipcode.
+
+    The value columns have one extra trailing entry (-1, or None for towns)
+    that codes with no match are mapped to, so gathering needs no branches.
+
+    Args:
+        keys: sorted zipcodes as integers
+        jis_code, prefecture, city, town: one entry per key plus the trailing
+            no-match entry
+        prefectures: prefecture names by index
+        cities: city names by index; cities of the same name in different
+            prefectures get distinct indexes
+    """
+
+    def __init__(
+        self,
+        keys: array,
+        jis_code: array,
+        prefecture: array,
+        city: array,
+        town: List[Optional[str]],
+        prefectures: Tuple[str, ...],
+        cities: Tuple[str, ...],
+        load_time: float = 0.0,
+    ):
+        self.keys = keys
+        self.jis_code = jis_code
+        self.prefecture = prefecture
+        self.city = city
+        self.town = town
+        self.prefectures = prefectures
+        self.cities = cities
+        self.load_time = load_time
+        self._np: Optional[Tuple[Any, ...]] = None
+
+    @classmethod
+    def from_db(cls, db_path: str) -> "ColumnarIndex":
+        # The snapshot has no JIS codes, so the index is read from the DB
+        start = time.perf_counter()
+        with closing(sqlite3.connect(_readonly_uri(db_path), uri=True)) as conn:
+            index = cls.from_rows(conn.execute(queries_for(conn).select_all))
+        index.load_time = time.perf_counter() - start
+        logger.debug(
+            "Loaded columnar index of %d zipcode(s) in %.3fs",
+            len(index),
+            index.load_time,
+        )
+        return index
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Sequence]) -> "ColumnarIndex":
+        """Build the index from rows in ``Zip2Addr.from_row`` order."""
+        first: Dict[str, Sequence] = {}
+        for r in rows:
+            # Rows come in lookup order within a zipcode; keep the first
+            if r[0] not in first:
+                first[r[0]] = r
+        pref_ids: Dict[Optional[str], int] = {}
+        city_ids: Dict[Tuple[int, Optional[str]], int] = {}
+        keys = array("i")
+        jis_code = array("i")
+        prefecture = array("h")
+        city = array("i")
+        town: List[Optional[str]] = []
+        for zipcode in sorted(first):
+            if len(zipcode) != 7 or not zipcode.isdigit():
+                continue
+            r = first[zipcode]
+            p = pref_ids.setdefault(r[6], len(pref_ids))
+            keys.append(int(zipcode))
+            jis_code.append(int(r[1]) if r[1] and r[1].isdigit() else -1)
+            prefecture.append(p)
+            city.append(city_ids.setdefault((p, r[7]), len(city_ids)))
+            town.append(r[8])
+        jis_code.append(-1)
+        prefecture.append(-1)
+        city.append(-1)
+        town.append(None)
+        return cls(
+            keys,
+            jis_code,
+            prefecture,
+            city,
+            town,
+            tuple(pref_ids),
+            tuple(c for _, c in city_ids),
+        )
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def lookup(self, codes: Iterable[Any], numpy: Optional[bool] = None) -> Columns:
+        """Return the columns for each of ``codes``, in input order.
+
+        Args:
+            codes: postal code strings (normalized like lookup) or integers,
+                e.g. a NumPy integer array
+            numpy: use NumPy; by default it is used when installed
+
+        Raises:
+            ImportError: if ``numpy`` is True and NumPy is not installed
+        """
+        np = _numpy()
+        if numpy and np is None:
+            raise ImportError("numpy is required for numpy=True")
+        if np is not None and numpy is not False:
+            return self._lookup_numpy(np, codes)
+        positions = self._positions(codes)
+        return Columns(
+            array("i", map(self.jis_code.__getitem__, positions)),
+            array("h", map(self.prefecture.__getitem__, positions)),
+            array("i", map(self.city.__getitem__, positions)),
+            list(map(self.town.__getitem__, positions)),
+        )
+
+    def _positions(self, codes: Iterable[Any]) -> List[int]:
+        keys = self.keys
+        n = len(keys)
+        # Codes repeat heavily in bulk jobs; convert and search each one once
+        memo: Dict[Any, int] = {}
+        positions = []
+        for code in codes:
+            i = memo.get(code)
+            if i is None:
+                key = _int_code(code)
+                i = bisect_left(keys, key)
+                if i == n or keys[i] != key:
+                    i = n
+                memo[code] = i
+            positions.append(i)
+        return positions
+
+    def _lookup_numpy(self, np: Any, codes: Iterable[Any]) -> Columns:
+        if self._np is None:
+            self._np = (
+                np.array(self.keys, dtype=np.intc),
+                np.array(self.jis_code, dtype=np.intc),
+                np.array(self.prefecture, dtype=np.short),
+                np.array(self.city, dtype=np.intc),
+                np.array(self.town, dtype=object),
+            )
+        keys, jis_code, prefecture, city, town = self._np
+        if isinstance(codes, np.ndarray) and codes.dtype.kind in "iu":
+            values = codes
+        else:
+            values = np.array(_int_codes(codes), dtype=np.intc)
+        n = len(keys)
+        if n:
+            positions = np.searchsorted(keys, values)
+            found = keys[np.minimum(positions, n - 1)] == values
+            positions = np.where(found, positions, n)
+        else:
+            positions = np.zeros(len(values), dtype=np.intp)
+        return Columns(
+            jis_code[positions], prefecture[positions], city[positions], town[positions]
+        )
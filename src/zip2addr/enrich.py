@@ -0,0 +1,256 @@
+"""Add address columns to large CSV files.
+
+``enrich`` streams an input CSV, looks up the postal code column of every row
+and writes the rows with address fields appended, in input order::
+
+    from zip2addr.enrich import enrich
+
+    stats = enrich("orders.csv", "orders_addr.csv", column="postal")
+    print(stats.rows_per_sec)
+
+The main process only splits the input into chunks of whole records; parsing,
+lookups and formatting run in a pool of worker processes, each with its own
+read-only service on the same DB. At most two chunks per worker are in
+flight, so memory stays bounded however large the file is.
+"""
+
+import csv
+import dataclasses
+import io
+import itertools
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import (
+    IO,
+    Any,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from .api import Zip2AddrService
+from .models import Zip2Addr
+
+DEFAULT_FIELDS = ("prefecture", "city", "town")
+# Distinct codes remembered per worker; KEN_ALL has about 120k
+_MEMO_SIZE = 1 << 18
+
+Source = Union[str, IO[str]]
+
+
+class EnrichStats(NamedTuple):
+    rows: int
+    matched: int
+    seconds: float
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+class _Enricher:
+    """Turns a chunk of CSV lines into enriched CSV text (runs in the workers)."""
+
+    def __init__(
+        self,
+        index: int,
+        fields: Tuple[str, ...],
+        delimiter: str,
+        db_path: Optional[str],
+        backend: str,
+    ):
+        self.index = index
+        self.fields = fields
+        self.delimiter = delimiter
+        # The memo below replaces the service's own cache
+        self.service = Zip2AddrService(db_path, cache_size=0, backend=backend)
+        self.empty = ("",) * len(fields)
+        self.memo: Dict[str, Tuple[str, ...]] = {}
+
+    def _values(self, codes: List[str]) -> List[Tuple[str, ...]]:
+        memo = self.memo
+        missing = [c for c in dict.fromkeys(codes) if c not in memo]
+        if missing:
+            fields = self.fields
+            for code, rows in zip(missing, self.service.lookup_many(missing)):
+                # Zipcodes spanning several towns report the first one
+                memo[code] = (
+                    tuple(getattr(rows[0], f) or "" for f in fields)
+                    if rows
+                    else self.empty
+                )
+        values = [memo[c] for c in codes]
+        # Evict only once this chunk's values are out, as it may need codes
+        # memoized by earlier chunks
+        if len(memo) > _MEMO_SIZE:
+            memo.clear()
+        return values
+
+    def __call__(self, lines: List[str]) -> Tuple[str, int, int]:
+        # Blank lines carry no record
+        rows = [row for row in csv.reader(lines, delimiter=self.delimiter) if row]
+        index = self.index
+        codes = [row[index] if len(row) > index else "" for row in rows]
+        values = self._values(codes)
+        out = io.StringIO()
+        writer = csv.writer(out, delimiter=self.delimiter, lineterminator="\n")
+        writer.writerows(row + list(v) for row, v in zip(rows, values))
+        empty = self.empty
+        return out.getvalue(), len(rows), sum(v is not empty for v in values)
+
+
+_enricher: Optional[_Enricher] = None
+
+
+def _init_worker(*args: Any) -> None:
+    global _enricher
+    _enricher = _Enricher(*args)
+
+
+def _run_chunk(lines: List[str]) -> Tuple[str, int, int]:
+    assert _enricher is not None
+    return _enricher(lines)
+
+
+def _iter_chunks(fh: IO[str], size: int) -> Iterator[List[str]]:
+    """Yield lists of about ``size`` lines that end on a record boundary.
+
+    A quoted field may contain newlines. Quote characters come in pairs, so
+    a chunk with an odd count ends inside one and is extended line by line
+    until the field closes.
+    """
+    it = iter(fh)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        if "".join(chunk).count('"') % 2:
+            for line in it:
+                chunk.append(line)
+                if line.count('"') % 2:
+                    break
+        yield chunk
+
+
+def _open(source: Source, mode: str, encoding: str):
+    if not isinstance(source, str):
+        return None, source
+    if source == "-":
+        return None, sys.stdin if "r" in mode else sys.stdout
+    fh = open(source, mode, newline="", encoding=encoding)
+    return fh, fh
+
+
+def enrich(
+    source: Source,
+    dest: Source,
+    column: str,
+    fields: Tuple[str, ...] = DEFAULT_FIELDS,
+    processes: Optional[int] = None,
+    chunk_size: int = 10000,
+    db_path: Optional[str] = None,
+    backend: str = "sqlite",
+    delimiter: str = ",",
+    prefix: str = "",
+    encoding: str = "utf-8",
+) -> EnrichStats:
+    """Append address ``fields`` to every row of CSV ``source``, writing ``dest``.
+
+    Rows keep their input order. Rows whose code has no match (or is not a
+    postal code) get empty fields; for a zipcode spanning several towns the
+    first one is used.
+
+    Args:
+        source: input path, "-" for stdin, or a text file object
+        dest: output path, "-" for stdout, or a text file object
+        column: header name of the postal code column
+        fields: Zip2Addr fields to append
+        processes: worker processes (default: CPU count); 1 runs in-process
+        chunk_size: lines sent to a worker at a time
+        db_path: optional path to sqlite DB; if omitted use bundled db
+        backend: backend used by the workers (see Zip2AddrService)
+        delimiter: field delimiter of input and output
+        prefix: prepended to the new column names
+        encoding: encoding of input and output paths
+
+    Returns:
+        Row counts and the elapsed time.
+    """
+    known = {f.name for f in dataclasses.fields(Zip2Addr)}
+    unknown = [f for f in fields if f not in known]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if processes < 1:
+        raise ValueError("processes must be >= 1")
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be >= 1")
+    start = time.perf_counter()
+    in_fh, reader = _open(source, "r", encoding)
+    out_fh = None
+    try:
+        header_line = reader.readline()
+        header = next(csv.reader([header_line], delimiter=delimiter), [])
+        if column not in header:
+            raise ValueError(f"Column {column!r} not found in header: {header}")
+        out_fh, writer = _open(dest, "w", encoding)
+        csv.writer(writer, delimiter=delimiter, lineterminator="\n").writerow(
+            header + [prefix + f for f in fields]
+        )
+        args = (header.index(column), tuple(fields), delimiter, db_path, backend)
+        if processes == 1:
+            run = _Enricher(*args)
+            with run.service:
+                rows, matched = _write(
+                    map(run, _iter_chunks(reader, chunk_size)), writer
+                )
+        else:
+            if backend == "shared":
+                # Loaded here so that the forked workers share one copy
+                from .shared import preload
+
+                preload(db_path)
+            with ProcessPoolExecutor(
+                processes, initializer=_init_worker, initargs=args
+            ) as pool:
+                rows, matched = _write(
+                    _submit(pool, _iter_chunks(reader, chunk_size), processes * 2),
+                    writer,
+                )
+    finally:
+        if in_fh is not None:
+            in_fh.close()
+        if out_fh is not None:
+            out_fh.close()
+    return EnrichStats(rows, matched, time.perf_counter() - start)
+
+
+def _submit(
+    pool: ProcessPoolExecutor, chunks: Iterator[List[str]], window: int
+) -> Iterator[Tuple[str, int, int]]:
+    """Yield chunk results in order, keeping at most ``window`` in flight."""
+    pending: Deque["Future[Tuple[str, int, int]]"] = deque()
+    for chunk in chunks:
+        pending.append(pool.submit(_run_chunk, chunk))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _write(results: Iterator[Tuple[str, int, int]], out: IO[str]) -> Tuple[int, int]:
+    rows = matched = 0
+    for text, n, m in results:
+        out.write(text)
+        rows += n
+        matched += m
+    return rows, matched
@@ -0,0 +1,262 @@
+import logging
+import re
+import sqlite3
+import sys
+import time
+import unicodedata
+from array import array
+from collections import Counter
+from contextlib import closing
+from itertools import chain, islice
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from .models import Zip2Addr
+from .pool import _readonly_uri
+from .schema import queries_for
+
+logger = logging.getLogger(__name__)
+
+# Common variant spellings folded to one form on both sides of the match
+_VARIANTS = str.maketrans(
+    {
+        "ヶ": "ケ",
+        "ヵ": "カ",
+        "が": "ケ",
+        "の": "ノ",
+        "之": "ノ",
+        "嶋": "島",
+        "嶌": "島",
+        "﨑": "崎",
+        "碕": "崎",
+        "澤": "沢",
+        "邊": "辺",
+        "邉": "辺",
+        "濱": "浜",
+        "髙": "高",
+        "瀧": "滝",
+        "龍": "竜",
+        "國": "国",
+        "冨": "富",
+        "廣": "広",
+        "櫻": "桜",
+        "藪": "薮",
+        "舘": "館",
+        "籠": "篭",
+        "驒": "騨",
+    }
+)
+# Street numbers after the town: "1丁目2-3", "三丁目", "4番地", "5-6", "7"
+_CHOME = re.compile(r"[0-9〇一二三四五六七八九十百]+丁目.*$")
+_BLOCK = re.compile(r"[0-9]+(?:番地|番|号|-|の|$).*$")
+# KEN_ALL town annotations: "大通西（１～１９丁目）", "以下に掲載がない場合"
+_PAREN = re.compile(r"[（(].*$")
+_PLACEHOLDERS = ("以下に掲載がない場合", "の次に番地がくる場合")
+
+
+def normalize_address(text: str) -> str:
+    """Fold an address to the form stored in the n-gram index."""
+    s = "".join(unicodedata.normalize("NFKC", text).split())
+    s = _BLOCK.sub("", _CHOME.sub("", s))
+    return s.translate(_VARIANTS)
+
+
+def address_text(
+    prefecture: Optional[str], city: Optional[str], town: Optional[str]
+) -> str:
+    """Return the normalized text indexed for one KEN_ALL row."""
+    town = town or ""
+    if town.endswith(_PLACEHOLDERS):
+        town = ""
+    town = _PAREN.sub("", town)
+    return normalize_address(f"{prefecture or ''}{city or ''}{town}")
+
+
+def ngrams(text: str) -> List[str]:
+    if len(text) < 2:
+        return [text] if text else []
+    return [text[i : i + 2] for i in range(len(text) - 1)]
+
+
+class Doc(NamedTuple):
+    zipcode: str
+    # position of the row among lookup(zipcode) results
+    ordinal: int
+    text: str
+
+
+def build_index(
+    rows: Iterable[Tuple[str, Optional[str], Optional[str], Optional[str]]],
+) -> Tuple[List[Doc], Dict[str, array]]:
+    """Build documents and bigram postings from rows in lookup order.
+
+    Args:
+        rows: (zipcode, prefecture, city, town) ordered by zipcode, then as
+            returned by lookup
+
+    Returns:
+        The documents, and for each bigram the ascending ids of the documents
+        containing it.
+    """
+    docs: List[Doc] = []
+    postings: Dict[str, array] = {}
+    last_zipcode = None
+    ordinal = 0
+    for zipcode, prefecture, city, town in rows:
+        ordinal = ordinal + 1 if zipcode == last_zipcode else 0
+        last_zipcode = zipcode
+        text = address_text(prefecture, city, town)
+        doc_id = len(docs)
+        docs.append(Doc(zipcode, ordinal, text))
+        for g in set(ngrams(text)):
+            ids = postings.get(g)
+            if ids is None:
+                ids = postings[g] = array("I")
+            ids.append(doc_id)
+    return docs, postings
+
+
+def postings_to_blob(ids: array) -> bytes:
+    # Stored little-endian so DBs can move between machines
+    if sys.byteorder != "little":
+        ids = array("I", ids)
+        ids.byteswap()
+    return ids.tobytes()
+
+
+def postings_from_blob(blob: bytes) -> array:
+    ids = array("I")
+    ids.frombytes(blob)
+    if sys.byteorder != "little":
+        ids.byteswap()
+    return ids
+
+
+class Match(NamedTuple):
+    address: Zip2Addr
+    score: float
+
+
+class AddressMatcher:
+    """Rank KEN_ALL rows against free-text addresses by bigram similarity.
+
+    Queries and rows are folded with ``normalize_address`` (NFKC, variant
+    kanji, street numbers and 丁目 dropped) and compared by the Dice coefficient
+    of their bigram sets. Candidates come from an inverted index: they are the
+    documents sharing two of the query's ``gather`` rarest bigrams, so the
+    frequent ones (typically prefecture and city names) are only used to
+    score them, and a typo in one bigram still leaves the others to find the
+    row. When no document holds all ``gather`` of them, which usually means
+    one is mistyped, the next rarest bigram is counted as well.
+
+    Postings are kept as tuples sharing one int object per document, so
+    intersecting them allocates nothing per id.
+
+    Use ``from_db`` to load the index written by ``scripts/generate_db.py
+    --ngram-index``, or to build it in memory for DBs generated without one.
+    """
+
+    def __init__(
+        self,
+        docs: List[Doc],
+        postings: Dict[str, Sequence[int]],
+        gram_counts: Optional[array] = None,
+        gather: int = 3,
+        build_time: Optional[float] = None,
+        load_time: Optional[float] = None,
+    ):
+        self.docs = docs
+        ids = list(range(len(docs)))
+        self.postings: Dict[str, Tuple[int, ...]] = {
+            g: tuple(map(ids.__getitem__, doc_ids)) for g, doc_ids in postings.items()
+        }
+        self.gather = gather
+        self.build_time = build_time
+        self.load_time = load_time
+        if gram_counts is None:
+            gram_counts = array("H", (len(set(ngrams(d.text))) for d in docs))
+        self._gram_counts = gram_counts
+
+    @classmethod
+    def from_db(cls, db_path: str) -> "AddressMatcher":
+        start = time.perf_counter()
+        with closing(sqlite3.connect(_readonly_uri(db_path), uri=True)) as conn:
+            has_index = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'ngram'"
+            ).fetchone()
+            if has_index:
+                docs = []
+                gram_counts = array("H")
+                for zipcode, ordinal, text, grams in conn.execute(
+                    "SELECT zipcode, ordinal, text, grams FROM ngram_doc ORDER BY id"
+                ):
+                    docs.append(Doc(zipcode, ordinal, text))
+                    gram_counts.append(grams)
+                postings = {
+                    g: postings_from_blob(blob)
+                    for g, blob in conn.execute("SELECT gram, ids FROM ngram")
+                }
+                matcher = cls(docs, postings, gram_counts)
+                matcher.load_time = time.perf_counter() - start
+                logger.debug("Loaded n-gram index in %.3fs", matcher.load_time)
+                return matcher
+            logger.debug("No n-gram index in DB, building it in memory")
+            rows = conn.execute(queries_for(conn).select_all)
+            docs, postings = build_index((r[0], r[6], r[7], r[8]) for r in rows)
+        matcher = cls(docs, postings)
+        matcher.build_time = time.perf_counter() - start
+        return matcher
+
+    @property
+    def index_bytes(self) -> int:
+        """Approximate size of the postings and document texts."""
+        size = sum(len(d.text.encode()) for d in self.docs)
+        for g, ids in self.postings.items():
+            # One pointer per entry; the int objects are shared
+            size += len(g.encode()) + 8 * len(ids)
+        # and the shared int objects
+        return size + sys.getsizeof(len(self.docs)) * len(self.docs)
+
+    def candidates(
+        self, text: str, limit: int = 10, pool: int = 20
+    ) -> List[Tuple[Doc, float]]:
+        """Return up to ``limit`` (document, score) pairs, best first.
+
+        Args:
+            text: free-text address
+            limit: number of results
+            pool: number of candidates gathered from the index before scoring
+        """
+        query = normalize_address(text)
+        grams = set(ngrams(query))
+        postings = self.postings
+        found = [g for g in grams if g in postings]
+        if not found:
+            return []
+        rare = sorted(map(postings.__getitem__, found), key=len)
+        # For each document, the number of pairs of rare bigrams it holds
+        pairs: Counter = Counter()
+        sets: List[set] = []
+        gather = self.gather
+        for n, ids in enumerate(rare[: gather + 1]):
+            # A document holding all n bigrams so far has n * (n - 1) / 2 pairs
+            if n == gather and max(pairs.values(), default=0) == n * (n - 1) // 2:
+                break
+            ids = set(ids)
+            for other in sets:
+                pairs.update(other & ids)
+            sets.append(ids)
+        n = max(pool, limit)
+        if pairs:
+            top = [doc_id for doc_id, _ in pairs.most_common(n)]
+        else:
+            # No document shares two of them: take those of the rarest
+            top = list(islice(chain.from_iterable(rare[:gather]), n))
+        docs = self.docs
+        gram_counts = self._gram_counts
+        scored = []
+        for doc_id in top:
+            shared = sum(map(docs[doc_id].text.__contains__, found))
+            score = 2.0 * shared / (len(grams) + gram_counts[doc_id])
+            scored.append((score, doc_id))
+        scored.sort(key=lambda s: (-s[0], s[1]))
+        return [(docs[doc_id], score) for score, doc_id in scored[:limit]]
@@ -1,8 +1,71 @@
-from dataclasses import dataclass
-from typing import Dict, Optional, Sequence
+import re
+import sys
+from dataclasses import dataclass, fields
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
 
+# Canonical instances kept by from_row; the table is reset when full so it
+# only holds recently seen rows
+_SHARED_MAX = 1 << 14
+_shared: Dict["Zip2Addr", "Zip2Addr"] = {}
 
-@dataclass
+
+def _to_int(v) -> Optional[int]:
+    # SQLite hands back ints (or None) for the flag columns
+    if v is None or type(v) is int:
+        return v
+    try:
+        s = str(v).strip()
+        return int(s) if s != "" else None
+    except Exception:
+        return None
+
+
+# Town notes listing 丁目: "１～３丁目", "５丁目", "１、３～５丁目", "１丁目、２丁目"
+_CHOME_LIST = re.compile(r"\d+(?:～\d+)?(?:丁目)?(?:、\d+(?:～\d+)?(?:丁目)?)*丁目")
+
+
+def chome_numbers(note: Optional[str]) -> List[int]:
+    """Return the 丁目 numbers a note such as "１～３丁目" covers."""
+    return list(_parse_chome(note)) if note else []
+
+
+# KEN_ALL has a few thousand distinct notes, so each is parsed once
+@lru_cache(maxsize=4096)
+def _parse_chome(note: str) -> Tuple[int, ...]:
+    if not _CHOME_LIST.fullmatch(note):
+        return ()
+    numbers: List[int] = []
+    for part in note.replace("丁目", "").split("、"):
+        first, _, last = part.partition("～")
+        numbers.extend(range(int(first), int(last or first) + 1))
+    return tuple(numbers)
+
+
+def _intern(v):
+    return sys.intern(v) if type(v) is str else v
+
+
+def _add_slots(cls):
+    # dataclass(slots=True) needs Python 3.10+, so rebuild the class by hand
+    names = tuple(f.name for f in fields(cls))
+    ns = {k: v for k, v in cls.__dict__.items() if k not in names}
+    ns.pop("__dict__", None)
+    ns.pop("__weakref__", None)
+    ns["__slots__"] = names
+    new = type(cls)(cls.__name__, cls.__bases__, ns)
+    # The frozen __setattr__/__delattr__ find the class through a closure
+    # cell; left pointing at the old one, they fail with TypeError instead of
+    # FrozenInstanceError for names that are not fields
+    for name in ("__setattr__", "__delattr__"):
+        for cell in getattr(ns.get(name), "__closure__", None) or ():
+            if cell.cell_contents is cls:
+                cell.cell_contents = new
+    return new
+
+
+@_add_slots
+@dataclass(frozen=True)
 class Zip2Addr:
     zipcode: str
     pref_kana: Optional[str] = None
@@ -17,27 +80,28 @@ class Zip2Addr:
     multiple_town: Optional[int] = None
     update_status: Optional[int] = None
     change_reason: Optional[int] = None
+    # Annotation the build split off the town name, e.g. "１～３丁目" or
+    # "以下に掲載がない場合"; always None for DBs before schema version 3
+    town_note: Optional[str] = None
+
+    @property
+    def chome_numbers(self) -> List[int]:
+        """The 丁目 numbers ``town_note`` covers, e.g. [1, 2, 3] for "１～３丁目"."""
+        return chome_numbers(self.town_note)
 
     @classmethod
     def from_row(cls, row: Sequence) -> "Zip2Addr":
         # expects row in order as selected in api.py / generated by generate_db.py:
-        # zipcode, jis_code, old_postal_code, pref_kana, city_kana, town_kana, prefecture, city, town, multiple_postal, koaza, chome, multiple_town, update_status, change_reason
-        def _to_int(v):
-            if v is None:
-                return None
-            try:
-                s = str(v).strip()
-                return int(s) if s != "" else None
-            except Exception:
-                return None
-
-        return cls(
+        # zipcode, jis_code, old_postal_code, pref_kana, city_kana, town_kana, prefecture, city, town, multiple_postal, koaza, chome, multiple_town, update_status, change_reason, town_note
+        # Prefecture/city/kana strings repeat across rows, so they are interned,
+        # and identical rows share one instance.
+        obj = cls(
             zipcode=row[0],
-            pref_kana=row[3] if len(row) > 3 else None,
-            city_kana=row[4] if len(row) > 4 else None,
-            town_kana=row[5] if len(row) > 5 else None,
-            prefecture=row[6] if len(row) > 6 else None,
-            city=row[7] if len(row) > 7 else None,
+            pref_kana=_intern(row[3]) if len(row) > 3 else None,
+            city_kana=_intern(row[4]) if len(row) > 4 else None,
+            town_kana=_intern(row[5]) if len(row) > 5 else None,
+            prefecture=_intern(row[6]) if len(row) > 6 else None,
+            city=_intern(row[7]) if len(row) > 7 else None,
             town=row[8] if len(row) > 8 else None,
             multiple_postal=_to_int(row[9]) if len(row) > 9 else None,
             koaza=_to_int(row[10]) if len(row) > 10 else None,
@@ -45,7 +109,19 @@ class Zip2Addr:
             multiple_town=_to_int(row[12]) if len(row) > 12 else None,
             update_status=_to_int(row[13]) if len(row) > 13 else None,
             change_reason=_to_int(row[14]) if len(row) > 14 else None,
+            town_note=row[15] if len(row) > 15 else None,
         )
+        shared = _shared.get(obj)
+        if shared is not None:
+            return shared
+        if len(_shared) >= _SHARED_MAX:
+            _shared.clear()
+        _shared[obj] = obj
+        return obj
+
+    def __reduce__(self):
+        # frozen + __slots__ cannot use the default slot-state unpickling
+        return (self.__class__, tuple(getattr(self, f) for f in self.__slots__))
 
     def to_dict(self) -> Dict[str, Optional[str]]:
         return {
@@ -62,4 +138,5 @@ class Zip2Addr:
             "multiple_town": self.multiple_town,
             "update_status": self.update_status,
             "change_reason": self.change_reason,
+            "town_note": self.town_note,
         }
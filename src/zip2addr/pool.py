@@ -0,0 +1,91 @@
+import logging
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+logger = logging.getLogger(__name__)
+
+
+def _readonly_uri(db_path: str, immutable: bool = True) -> str:
+    # Imported here as pathlib is slow to import and only needed on open
+    from pathlib import Path
+
+    # as_uri() percent-encodes the path so names with spaces or '?' stay valid
+    uri = Path(db_path).resolve().as_uri() + "?mode=ro"
+    if immutable:
+        uri += "&immutable=1"
+    return uri
+
+
+class ConnectionPool:
+    """Thread-safe pool of read-only SQLite connections.
+
+    Connections are opened with ``mode=ro`` (and ``immutable=1`` by default) so
+    SQLite skips locking and change detection entirely. Up to ``size`` idle
+    connections are kept for reuse; bursts beyond that open temporary
+    connections which are closed again on release, so callers never block.
+
+    Each connection keeps the sqlite3 statement cache, so repeatedly executing
+    the same SQL text reuses its prepared statement.
+    """
+
+    def __init__(self, db_path: str, size: int = 4, immutable: bool = True):
+        if size < 1:
+            raise ValueError("size must be >= 1")
+        self.db_path = db_path
+        self.size = size
+        self._uri = _readonly_uri(db_path, immutable)
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._closed = False
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def _connect(self) -> sqlite3.Connection:
+        logger.debug("Opening read-only connection: %s", self._uri)
+        # Connections are handed between threads by the pool, never shared
+        return sqlite3.connect(self._uri, uri=True, check_same_thread=False)
+
+    def acquire(self) -> sqlite3.Connection:
+        if self._closed:
+            raise RuntimeError("connection pool is closed")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        with self._lock:
+            if not self._closed and self._idle.qsize() < self.size:
+                self._idle.put(conn)
+                return
+        conn.close()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self) -> None:
+        """Close idle connections; connections in use are closed on release."""
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+
+    def __enter__(self) -> "ConnectionPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
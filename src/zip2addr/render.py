@@ -0,0 +1,56 @@
+"""JSON output of lookups, rendered straight from DB rows.
+
+The CLI and the server emit results in two forms:
+
+- object: what ``zip2addr <code>`` prints; ``null`` when nothing matches,
+  the row's object for one row, and a list when a zipcode has several rows
+- list: what the server returns; always a list, ``[]`` when nothing matches
+
+``row_dict`` builds the ``Zip2Addr.to_dict()`` mapping from a query row
+without creating the model, and ``render`` produces both forms at once, byte
+for byte what ``json.dumps(..., ensure_ascii=False)`` gives for the models.
+``Zip2AddrService.lookup_json`` memoizes them per zipcode.
+"""
+
+import json
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from .models import _to_int
+
+# (object form, list form); index with a bool ``as_list``
+Rendered = Tuple[bytes, bytes]
+
+NOT_FOUND: Rendered = (b"null", b"[]")
+
+
+def _int(v: Any) -> Optional[int]:
+    return v if type(v) is int else _to_int(v)
+
+
+def row_dict(row: Sequence) -> Dict[str, Any]:
+    """Return ``Zip2Addr.from_row(row).to_dict()`` without the model."""
+    return {
+        "zipcode": row[0],
+        "pref_kana": row[3],
+        "city_kana": row[4],
+        "town_kana": row[5],
+        "prefecture": row[6],
+        "city": row[7],
+        "town": row[8],
+        "multiple_postal": _int(row[9]),
+        "koaza": _int(row[10]),
+        "chome": _int(row[11]),
+        "multiple_town": _int(row[12]),
+        "update_status": _int(row[13]),
+        "change_reason": _int(row[14]),
+        "town_note": row[15],
+    }
+
+
+def render(dicts: Sequence[Dict[str, Any]]) -> Rendered:
+    """Return the object and list forms of one zipcode's rows."""
+    if not dicts:
+        return NOT_FOUND
+    objs = [json.dumps(d, ensure_ascii=False) for d in dicts]
+    as_list = ("[" + ", ".join(objs) + "]").encode("utf-8")
+    return (objs[0].encode("utf-8") if len(objs) == 1 else as_list, as_list)
@@ -0,0 +1,125 @@
+"""SQL for each on-disk schema version of the bundled DB.
+
+The version is stored in ``PRAGMA user_version`` by ``scripts/generate_db.py``.
+DBs without a marker (version 0) use the original flat ``postal`` table.
+Version 2 clusters rows by zipcode in a WITHOUT ROWID ``address`` table and
+moves prefecture and city strings into the ``pref`` and ``city`` tables.
+Version 3 stores cleaned town names: the build merges rows KEN_ALL splits,
+empties placeholder towns and moves parenthesized annotations to
+``address.town_note``. Its queries also return ``town_note``, which is NULL
+for older versions.
+
+Since the ``meta`` table was added, DBs also record the Japan Post data
+version they were built or last updated from (``read_data_version``) and a
+random id that changes on every build or update (``read_build_id``).
+
+Every query returns the columns in the order expected by
+``Zip2Addr.from_row``.
+"""
+
+import sqlite3
+from typing import Dict, NamedTuple, Optional
+
+SCHEMA_VERSION = 3
+
+# Codes per "zipcode IN (...)" query; stays below SQLITE_MAX_VARIABLE_NUMBER
+# (999) of older SQLite builds
+_CHUNK_SIZE = 500
+
+# Zip2Addr fields usable as search criteria
+SEARCH_FIELDS = (
+    "zipcode",
+    "prefecture",
+    "city",
+    "town",
+    "pref_kana",
+    "city_kana",
+    "town_kana",
+)
+
+
+class Queries(NamedTuple):
+    columns: str
+    order: str
+    select_all: str
+    select_one: str
+    # str.format() template taking the "?, ?, ..." placeholder list
+    select_in: str
+    # SEARCH_FIELDS name -> SQL column
+    fields: Dict[str, str]
+
+
+def _queries(columns: str, order: str, fields: Dict[str, str]) -> Queries:
+    return Queries(
+        columns=columns,
+        order=order,
+        select_all=columns + order,
+        select_one=columns + " WHERE zipcode = ?" + order,
+        select_in=columns + " WHERE zipcode IN ({})" + order,
+        fields=fields,
+    )
+
+
+LEGACY = _queries(
+    "SELECT zipcode, jis_code, old_postal_code, pref_kana, city_kana, town_kana, "
+    "prefecture, city, town, multiple_postal, koaza, chome, multiple_town, "
+    "update_status, change_reason, NULL FROM postal",
+    # Rows of a zipcode may be scattered through the table; this keeps them
+    # together, in insertion order, as every reader of select_all expects
+    " ORDER BY zipcode, rowid",
+    {name: name for name in SEARCH_FIELDS},
+)
+
+# str.format() template taking the town_note column
+_ADDRESS_COLUMNS = (
+    "SELECT zipcode, city.jis_code, old_postal_code, pref.kana, city.kana, "
+    "town_kana, pref.name, city.name, town, multiple_postal, koaza, chome, "
+    "multiple_town, update_status, change_reason, {} FROM address "
+    "JOIN city ON city.id = address.city_id JOIN pref ON pref.id = city.pref_id"
+)
+_ADDRESS_FIELDS = {
+    "zipcode": "zipcode",
+    "prefecture": "pref.name",
+    "city": "city.name",
+    "town": "town",
+    "pref_kana": "pref.kana",
+    "city_kana": "city.kana",
+    "town_kana": "town_kana",
+}
+# Matches the primary key, so this never needs a sort step
+_ADDRESS_ORDER = " ORDER BY zipcode, seq"
+
+V2 = _queries(_ADDRESS_COLUMNS.format("NULL"), _ADDRESS_ORDER, _ADDRESS_FIELDS)
+V3 = _queries(_ADDRESS_COLUMNS.format("town_note"), _ADDRESS_ORDER, _ADDRESS_FIELDS)
+
+
+def read_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def queries_for(conn: sqlite3.Connection) -> Queries:
+    version = read_version(conn)
+    if version >= 3:
+        return V3
+    return V2 if version >= 2 else LEGACY
+
+
+def _read_meta(conn: sqlite3.Connection, key: str) -> Optional[str]:
+    try:
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    except sqlite3.OperationalError:  # no meta table
+        return None
+    return row[0] if row else None
+
+
+def read_data_version(conn: sqlite3.Connection) -> Optional[str]:
+    """Return the recorded data version, or None for DBs without one."""
+    return _read_meta(conn, "data_version")
+
+
+def read_build_id(conn: sqlite3.Connection) -> Optional[str]:
+    """Return the id of the last build or update, or None for DBs without one.
+
+    Unlike the data version, it differs between two builds of the same data.
+    """
+    return _read_meta(conn, "build_id")
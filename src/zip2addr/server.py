@@ -0,0 +1,284 @@
+"""HTTP lookup server holding one warm Zip2AddrService.
+
+Endpoints (all JSON):
+
+    GET  /lookup/{code}   list of matching rows; 404 with [] if none, 400 if
+                          the code is not a 7-digit postal code
+    POST /lookup          body: JSON array of codes; response: one list of
+                          rows per code, in order
+    GET  /healthz         {"status": "ok", "data_version": ...}
+
+Responses use HTTP/1.1 keep-alive. Lookup responses carry the data version
+and build id of the DB as their ETag (tokens derived from the DB file for
+DBs that record none), so it changes with every rebuild or update, and a
+Cache-Control max-age; ``If-None-Match`` is answered with 304. With
+``watch`` the server picks up a replaced DB without restarting; see
+``Zip2AddrService.reload``.
+
+Start it with ``zip2addr serve`` or ``serve()``.
+"""
+
+import json
+import logging
+import os
+import signal
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional, Tuple
+from urllib.parse import unquote
+
+from .api import Zip2AddrService, _is_valid_postal, _normalize_postal
+
+logger = logging.getLogger(__name__)
+
+# Largest accepted POST body and number of codes per batch request
+MAX_BODY = 16 * 1024 * 1024
+MAX_BATCH = 10000
+
+
+def file_version(path: str) -> str:
+    """Return a token that changes whenever the file at ``path`` is replaced."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return "0"
+    return f"{st.st_size:x}-{st.st_mtime_ns:x}"
+
+
+class LookupHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; with Nagle on, the body of
+    # every kept-alive response would wait for the client's delayed ACK
+    disable_nagle_algorithm = True
+    server: "LookupServer"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        # The default writes every request to stderr
+        logger.debug("%s - " + format, self.address_string(), *args)
+
+    def _send_json(self, status: int, obj: Any) -> None:
+        self._send_body(status, json.dumps(obj, ensure_ascii=False).encode("utf-8"))
+
+    def _send_body(self, status: int, body: bytes, cacheable: bool = False) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if cacheable:
+            self._cache_headers()
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _cache_headers(self) -> None:
+        self.send_header("ETag", self.server.etag)
+        self.send_header("Cache-Control", f"public, max-age={self.server.max_age}")
+
+    def _error(self, status: int, message: str) -> None:
+        self._send_json(status, {"error": message})
+
+    def _not_modified(self) -> bool:
+        etags = self.headers.get("If-None-Match")
+        if etags is None:
+            return False
+        if etags.strip() != "*" and self.server.etag not in (
+            t.strip() for t in etags.split(",")
+        ):
+            return False
+        self.send_response(304)
+        self._cache_headers()
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+        return True
+
+    def do_GET(self) -> None:
+        path = self.path.split("?", 1)[0]
+        if path.startswith("/lookup/"):
+            code = unquote(path[len("/lookup/") :])
+            if not _is_valid_postal(_normalize_postal(code)):
+                self._error(400, f"invalid postal code: {code}")
+                return
+            if self._not_modified():
+                return
+            body = self.server.service.lookup_json(code, as_list=True)
+            self._send_body(404 if body == b"[]" else 200, body, True)
+        elif path == "/healthz":
+            self._send_json(
+                200, {"status": "ok", "data_version": self.server.data_version}
+            )
+        else:
+            self._error(404, "not found")
+
+    def do_POST(self) -> None:
+        if self.path.split("?", 1)[0] != "/lookup":
+            self._error(404, "not found")
+            return
+        length = self.headers.get("Content-Length")
+        if length is None or not length.isdigit():
+            # Without a length the body cannot be read on a kept-alive socket
+            self.close_connection = True
+            self._error(411, "Content-Length required")
+            return
+        if int(length) > MAX_BODY:
+            self.close_connection = True
+            self._error(413, "request body too large")
+            return
+        try:
+            codes = json.loads(self.rfile.read(int(length)))
+        except ValueError:
+            self._error(400, "body must be a JSON array of postal codes")
+            return
+        if not isinstance(codes, list) or not all(isinstance(c, str) for c in codes):
+            self._error(400, "body must be a JSON array of postal codes")
+            return
+        if len(codes) > self.server.max_batch:
+            self._error(413, f"at most {self.server.max_batch} codes per request")
+            return
+        results = self.server.service.lookup_json_many(codes, as_list=True)
+        self._send_body(200, b"[" + b", ".join(results) + b"]", True)
+
+
+class LookupServer(ThreadingHTTPServer):
+    """ThreadingHTTPServer answering lookups from ``service``.
+
+    Args:
+        address: (host, port) to bind; port 0 picks a free port
+        service: service to answer from
+        threads: serve connections on a pool of this many threads instead of
+            one new thread per connection. A kept-alive connection holds its
+            thread until the client closes it.
+        max_age: Cache-Control max-age in seconds
+        max_batch: most codes accepted by POST /lookup
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        service: Zip2AddrService,
+        threads: Optional[int] = None,
+        max_age: int = 86400,
+        max_batch: int = MAX_BATCH,
+        bind_and_activate: bool = True,
+    ):
+        super().__init__(address, LookupHandler, bind_and_activate)
+        self.service = service
+        self.max_age = max_age
+        self.max_batch = max_batch
+        self._executor = (
+            ThreadPoolExecutor(threads, thread_name_prefix="zip2addr-http")
+            if threads
+            else None
+        )
+
+    @property
+    def data_version(self) -> str:
+        """Data version being served; follows ``service.reload()``."""
+        version = self.service.data_version
+        return version if version is not None else file_version(self.service.db_path)
+
+    @property
+    def etag(self) -> str:
+        # The data version alone survives a same-day rebuild or update
+        build_id = self.service.build_id
+        if build_id is None:
+            return f'"{self.data_version}"'
+        return f'"{self.data_version}-{build_id}"'
+
+    def process_request(self, request, client_address) -> None:
+        if self._executor is None:
+            super().process_request(request, client_address)
+        else:
+            self._executor.submit(self.process_request_thread, request, client_address)
+
+    def server_close(self) -> None:
+        super().server_close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+
+def serve(
+    host: str = "127.0.0.1",
+    port: int = 8080,
+    db_path: Optional[str] = None,
+    threads: Optional[int] = None,
+    processes: int = 1,
+    max_age: int = 86400,
+    max_batch: int = MAX_BATCH,
+    watch: Optional[float] = None,
+    **kwargs: Any,
+) -> None:
+    """Serve lookups until interrupted.
+
+    With ``processes`` > 1 the listening socket is bound once and shared by
+    that many forked worker processes (POSIX only), each with its own
+    service. Backends other than sqlite are loaded before forking; with
+    ``backend="shared"`` (or ``"snapshot"``) the workers keep reading one copy
+    of the index.
+
+    Args:
+        host: interface to bind
+        port: TCP port
+        db_path: optional path to sqlite DB; if omitted use bundled db
+        threads: per-process worker threads (default: one per connection)
+        processes: number of worker processes
+        max_age: Cache-Control max-age in seconds
+        max_batch: most codes accepted by POST /lookup
+        watch: reload the DB when its file is replaced, checking every
+            ``watch`` seconds (in every worker process)
+        **kwargs: passed on to Zip2AddrService (backend, cache_size, ...)
+    """
+    if processes < 1:
+        raise ValueError("processes must be >= 1")
+    if processes > 1 and not hasattr(os, "fork"):
+        raise ValueError("processes > 1 needs os.fork()")
+    service = Zip2AddrService(db_path, **kwargs)
+    server = LookupServer(
+        (host, port), service, threads=threads, max_age=max_age, max_batch=max_batch
+    )
+    if processes == 1 or service.backend_name != "sqlite":
+        # SQLite connections must not cross a fork, so those open per worker
+        service.backend
+    print(
+        f"Serving on http://{server.server_address[0]}:{server.server_address[1]}"
+        f" ({processes} process(es), data version {server.data_version})",
+        file=sys.stderr,
+    )
+    if processes == 1:
+        if watch:
+            service.watch(watch)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            service.close()
+        return
+
+    children = []
+    for _ in range(processes):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            try:
+                service.backend
+                if watch:
+                    # Threads do not survive fork(), so each worker watches
+                    service.watch(watch)
+                server.serve_forever()
+            finally:
+                os._exit(0)
+        children.append(pid)
+    try:
+        for pid in children:
+            os.waitpid(pid, 0)
+    except KeyboardInterrupt:
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+    finally:
+        server.server_close()
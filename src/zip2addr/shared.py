@@ -0,0 +1,103 @@
+"""One lookup index shared by pre-forked worker processes.
+
+Servers such as gunicorn fork their workers from a master process. With the
+sqlite backend every worker keeps its own page cache, and an index loaded by
+the master into Python objects is slowly copied into each worker as reference
+counts are written to its pages. ``preload`` instead loads the binary
+snapshot (see ``zip2addr.snapshot``) into an anonymous shared mapping: forked
+workers inherit the mapping itself, nothing in it is ever written, and all of
+them read the same physical pages. ``Zip2AddrService(backend="shared")``
+looks up from it::
+
+    # gunicorn.conf.py
+    def on_starting(server):
+        from zip2addr.shared import preload
+
+        preload()
+
+    # in the app, after the fork
+    service = Zip2AddrService(backend="shared")
+
+A process that did not inherit a preloaded index loads its own copy on first
+use, so the backend also works without a pre-forking master.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from .snapshot import Snapshot, build_snapshot, matches_db, snapshot_path
+
+logger = logging.getLogger(__name__)
+
+_snapshots: Dict[str, Snapshot] = {}
+_lock = threading.Lock()
+
+
+def _key(db_path: Optional[str]) -> str:
+    if db_path is None:
+        from .api import _get_db_path
+
+        db_path = _get_db_path()
+    return os.path.abspath(db_path)
+
+
+def _load(db_path: str) -> Snapshot:
+    start = time.perf_counter()
+    path = snapshot_path(db_path)
+    snapshot = None
+    if os.path.exists(path):
+        with open(path, "rb") as fh:
+            data = fh.read()
+        try:
+            snapshot = Snapshot.from_bytes(data, path)
+        except ValueError as e:
+            logger.debug("Cannot use snapshot %s: %s", path, e)
+        if snapshot is not None and not matches_db(snapshot, db_path):
+            logger.debug("Snapshot %s does not match %s", path, db_path)
+            snapshot.close()
+            snapshot = None
+    if snapshot is None:
+        # No current snapshot next to the DB: build it in memory
+        data, _ = build_snapshot(db_path)
+        snapshot = Snapshot.from_bytes(data, path)
+    logger.debug(
+        "Loaded shared index of %d record(s) (%d bytes) in %.3fs",
+        snapshot.n_records,
+        len(data),
+        time.perf_counter() - start,
+    )
+    return snapshot
+
+
+def preload(db_path: Optional[str] = None) -> Snapshot:
+    """Load the index for ``db_path`` into shared memory, once per process.
+
+    Call it in the parent before forking workers. Later calls (in the parent
+    or in any forked worker) return the same index.
+
+    Args:
+        db_path: optional path to sqlite DB; if omitted use bundled db
+    """
+    key = _key(db_path)
+    snapshot = _snapshots.get(key)
+    if snapshot is not None:
+        return snapshot
+    with _lock:
+        snapshot = _snapshots.get(key)
+        if snapshot is None:
+            snapshot = _snapshots[key] = _load(key)
+        return snapshot
+
+
+def release(db_path: Optional[str] = None) -> None:
+    """Forget this process's index for ``db_path``.
+
+    The next ``preload`` (or shared-backend lookup) loads the DB again, e.g.
+    after it was updated. Backends still using the old index keep it mapped
+    until they are closed; other processes are not affected.
+    """
+    with _lock:
+        _snapshots.pop(_key(db_path), None)
@@ -0,0 +1,310 @@
+"""Read-only binary snapshot of the DB for memory-mapped lookups.
+
+A snapshot holds the same rows as the SQLite DB in a flat little-endian file
+that is ``mmap``-ed and binary-searched in place. Opening one reads only the
+header, pages are shared by every process mapping the same file, and rows are
+decoded into Zip2Addr only when their zipcode is looked up.
+
+Layout (all integers unsigned 32-bit unless noted)::
+
+    header    magic, format version, key/record/string counts, the
+              byte offset of each section below and the build id of the
+              DB it was written from (32 ASCII bytes, NUL if none)
+    keys      one 7-byte ASCII zipcode per distinct key, sorted
+    first     n_keys + 1 record numbers; key i owns records first[i:i+1]
+    records   per row: 7 string ids (pref_kana, city_kana, town_kana,
+              prefecture, city, town, town_note) and 6 signed bytes for
+              the flag columns, with -1 for NULL and NO_STRING for a NULL
+              string
+    strings   n_strings + 1 byte offsets into pool
+    pool      UTF-8 text of every distinct string
+
+Write one with ``write_snapshot`` or ``scripts/generate_db.py --snapshot``;
+``matches_db`` tells whether the DB has been rebuilt or updated since.
+``Snapshot.from_bytes`` holds one in shared memory instead (see
+``zip2addr.shared``).
+"""
+
+import mmap
+import os
+import sqlite3
+import struct
+from contextlib import closing
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+from .models import Zip2Addr
+from .pool import _readonly_uri
+from .schema import queries_for, read_build_id
+
+MAGIC = b"Z2AS"
+FORMAT_VERSION = 3
+SNAPSHOT_SUFFIX = ".snap"
+NO_STRING = 0xFFFFFFFF
+
+_KEY_SIZE = 7
+_HEADER = struct.Struct("<4s9I32s")
+_U32 = struct.Struct("<I")
+_SPAN = struct.Struct("<2I")
+_RECORD = struct.Struct("<7I6b2x")
+
+Results = Tuple[Zip2Addr, ...]
+
+
+def snapshot_path(db_path: str) -> str:
+    """Return the snapshot path that goes with ``db_path``."""
+    if db_path.endswith(SNAPSHOT_SUFFIX):
+        return db_path
+    return os.path.splitext(db_path)[0] + SNAPSHOT_SUFFIX
+
+
+def _flag(v: Optional[int]) -> int:
+    return -1 if v is None else v
+
+
+def build_snapshot(db_path: str) -> Tuple[bytes, int]:
+    """Return the snapshot of ``db_path`` and its number of records."""
+    with closing(sqlite3.connect(_readonly_uri(db_path), uri=True)) as conn:
+        rows = [
+            Zip2Addr.from_row(r) for r in conn.execute(queries_for(conn).select_all)
+        ]
+        build_id = read_build_id(conn) or ""
+    # Stable, so rows sharing a zipcode keep their lookup order
+    rows.sort(key=lambda r: r.zipcode)
+
+    string_ids: Dict[str, int] = {}
+
+    def sid(s: Optional[str]) -> int:
+        if s is None:
+            return NO_STRING
+        i = string_ids.get(s)
+        if i is None:
+            i = string_ids[s] = len(string_ids)
+        return i
+
+    keys = bytearray()
+    first = bytearray()
+    records = bytearray()
+    last = None
+    for n, r in enumerate(rows):
+        if r.zipcode != last:
+            key = r.zipcode.encode("ascii")
+            if len(key) != _KEY_SIZE:
+                raise ValueError(f"Cannot store zipcode {r.zipcode!r} in a snapshot")
+            keys += key
+            first += _U32.pack(n)
+            last = r.zipcode
+        records += _RECORD.pack(
+            sid(r.pref_kana),
+            sid(r.city_kana),
+            sid(r.town_kana),
+            sid(r.prefecture),
+            sid(r.city),
+            sid(r.town),
+            sid(r.town_note),
+            _flag(r.multiple_postal),
+            _flag(r.koaza),
+            _flag(r.chome),
+            _flag(r.multiple_town),
+            _flag(r.update_status),
+            _flag(r.change_reason),
+        )
+    first += _U32.pack(len(rows))
+
+    strings = bytearray()
+    pool = bytearray()
+    for s in string_ids:
+        strings += _U32.pack(len(pool))
+        pool += s.encode("utf-8")
+    strings += _U32.pack(len(pool))
+
+    n_keys = len(keys) // _KEY_SIZE
+    keys_off = _HEADER.size
+    # Keep the 32-bit sections 4-byte aligned after the 7-byte keys
+    first_off = keys_off + len(keys) + (-len(keys) % 4)
+    rec_off = first_off + len(first)
+    str_off = rec_off + len(records)
+    pool_off = str_off + len(strings)
+    header = _HEADER.pack(
+        MAGIC,
+        FORMAT_VERSION,
+        n_keys,
+        len(rows),
+        len(string_ids),
+        keys_off,
+        first_off,
+        rec_off,
+        str_off,
+        pool_off,
+        build_id.encode("ascii"),
+    )
+    padding = b"\0" * (first_off - keys_off - len(keys))
+    data = b"".join((header, keys, padding, first, records, strings, pool))
+    return data, len(rows)
+
+
+def write_snapshot(db_path: str, out_path: Optional[str] = None) -> int:
+    """Write a snapshot of ``db_path`` and return the number of records.
+
+    The file is written next to ``out_path`` (default:
+    ``snapshot_path(db_path)``) and moved into place once complete.
+    """
+    out_path = out_path or snapshot_path(db_path)
+    data, count = build_snapshot(db_path)
+    tmp_path = out_path + ".tmp"
+    try:
+        with open(tmp_path, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return count
+
+
+def matches_db(snapshot: "Snapshot", db_path: str) -> bool:
+    """Return whether ``snapshot`` was written from ``db_path`` as it is now.
+
+    A snapshot left behind by an earlier build or update of the DB carries
+    that build's id and no longer matches. Neither does one of a DB without
+    a build id, which cannot be told apart from its other versions.
+    """
+    if snapshot.build_id is None:
+        return False
+    try:
+        with closing(sqlite3.connect(_readonly_uri(db_path), uri=True)) as conn:
+            return read_build_id(conn) == snapshot.build_id
+    except sqlite3.Error:
+        return False
+
+
+class Snapshot:
+    """A memory-mapped snapshot file.
+
+    Args:
+        path: snapshot written by ``write_snapshot``
+
+    Raises:
+        ValueError: if the file is not a snapshot of a supported version
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as fh:
+            # mmap() rejects empty files, which are not snapshots either
+            if os.fstat(fh.fileno()).st_size < _HEADER.size:
+                raise ValueError(f"Not a zip2addr snapshot: {path}")
+            mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        self._attach(mm, path)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, name: str = "<memory>") -> "Snapshot":
+        """Copy a snapshot into an anonymous shared mapping.
+
+        The mapping is inherited, not copied, by processes forked afterwards,
+        so they all read the same physical pages.
+        """
+        if len(data) < _HEADER.size:
+            raise ValueError(f"Not a zip2addr snapshot: {name}")
+        # Anonymous maps are MAP_SHARED on POSIX
+        mm = mmap.mmap(-1, len(data))
+        mm.write(data)
+        self = cls.__new__(cls)
+        self._attach(mm, name)
+        return self
+
+    def _attach(self, mm: mmap.mmap, path: str) -> None:
+        self.path = path
+        self._mm = mm
+        (
+            magic,
+            version,
+            self.n_keys,
+            self.n_records,
+            self.n_strings,
+            self._keys_off,
+            self._first_off,
+            self._rec_off,
+            self._str_off,
+            self._pool_off,
+            build_id,
+        ) = _HEADER.unpack_from(self._mm)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            mm.close()
+            raise ValueError(
+                f"Not a zip2addr snapshot (version {FORMAT_VERSION}): {path}"
+            )
+        self.build_id: Optional[str] = build_id.rstrip(b"\0").decode() or None
+
+    def _key(self, i: int) -> bytes:
+        off = self._keys_off + i * _KEY_SIZE
+        return self._mm[off : off + _KEY_SIZE]
+
+    def bisect(self, key: str) -> int:
+        """Return the index of the first stored key >= ``key``."""
+        target = key.encode("ascii", "replace")
+        lo, hi = 0, self.n_keys
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _string(self, i: int) -> Optional[str]:
+        if i == NO_STRING:
+            return None
+        start, end = _SPAN.unpack_from(self._mm, self._str_off + 4 * i)
+        off = self._pool_off
+        return self._mm[off + start : off + end].decode("utf-8")
+
+    def _records(self, i: int) -> Results:
+        zipcode = self._key(i).decode("ascii")
+        start, end = _SPAN.unpack_from(self._mm, self._first_off + 4 * i)
+        s = self._string
+        out = []
+        for n in range(start, end):
+            (pk, ck, tk, p, c, t, tn, *flags) = _RECORD.unpack_from(
+                self._mm, self._rec_off + n * _RECORD.size
+            )
+            mp, ko, ch, mt, us, cr = (None if f < 0 else f for f in flags)
+            out.append(
+                Zip2Addr(
+                    zipcode, s(pk), s(ck), s(tk), s(p), s(c), s(t),
+                    mp, ko, ch, mt, us, cr, s(tn),
+                )  # fmt: skip
+            )
+        return tuple(out)
+
+    def get(self, key: str) -> Results:
+        i = self.bisect(key)
+        if i < self.n_keys and self._key(i) == key.encode("ascii", "replace"):
+            return self._records(i)
+        return ()
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, Results]:
+        found = {}
+        for k in keys:
+            rows = self.get(k)
+            if rows:
+                found[k] = rows
+        return found
+
+    def iter_from(self, prefix: str = "") -> Iterator[Tuple[str, Results]]:
+        """Yield (zipcode, rows) in zipcode order for keys starting with ``prefix``."""
+        target = prefix.encode("ascii", "replace")
+        for i in range(self.bisect(prefix), self.n_keys):
+            if not self._key(i).startswith(target):
+                return
+            rows = self._records(i)
+            yield rows[0].zipcode, rows
+
+    def close(self) -> None:
+        self._mm.close()
+
+    def __enter__(self) -> "Snapshot":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
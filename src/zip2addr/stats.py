@@ -0,0 +1,144 @@
+"""Opt-in counters and latency histograms for Zip2AddrService.
+
+Pass ``stats=True`` (or a ``ServiceStats``) to Zip2AddrService to enable
+them; without it the service skips every clock read. ``to_dict()`` returns
+plain data for exporters, e.g. one Prometheus histogram per stage::
+
+    {
+        "counters": {"lookups": 10, "cache_hits": 7, ...},
+        "timings": {
+            "query": {"count": 3, "sum": 0.0001, "buckets": {"1e-06": 0, ...,
+                      "+Inf": 3}},
+            ...
+        },
+    }
+
+Bucket counts are cumulative and keyed by their upper bound in seconds.
+"""
+
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Upper bounds in seconds, from a dict probe to a cold DB open
+BUCKETS: Tuple[float, ...] = (
+    1e-6, 2.5e-6, 5e-6,
+    1e-5, 2.5e-5, 5e-5,
+    1e-4, 2.5e-4, 5e-4,
+    1e-3, 2.5e-3, 5e-3,
+    1e-2, 2.5e-2, 5e-2,
+    0.1, 0.25, 0.5, 1.0,
+)  # fmt: skip
+
+# Stages timed by the service and its backends
+STAGES = (
+    "normalize",  # postal code normalization
+    "acquire",  # checking a connection out of the pool
+    "query",  # SQL execution and fetch, or the backend's own lookup
+    "convert",  # building Zip2Addr instances from rows
+    "lookup",  # a whole Zip2AddrService.lookup call
+    "lookup_many",  # a whole Zip2AddrService.lookup_many call
+)
+
+Hook = Callable[[str, float], None]
+
+
+class Histogram:
+    """Count and sum of observations, bucketed by ``bounds``."""
+
+    __slots__ = ("bounds", "counts", "count", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...] = BUCKETS):
+        self.bounds = bounds
+        # One slot per bound plus the overflow (+Inf) bucket
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def to_dict(self) -> Dict[str, object]:
+        buckets = {}
+        total = 0
+        for bound, n in zip(self.bounds, self.counts):
+            total += n
+            buckets[f"{bound:g}"] = total
+        buckets["+Inf"] = self.count
+        return {"count": self.count, "sum": self.sum, "buckets": buckets}
+
+
+class ServiceStats:
+    """Thread-safe counters and per-stage timings.
+
+    Args:
+        bounds: histogram bucket upper bounds in seconds
+    """
+
+    def __init__(self, bounds: Tuple[float, ...] = BUCKETS):
+        self.bounds = bounds
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {}
+        self._timings: Dict[str, Histogram] = {}
+        self._hooks: List[Hook] = []
+
+    def subscribe(self, hook: Hook) -> None:
+        """Call ``hook(stage, seconds)`` for every timing observed.
+
+        Hooks run on the calling thread, outside the stats lock, and must not
+        raise.
+        """
+        self._hooks = self._hooks + [hook]
+
+    def incr(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            hist = self._timings.get(stage)
+            if hist is None:
+                hist = self._timings[stage] = Histogram(self.bounds)
+            hist.observe(seconds)
+        for hook in self._hooks:
+            hook(stage, seconds)
+
+    def record(
+        self,
+        timings: Iterable[Tuple[str, float]] = (),
+        counts: Iterable[Tuple[str, int]] = (),
+    ) -> None:
+        """Observe several timings and counters under one lock acquisition."""
+        timings = tuple(timings)
+        with self._lock:
+            for stage, seconds in timings:
+                hist = self._timings.get(stage)
+                if hist is None:
+                    hist = self._timings[stage] = Histogram(self.bounds)
+                hist.observe(seconds)
+            counters = self._counters
+            for name, n in counts:
+                counters[name] = counters.get(name, 0) + n
+        for hook in self._hooks:
+            for stage, seconds in timings:
+                hook(stage, seconds)
+
+    def counter(self, name: str) -> int:
+        return self._counters.get(name, 0)
+
+    def timing(self, stage: str) -> Optional[Histogram]:
+        return self._timings.get(stage)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters = {}
+            self._timings = {}
+
+    def to_dict(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "timings": {k: h.to_dict() for k, h in self._timings.items()},
+            }
@@ -1,8 +1,74 @@
+import importlib.util
 import os
+import sqlite3
 import sys
 
+import pytest
+
 # Ensure tests can import package from src/ without setting PYTHONPATH or installing the package
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 SRC = os.path.join(ROOT, "src")
 if SRC not in sys.path:
     sys.path.insert(0, SRC)
+
+_spec = importlib.util.spec_from_file_location(
+    "generate_db", os.path.join(ROOT, "scripts", "generate_db.py")
+)
+generate_db = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(generate_db)
+
+# Default rows for the ``db`` fixture, in utf_ken_all.csv format. The flags of
+# the last row are left empty so they read back as NULL.
+KEN_ALL = (
+    '13101,"100  ","1000001","ﾄｳｷｮｳﾄ","ﾁﾖﾀﾞｸ","ﾁﾖﾀﾞ","東京都","千代田区","千代田",0,0,0,0,0,0\n'
+    '23233,"452  ","4520961","ｱｲﾁｹﾝ","ｷﾖｽｼ","ﾊﾙﾋｻｶﾞﾋｶﾞｼ","愛知県","清須市","春日砂賀東",0,0,0,1,0,0\n'
+    '23233,"452  ","4520961","ｱｲﾁｹﾝ","ｷﾖｽｼ","ﾊﾙﾋﾌﾘｶﾀ","愛知県","清須市","春日振形",0,0,0,1,0,6\n'
+    '01101,"060  ","0600000","ﾎｯｶｲﾄﾞｳ","ｻｯﾎﾟﾛｼﾁｭｳｵｳｸ","ｲｶﾆｹｲｻｲｶﾞﾅｲﾊﾞｱｲ","北海道","札幌市中央区","以下に掲載がない場合",,,,,,\n'
+)
+
+LEGACY_SQL = "CREATE TABLE postal (id INTEGER PRIMARY KEY, zipcode TEXT, jis_code TEXT, old_postal_code TEXT, pref_kana TEXT, city_kana TEXT, town_kana TEXT, prefecture TEXT, city TEXT, town TEXT, multiple_postal INTEGER, koaza INTEGER, chome INTEGER, multiple_town INTEGER, update_status INTEGER, change_reason INTEGER)"
+
+
+def _create_legacy_db(csv: str, path: str):
+    conn = sqlite3.connect(path)
+    conn.execute(LEGACY_SQL)
+    conn.executemany(
+        "INSERT INTO postal (zipcode, jis_code, old_postal_code, pref_kana, city_kana, town_kana, prefecture, city, town, multiple_postal, koaza, chome, multiple_town, update_status, change_reason) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        generate_db.iter_rows(csv.splitlines()),
+    )
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture(params=["legacy", "v3"])
+def schema(request):
+    """DB layout: the flat legacy postal table or the current schema."""
+    return request.param
+
+
+@pytest.fixture
+def make_db(tmp_path, schema):
+    """Return ``make(csv=KEN_ALL, name="test.db")``, which (re)builds a DB.
+
+    The legacy layout stores the parsed CSV rows as they are; the current one
+    is written by generate_db.create_db.
+    """
+
+    def make(csv: str = KEN_ALL, name: str = "test.db") -> str:
+        path = str(tmp_path / name)
+        if os.path.exists(path):
+            os.remove(path)
+        if schema == "legacy":
+            _create_legacy_db(csv, path)
+        else:
+            csv_path = tmp_path / (name + ".csv")
+            csv_path.write_text(csv, encoding="utf-8")
+            generate_db.create_db(str(csv_path), path)
+        return path
+
+    return make
+
+
+@pytest.fixture
+def db(make_db):
+    return make_db()
@@ -0,0 +1,162 @@
+"""Unit tests for zip2addr.aio module."""
+
+import asyncio
+import sqlite3
+import threading
+
+import pytest
+
+from zip2addr.aio import AsyncZip2AddrService
+from zip2addr.snapshot import write_snapshot
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = tmp_path / "test.db"
+    conn = sqlite3.connect(str(path))
+    conn.execute(
+        "CREATE TABLE postal (id INTEGER PRIMARY KEY, zipcode TEXT, jis_code TEXT, old_postal_code TEXT, pref_kana TEXT, city_kana TEXT, town_kana TEXT, prefecture TEXT, city TEXT, town TEXT, multiple_postal INTEGER, koaza INTEGER, chome INTEGER, multiple_town INTEGER, update_status INTEGER, change_reason INTEGER)"
+    )
+    conn.executemany(
+        "INSERT INTO postal (zipcode, jis_code, prefecture, city, town) VALUES (?, ?, ?, ?, ?)",
+        [
+            ("1000001", "13101", "東京都", "千代田区", "千代田"),
+            ("4520961", "23233", "愛知県", "清須市", "春日砂賀東"),
+            ("4520961", "23233", "愛知県", "清須市", "春日振形"),
+        ],
+    )
+    conn.commit()
+    conn.close()
+    return str(path)
+
+
+class TestAsyncZip2AddrService:
+    """Unit tests for AsyncZip2AddrService class."""
+
+    def test_lookup(self, db):
+        """Test async lookup returns the same results as the sync service."""
+
+        async def run():
+            async with AsyncZip2AddrService(db_path=db) as service:
+                found = await service.lookup("100-0001")
+                missing = await service.lookup("9999999")
+                invalid = await service.lookup("100")
+                return found, missing, invalid
+
+        found, missing, invalid = asyncio.run(run())
+        assert [r.town for r in found] == ["千代田"]
+        assert missing == []
+        assert invalid == []
+
+    def test_lookup_many(self, db):
+        """Test async batch lookup keeps input order."""
+
+        async def run():
+            async with AsyncZip2AddrService(db_path=db, max_workers=2) as service:
+                return await service.lookup_many(["4520961", "9999999", "1000001"])
+
+        result = asyncio.run(run())
+        assert [len(r) for r in result] == [2, 0, 1]
+
+    def test_lookup_coalesced(self, db):
+        """Test concurrent lookups of one code share a single query."""
+        calls = []
+        release = threading.Event()
+
+        async def run():
+            async with AsyncZip2AddrService(db_path=db, cache_size=0) as service:
+                fetch = service.service._fetch
+
+                def slow_fetch(key):
+                    calls.append(key)
+                    release.wait(5)
+                    return fetch(key)
+
+                service.service._fetch = slow_fetch
+                tasks = [
+                    asyncio.ensure_future(service.lookup(code))
+                    for code in ["100-0001", "1000001", "１００－０００１"]
+                ]
+                await asyncio.sleep(0.05)
+                assert service.pending == 1
+                release.set()
+                results = await asyncio.gather(*tasks)
+                assert service.pending == 0
+                return results
+
+        results = asyncio.run(run())
+        assert calls == ["1000001"]
+        assert all(r[0].town == "千代田" for r in results)
+        assert results[0] is not results[1]
+
+    def test_cache_hit_on_loop(self, db):
+        """Test cached codes are answered without the executor."""
+
+        async def run():
+            async with AsyncZip2AddrService(db_path=db) as service:
+                await service.lookup("1000001")
+                service.service._fetch = None
+                return await service.lookup("1000001"), service.service.cache_info()
+
+        result, info = asyncio.run(run())
+        assert result[0].town == "千代田"
+        assert info.hits == 1
+
+    def test_snapshot_decoded_off_loop(self, db):
+        """Test snapshot records are decoded on the executor, not the loop."""
+        write_snapshot(db)
+        threads = []
+
+        async def run():
+            async with AsyncZip2AddrService(db_path=db, backend="snapshot") as service:
+                snapshot = service.service.backend.snapshot
+                get = snapshot.get
+
+                def tracked_get(key):
+                    threads.append(threading.current_thread())
+                    return get(key)
+
+                snapshot.get = tracked_get
+                return await service.lookup("1000001")
+
+        result = asyncio.run(run())
+        assert result[0].town == "千代田"
+        assert threads and threading.main_thread() not in threads
+
+    def test_max_concurrency(self, db):
+        """Test max_concurrency bounds DB calls in flight."""
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        async def run():
+            async with AsyncZip2AddrService(
+                db_path=db, max_workers=4, max_concurrency=2, cache_size=0
+            ) as service:
+                fetch = service.service._fetch
+
+                def tracked_fetch(key):
+                    with lock:
+                        active.append(key)
+                        peak.append(len(active))
+                    try:
+                        threading.Event().wait(0.01)
+                        return fetch(key)
+                    finally:
+                        with lock:
+                            active.remove(key)
+
+                service.service._fetch = tracked_fetch
+                codes = [f"{i:07d}" for i in range(10)]
+                return await asyncio.gather(*(service.lookup(c) for c in codes))
+
+        results = asyncio.run(run())
+        assert len(results) == 10
+        assert max(peak) <= 2
+
+    def test_invalid_arguments(self, db):
+        """Test invalid limits are rejected."""
+        with pytest.raises(ValueError):
+            AsyncZip2AddrService(db_path=db, max_workers=0)
+        with pytest.raises(ValueError):
+            AsyncZip2AddrService(db_path=db, max_concurrency=0)
@@ -1,8 +1,22 @@
 """Unit tests for zip2addr.api module."""
 
+import json
+import os
 import sqlite3
+import sys
+import types
 
-from zip2addr.api import Zip2AddrService, _normalize_postal, lookup
+import pytest
+
+from zip2addr.api import (
+    Zip2AddrService,
+    _cache_version,
+    _is_valid_postal,
+    _normalize_postal,
+    lookup,
+    lookup_many,
+)
+from zip2addr.snapshot import write_snapshot
 
 
 class TestNormalizePostal:
@@ -33,10 +47,30 @@ class TestNormalizePostal:
         result = _normalize_postal("100abc0001")
         assert result == "1000001"
 
+    def test_normalize_dash_variants(self):
+        """Test normalization of dash, space and postal mark variants."""
+        assert _normalize_postal("〒100‐0001") == "1000001"
+        assert _normalize_postal("100ー0001") == "1000001"
+        assert _normalize_postal("１００ ０００１") == "1000001"
+
+    def test_normalize_non_ascii_digits(self):
+        """Test digits from other scripts and compatibility digits are dropped."""
+        assert _normalize_postal("100-000١") == "100000"
+        assert _normalize_postal("①⓪⓪⓪⓪⓪①") == ""
+        for code in ("²100000", "①000000"):
+            assert not _is_valid_postal(_normalize_postal(code))
+
 
 class TestLookup:
     """Unit tests for lookup function."""
 
+    def test_lookup_invalid_postal(self, tmp_path):
+        """Test lookup rejects codes that are not 7 digits before opening the DB."""
+        db = tmp_path / "test.db"
+        assert lookup("100-001", db_path=str(db)) == []
+        assert lookup("1000-0001", db_path=str(db)) == []
+        assert not db.exists()
+
     def test_lookup_empty_postal(self):
         """Test lookup with empty postal code."""
         result = lookup("")
@@ -100,6 +134,65 @@ class TestLookup:
         assert result[0].zipcode == "1000001"
 
 
+def _create_many_db(path):
+    conn = sqlite3.connect(str(path))
+    conn.execute(
+        "CREATE TABLE postal (id INTEGER PRIMARY KEY, zipcode TEXT, jis_code TEXT, old_postal_code TEXT, pref_kana TEXT, city_kana TEXT, town_kana TEXT, prefecture TEXT, city TEXT, town TEXT, multiple_postal INTEGER, koaza INTEGER, chome INTEGER, multiple_town INTEGER, update_status INTEGER, change_reason INTEGER)"
+    )
+    conn.executemany(
+        "INSERT INTO postal (zipcode, jis_code, prefecture, city, town) VALUES (?, ?, ?, ?, ?)",
+        [
+            ("1000001", "13101", "東京都", "千代田区", "千代田"),
+            ("0600042", "01101", "北海道", "札幌市中央区", "大通西"),
+            ("4520961", "23233", "愛知県", "清須市", "春日砂賀東"),
+            ("4520961", "23233", "愛知県", "清須市", "春日振形"),
+        ],
+    )
+    conn.commit()
+    conn.close()
+
+
+class TestLookupMany:
+    """Unit tests for lookup_many function."""
+
+    def test_lookup_many_aligned(self, tmp_path):
+        """Test results are aligned to input order, including misses and duplicates."""
+        db = tmp_path / "test.db"
+        _create_many_db(db)
+
+        result = lookup_many(
+            ["452-0961", "", "9999999", "1000001", "100-0001", "0600042", "100"],
+            db_path=str(db),
+            chunk_size=2,
+        )
+        assert [len(r) for r in result] == [2, 0, 0, 1, 1, 1, 0]
+        assert [r.town for r in result[0]] == ["春日砂賀東", "春日振形"]
+        assert result[3][0].prefecture == "東京都"
+        assert result[5][0].city == "札幌市中央区"
+        assert result[3] is not result[4]
+
+    def test_lookup_many_nonexistent_db(self, tmp_path):
+        """Test lookup_many with nonexistent database path."""
+        result = lookup_many(["1000001", "0600042"], db_path=str(tmp_path / "x.db"))
+        assert result == [[], []]
+
+    def test_service_lookup_many(self, tmp_path):
+        """Test service lookup_many fills and uses the cache."""
+        db = tmp_path / "test.db"
+        _create_many_db(db)
+
+        service = Zip2AddrService(db_path=str(db))
+        service.lookup("1000001")
+        result = service.lookup_many(["0600042", "100-0001", "9999999", "0600042"])
+        assert [len(r) for r in result] == [1, 1, 0, 1]
+        assert result[1][0].town == "千代田"
+        info = service.cache_info()
+        assert info.hits == 1
+        assert info.currsize == 3
+        assert service.lookup("9999999") == []
+        assert service.cache_info().hits == 2
+
+
 class TestZip2AddrService:
     """Unit tests for Zip2AddrService class."""
 
@@ -130,3 +223,317 @@ class TestZip2AddrService:
         result = service.lookup("100-0001")
         assert len(result) == 1
         assert result[0].prefecture == "東京都"
+
+    def test_service_reuses_connections(self, tmp_path):
+        """Test service lookups share pooled connections."""
+        db = tmp_path / "test.db"
+        conn = sqlite3.connect(str(db))
+        cur = conn.cursor()
+        cur.execute(
+            "CREATE TABLE postal (zipcode TEXT PRIMARY KEY, jis_code TEXT, old_postal_code TEXT, pref_kana TEXT, city_kana TEXT, town_kana TEXT, prefecture TEXT, city TEXT, town TEXT, multiple_postal INTEGER, koaza INTEGER, chome INTEGER, multiple_town INTEGER, update_status INTEGER, change_reason INTEGER)"
+        )
+        cur.execute(
+            "INSERT INTO postal (zipcode, jis_code, pref_kana, city_kana, town_kana, prefecture, city, town) VALUES ('1000001','13101','ﾄｳｷｮｳﾄ','ﾁﾖﾀﾞｸ','ﾁﾖﾀﾞ','東京都','千代田区','千代田')"
+        )
+        conn.commit()
+        conn.close()
+
+        service = Zip2AddrService(db_path=str(db))
+        service.lookup("1000001")
+        pool = service._backend.pool
+        service.lookup("0000000")
+        assert service._backend.pool is pool
+        assert pool._idle.qsize() == 1
+        service.close()
+        assert pool.closed
+
+    def test_service_context_manager(self, tmp_path):
+        """Test service closes its pool when used as a context manager."""
+        db = tmp_path / "test.db"
+        conn = sqlite3.connect(str(db))
+        conn.execute(
+            "CREATE TABLE postal (zipcode TEXT PRIMARY KEY, jis_code TEXT, old_postal_code TEXT, pref_kana TEXT, city_kana TEXT, town_kana TEXT, prefecture TEXT, city TEXT, town TEXT, multiple_postal INTEGER, koaza INTEGER, chome INTEGER, multiple_town INTEGER, update_status INTEGER, change_reason INTEGER)"
+        )
+        conn.commit()
+        conn.close()
+
+        with Zip2AddrService(db_path=str(db)) as service:
+            assert service.lookup("9999999") == []
+            pool = service._backend.pool
+        assert pool.closed
+        assert service._backend is None
+
+    def test_service_nonexistent_db(self, tmp_path):
+        """Test service lookup with nonexistent database path."""
+        service = Zip2AddrService(db_path=str(tmp_path / "nonexistent.db"))
+        assert service.lookup("1000001") == []
+        assert service.backend is None
+
+    def test_service_cache(self, tmp_path):
+        """Test service caches results, including empty ones, by normalized code."""
+        db = tmp_path / "test.db"
+        conn = sqlite3.connect(str(db))
+        cur = conn.cursor()
+        cur.execute(
+            "CREATE TABLE postal (zipcode TEXT PRIMARY KEY, jis_code TEXT, old_postal_code TEXT, pref_kana TEXT, city_kana TEXT, town_kana TEXT, prefecture TEXT, city TEXT, town TEXT, multiple_postal INTEGER, koaza INTEGER, chome INTEGER, multiple_town INTEGER, update_status INTEGER, change_reason INTEGER)"
+        )
+        cur.execute(
+            "INSERT INTO postal (zipcode, jis_code, pref_kana, city_kana, town_kana, prefecture, city, town) VALUES ('1000001','13101','ﾄｳｷｮｳﾄ','ﾁﾖﾀﾞｸ','ﾁﾖﾀﾞ','東京都','千代田区','千代田')"
+        )
+        conn.commit()
+        conn.close()
+
+        service = Zip2AddrService(db_path=str(db), cache_size=2)
+        first = service.lookup("100-0001")
+        second = service.lookup("１００－０００１")
+        assert first == second
+        assert service.lookup("9999999") == []
+        assert service.lookup("9999999") == []
+        info = service.cache_info()
+        assert (info.hits, info.misses, info.currsize) == (2, 2, 2)
+        service.cache_clear()
+        assert service.cache_info().currsize == 0
+
+    def test_service_cache_disabled(self, tmp_path):
+        """Test cache_size=0 disables caching."""
+        service = Zip2AddrService(db_path=str(tmp_path / "test.db"), cache_size=0)
+        assert service.lookup("1000001") == []
+        assert service.cache_info().maxsize == 0
+
+    def test_service_disk_cache(self, tmp_path):
+        """Test results cached on disk serve later services."""
+        db = tmp_path / "test.db"
+        _create_many_db(db)
+        cache_file = str(tmp_path / "cache.db")
+        with Zip2AddrService(db_path=str(db), disk_cache=cache_file) as service:
+            expected = service.lookup_many(["4520961", "9999999"])
+        with Zip2AddrService(db_path=str(db), disk_cache=cache_file) as service:
+            assert service.lookup("452-0961") == expected[0]
+            assert service.lookup_many(["9999999", "4520961"]) == expected[::-1]
+            memory, disk = service.cache_tier_info()
+            assert (memory.hits, memory.misses) == (1, 2)
+            assert (disk.hits, disk.misses) == (2, 0)
+
+    def test_service_disk_cache_version(self, tmp_path):
+        """Test a changed DB does not serve results cached for the old one."""
+        db = tmp_path / "test.db"
+        _create_many_db(db)
+        cache_file = str(tmp_path / "cache.db")
+        with Zip2AddrService(
+            db_path=str(db), cache_size=0, disk_cache=cache_file
+        ) as service:
+            assert service.lookup("1000001")[0].town == "千代田"
+            conn = sqlite3.connect(str(db))
+            conn.execute("UPDATE postal SET town = '丸の内' WHERE zipcode = '1000001'")
+            conn.execute("INSERT INTO postal (zipcode) VALUES ('0000000')")
+            conn.commit()
+            conn.close()
+            assert service.lookup("1000001")[0].town == "千代田"
+            service.reload()
+            assert service.lookup("1000001")[0].town == "丸の内"
+            assert service.cache_tier_info()[0].misses == 1
+
+    def test_service_reload_closes_disk_cache(self, tmp_path):
+        """Test reloading closes the connection of the replaced disk cache."""
+        db = tmp_path / "test.db"
+        _create_many_db(db)
+        cache_file = str(tmp_path / "cache.db")
+        with Zip2AddrService(db_path=str(db), disk_cache=cache_file) as service:
+            for _ in range(5):
+                service.lookup("1000001")
+                old_disk = service._cache.tiers[-1]
+                assert old_disk._conn is not None
+                service.reload()
+                assert old_disk._conn is None
+                assert service._cache.tiers[-1] is not old_disk
+            assert service.lookup("1000001")[0].town == "千代田"
+
+    def test_cache_version(self, tmp_path):
+        """Test every rebuild or update of the DB gets a new cache version."""
+        db = str(tmp_path / "test.db")
+        _create_many_db(db)
+        conn = sqlite3.connect(db)
+        conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.execute("INSERT INTO meta VALUES ('data_version', '20241031')")
+        conn.commit()
+        v1 = _cache_version(db)
+        # Same data version, new contents: the file identity tells them apart
+        conn.execute("UPDATE postal SET town = '丸の内' WHERE zipcode = '1000001'")
+        conn.commit()
+        st = os.stat(db)
+        os.utime(db, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        v2 = _cache_version(db)
+        assert v2 != v1
+        # A build id identifies the contents wherever the file is copied
+        conn.execute("INSERT INTO meta VALUES ('build_id', 'a')")
+        conn.commit()
+        conn.close()
+        v3 = _cache_version(db)
+        assert v3 not in (v1, v2)
+        os.utime(db, ns=(st.st_atime_ns, st.st_mtime_ns + 2 * 10**9))
+        assert _cache_version(db) == v3
+
+    def test_service_data_version(self, tmp_path, monkeypatch):
+        """Test a bundled DB without a recorded version reports DATA_DATE."""
+        db = tmp_path / "zip2addr.db"
+        _create_many_db(db)
+        with Zip2AddrService(db_path=str(db)) as service:
+            assert service.data_version is None
+        monkeypatch.setattr("zip2addr.api._PACKAGE_DB", str(db))
+        stamp = types.ModuleType("zip2addr.data_version")
+        stamp.DATA_DATE = "20241031"
+        monkeypatch.setitem(sys.modules, "zip2addr.data_version", stamp)
+        with Zip2AddrService(db_path=str(db)) as service:
+            assert service.data_version == "20241031"
+            service.lookup("1000001")
+            assert service.data_version == "20241031"
+
+    def test_service_memory_backend(self, tmp_path):
+        """Test the in-memory backend answers from its index without caching."""
+        db = tmp_path / "test.db"
+        _create_many_db(db)
+
+        with Zip2AddrService(db_path=str(db), backend="memory") as service:
+            result = service.lookup("452-0961")
+            assert [r.town for r in result] == ["春日砂賀東", "春日振形"]
+            assert service.lookup("9999999") == []
+            many = service.lookup_many(["1000001", "9999999", "0600042"])
+            assert [len(r) for r in many] == [1, 0, 1]
+            stats = service.backend.stats()
+            assert stats["records"] == 4
+            assert stats["keys"] == 3
+            assert stats["load_time"] >= 0
+            assert stats["memory_bytes"] > 0
+            assert service.cache_info().currsize == 0
+
+    def test_service_unknown_backend(self, tmp_path):
+        """Test service rejects an unknown backend name."""
+        with pytest.raises(ValueError):
+            Zip2AddrService(db_path=str(tmp_path / "test.db"), backend="redis")
+
+
+def _create_search_db(path):
+    conn = sqlite3.connect(str(path))
+    conn.execute(
+        "CREATE TABLE postal (id INTEGER PRIMARY KEY, zipcode TEXT, jis_code TEXT, old_postal_code TEXT, pref_kana TEXT, city_kana TEXT, town_kana TEXT, prefecture TEXT, city TEXT, town TEXT, multiple_postal INTEGER, koaza INTEGER, chome INTEGER, multiple_town INTEGER, update_status INTEGER, change_reason INTEGER)"
+    )
+    conn.executemany(
+        "INSERT INTO postal (zipcode, jis_code, pref_kana, city_kana, town_kana, prefecture, city, town) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            ("1000005", "13101", "ﾄｳｷｮｳﾄ", "ﾁﾖﾀﾞｸ", "ﾏﾙﾉｳﾁ", "東京都", "千代田区", "丸の内"),
+            ("1000001", "13101", "ﾄｳｷｮｳﾄ", "ﾁﾖﾀﾞｸ", "ﾁﾖﾀﾞ", "東京都", "千代田区", "千代田"),
+            ("1000004", "13101", "ﾄｳｷｮｳﾄ", "ﾁﾖﾀﾞｸ", "ｵｵﾃﾏﾁ", "東京都", "千代田区", "大手町"),
+            ("1010021", "13101", "ﾄｳｷｮｳﾄ", "ﾁﾖﾀﾞｸ", "ｿﾄｶﾝﾀﾞ", "東京都", "千代田区", "外神田"),
+            ("1040061", "13102", "ﾄｳｷｮｳﾄ", "ﾁｭｳｵｳｸ", "ｷﾞﾝｻﾞ", "東京都", "中央区", "銀座"),
+            ("5300001", "27127", "ｵｵｻｶﾌ", "ｵｵｻｶｼｷﾀｸ", "ｳﾒﾀﾞ", "大阪府", "大阪市北区", "梅田"),
+        ],
+    )
+    conn.commit()
+    conn.close()
+
+
+class TestSearch:
+    """Unit tests for Zip2AddrService.search."""
+
+    @pytest.fixture(params=["sqlite", "memory", "snapshot"])
+    def service(self, request, tmp_path):
+        db = tmp_path / "test.db"
+        _create_search_db(db)
+        write_snapshot(str(db))
+        with Zip2AddrService(db_path=str(db), backend=request.param) as service:
+            yield service
+
+    def test_search_zipcode_prefix(self, service):
+        """Test zipcode criteria match by prefix, ordered by zipcode."""
+        result = service.search("100-")
+        assert [r.zipcode for r in result] == ["1000001", "1000004", "1000005"]
+        assert [r.zipcode for r in service.search("10")][-1] == "1040061"
+        assert service.search("1000001")[0].town == "千代田"
+        assert service.search("10000010") == []
+        assert service.search("abc") == []
+
+    def test_search_exact_fields(self, service):
+        """Test text criteria match exactly by default."""
+        result = service.search(city="千代田区")
+        assert len(result) == 4
+        assert service.search(city="千代田") == []
+        assert [r.town for r in service.search(prefecture="大阪府")] == ["梅田"]
+        result = service.search("104", prefecture="東京都", city="中央区")
+        assert [r.town for r in result] == ["銀座"]
+
+    def test_search_prefix_fields(self, service):
+        """Test prefix=True matches kana and text criteria by prefix."""
+        result = service.search(town_kana="ｿ", prefix=True)
+        assert [r.town for r in result] == ["外神田"]
+        result = service.search(city_kana="ｵｵｻｶｼ", prefix=True)
+        assert [r.zipcode for r in result] == ["5300001"]
+        assert len(service.search(prefecture="東", prefix=True)) == 5
+
+    def test_search_pagination(self, service):
+        """Test limit/offset pages and iter_search streams everything."""
+        first = service.search(pref_kana="ﾄｳｷｮｳﾄ", limit=2)
+        second = service.search(pref_kana="ﾄｳｷｮｳﾄ", limit=2, offset=2)
+        assert [r.zipcode for r in first + second] == [
+            "1000001",
+            "1000004",
+            "1000005",
+            "1010021",
+        ]
+        assert len(list(service.iter_search(pref_kana="ﾄｳｷｮｳﾄ"))) == 5
+        assert len(list(service.iter_search(pref_kana="ﾄｳｷｮｳﾄ", offset=4))) == 1
+
+
+class TestLookupJson:
+    """Unit tests for Zip2AddrService.lookup_json."""
+
+    @pytest.fixture(params=["sqlite", "memory", "snapshot"])
+    def service(self, request, tmp_path):
+        db = tmp_path / "test.db"
+        _create_search_db(db)
+        conn = sqlite3.connect(str(db))
+        conn.execute(
+            "INSERT INTO postal (zipcode, prefecture, city, town, koaza) "
+            "VALUES ('1000001', '東京都', '千代田区', '千代田二', '1')"
+        )
+        conn.commit()
+        conn.close()
+        write_snapshot(str(db))
+        with Zip2AddrService(db_path=str(db), backend=request.param) as service:
+            yield service
+
+    @staticmethod
+    def _expected(rows, as_list):
+        out = [r.to_dict() for r in rows]
+        if not as_list:
+            out = None if not out else out[0] if len(out) == 1 else out
+        return json.dumps(out, ensure_ascii=False).encode("utf-8")
+
+    @pytest.mark.parametrize("as_list", [False, True])
+    def test_lookup_json_matches_models(self, service, as_list):
+        """Test the rendered bytes equal json.dumps of the models."""
+        for code in ["1000001", "104-0061", "9999999", "bad", ""]:
+            expected = self._expected(service.lookup(code), as_list)
+            assert service.lookup_json(code, as_list) == expected
+            # Second call is served from the memo
+            assert service.lookup_json(code, as_list) == expected
+
+    def test_lookup_json_many(self, service):
+        """Test one result per input, in order, with repeated codes."""
+        codes = ["5300001", "bad", "1000001", "5300001", "9999999"]
+        result = service.lookup_json_many(codes)
+        assert result == [service.lookup_json(c) for c in codes]
+        assert result[1] == result[4] == b"null"
+        assert service.lookup_json_many(codes, as_list=True)[4] == b"[]"
+
+    def test_lookup_json_memoized(self, tmp_path):
+        """Test rendered JSON is cached, counted, and dropped by cache_clear."""
+        db = tmp_path / "test.db"
+        _create_search_db(db)
+        with Zip2AddrService(db_path=str(db), stats=True) as service:
+            service.lookup_json("1000001")
+            service.lookup_json_many(["1000001", "1000004"])
+            assert service.stats.counter("json_cache_hits") == 1
+            assert service.stats.counter("json_cache_misses") == 2
+            service.cache_clear()
+            service.lookup_json("1000001")
+            assert service.stats.counter("json_cache_misses") == 3
@@ -0,0 +1,148 @@
+"""Unit tests for zip2addr.cache module."""
+
+import pytest
+
+from zip2addr.cache import CacheInfo, DiskCache, LRUCache, TieredCache
+
+
+class TestLRUCache:
+    """Unit tests for LRUCache class."""
+
+    def test_get_put(self):
+        """Test stored values are returned and counted as hits."""
+        cache = LRUCache(maxsize=2)
+        assert cache.get("a") is None
+        cache.put("a", (1,))
+        assert cache.get("a") == (1,)
+        assert cache.info() == CacheInfo(1, 1, 0, 1, 2)
+
+    def test_empty_value_cached(self):
+        """Test empty results are distinguishable from misses."""
+        cache = LRUCache(maxsize=2)
+        cache.put("a", ())
+        assert cache.get("a") == ()
+        assert cache.info().hits == 1
+
+    def test_lru_eviction(self):
+        """Test least recently used entry is evicted first."""
+        cache = LRUCache(maxsize=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert cache.info().evictions == 1
+        assert len(cache) == 2
+
+    def test_ttl_expiry(self, monkeypatch):
+        """Test entries expire after ttl seconds."""
+        now = [100.0]
+        monkeypatch.setattr("zip2addr.cache.time.monotonic", lambda: now[0])
+        cache = LRUCache(maxsize=2, ttl=10)
+        cache.put("a", 1)
+        now[0] = 109.0
+        assert cache.get("a") == 1
+        now[0] = 110.0
+        assert cache.get("a") is None
+        assert len(cache) == 0
+
+    def test_clear(self):
+        """Test clear drops entries and resets counters."""
+        cache = LRUCache(maxsize=2)
+        cache.put("a", 1)
+        cache.get("a")
+        cache.clear()
+        assert cache.info() == CacheInfo(0, 0, 0, 0, 2)
+
+    def test_invalid_arguments(self):
+        """Test invalid size and ttl are rejected."""
+        with pytest.raises(ValueError):
+            LRUCache(maxsize=0)
+        with pytest.raises(ValueError):
+            LRUCache(ttl=0)
+
+
+class TestDiskCache:
+    """Unit tests for DiskCache class."""
+
+    def test_get_put(self, tmp_path):
+        """Test values survive reopening the file and are counted."""
+        path = str(tmp_path / "cache.db")
+        cache = DiskCache(path, "v1")
+        assert cache.get("a") is None
+        cache.put("a", ("x", 1))
+        cache.put("b", ())
+        cache.close()
+        cache = DiskCache(path, "v1")
+        assert cache.get("a") == ("x", 1)
+        assert cache.get("b") == ()
+        assert cache.info() == CacheInfo(2, 0, 0, 2, 0)
+        cache.close()
+
+    def test_version(self, tmp_path):
+        """Test other versions' entries are invisible and dropped on open."""
+        path = str(tmp_path / "cache.db")
+        old = DiskCache(path, "v1")
+        old.put("a", 1)
+        new = DiskCache(path, "v2")
+        assert new.get("a") is None
+        new.put("a", 2)
+        assert old.get("a") is None
+        assert new.get("a") == 2
+        assert len(old) == 0
+        old.close()
+        new.close()
+
+    def test_clear(self, tmp_path):
+        """Test clear drops this version's entries."""
+        cache = DiskCache(str(tmp_path / "cache.db"), "v1")
+        cache.put("a", 1)
+        cache.clear()
+        assert cache.get("a") is None
+        assert len(cache) == 0
+        cache.close()
+
+    def test_errors_are_misses(self, tmp_path):
+        """Test an unusable file makes every lookup a miss."""
+        cache = DiskCache(str(tmp_path), "v1")
+        cache.put("a", 1)
+        assert cache.get("a") is None
+        assert cache.info() == CacheInfo(0, 1, 0, 0, 0)
+
+
+class TestTieredCache:
+    """Unit tests for TieredCache class."""
+
+    def test_read_through(self, tmp_path):
+        """Test a hit in a lower tier is copied into the tiers above it."""
+        memory = LRUCache(maxsize=2)
+        disk = DiskCache(str(tmp_path / "cache.db"), "v1")
+        disk.put("a", (1,))
+        cache = TieredCache([memory, disk])
+        assert cache.get("a") == (1,)
+        assert cache.get("a") == (1,)
+        assert cache.get("b") is None
+        assert cache.tier_info() == [
+            CacheInfo(1, 2, 0, 1, 2),
+            CacheInfo(1, 1, 0, 1, 0),
+        ]
+        assert cache.info() == CacheInfo(2, 1, 0, 1, 2)
+        cache.close()
+
+    def test_write_through(self, tmp_path):
+        """Test put and clear reach every tier."""
+        memory = LRUCache(maxsize=2)
+        disk = DiskCache(str(tmp_path / "cache.db"), "v1")
+        cache = TieredCache([memory, disk])
+        cache.put("a", ())
+        assert memory.get("a") == () and disk.get("a") == ()
+        cache.clear()
+        assert len(memory) == 0 and len(disk) == 0
+        cache.close()
+
+    def test_no_tiers(self):
+        """Test at least one tier is required."""
+        with pytest.raises(ValueError):
+            TieredCache([])
@@ -1,12 +1,16 @@
 """Unit and integration tests for zip2addr.cli module."""
 
+import csv
+import io
 import json
 import os
 import sqlite3
 
 import pytest
 
+from zip2addr import cli
 from zip2addr.cli import main
+from zip2addr.models import Zip2Addr
 
 
 class TestCLIBasic:
@@ -168,3 +172,79 @@ class TestCLILookup:
         output = json.loads(captured.out)
         assert isinstance(output, dict)
         assert output["zipcode"] == "1000001"
+
+    def test_cli_lookup_forms_agree(self, monkeypatch, capsys):
+        """Test the fast path and the flagged form read the same data."""
+        calls = []
+
+        def fake_lookup(postal):
+            calls.append(postal)
+            return [Zip2Addr(zipcode="1000001", town="千代田")]
+
+        monkeypatch.setattr(cli, "lookup", fake_lookup)
+        assert main(["100-0001"]) == 0
+        fast = capsys.readouterr().out
+        assert main(["100-0001", "--debug"]) == 0
+        assert capsys.readouterr().out == fast
+        assert calls == ["100-0001", "100-0001"]
+
+
+class TestCLIBatch:
+    """Unit tests for CLI --batch mode."""
+
+    @pytest.fixture(autouse=True)
+    def package_db(self, tmp_path):
+        """Replace package DB with a test DB."""
+        db = tmp_path / "test.db"
+        conn = sqlite3.connect(str(db))
+        cur = conn.cursor()
+        cur.execute(
+            "CREATE TABLE postal (id INTEGER PRIMARY KEY, zipcode TEXT, jis_code TEXT, old_postal_code TEXT, pref_kana TEXT, city_kana TEXT, town_kana TEXT, prefecture TEXT, city TEXT, town TEXT, multiple_postal INTEGER, koaza INTEGER, chome INTEGER, multiple_town INTEGER, update_status INTEGER, change_reason INTEGER)"
+        )
+        cur.executemany(
+            "INSERT INTO postal (zipcode, jis_code, prefecture, city, town) VALUES (?, ?, ?, ?, ?)",
+            [
+                ("1000001", "13101", "東京都", "千代田区", "千代田"),
+                ("4520961", "23233", "愛知県", "清須市", "春日砂賀東"),
+                ("4520961", "23233", "愛知県", "清須市", "春日振形"),
+            ],
+        )
+        conn.commit()
+        conn.close()
+
+        pkg_db = os.path.join(
+            os.path.dirname(__import__("zip2addr").__file__), "zip2addr.db"
+        )
+        with open(db, "rb") as r, open(pkg_db, "wb") as w:
+            w.write(r.read())
+
+    def test_batch_jsonl_stdin(self, monkeypatch, capsys):
+        """Test --batch reads stdin and writes one JSON line per input line."""
+        monkeypatch.setattr("sys.stdin", io.StringIO("100-0001\n9999999\n\n4520961\n"))
+        result = main(["--batch", "--chunk-size", "2"])
+        assert result == 0
+
+        lines = capsys.readouterr().out.splitlines()
+        assert len(lines) == 4
+        assert json.loads(lines[0])["prefecture"] == "東京都"
+        assert json.loads(lines[1]) is None
+        assert json.loads(lines[2]) is None
+        assert [r["town"] for r in json.loads(lines[3])] == ["春日砂賀東", "春日振形"]
+
+    def test_batch_csv_file(self, tmp_path, capsys):
+        """Test --batch reads a file and writes CSV rows per match."""
+        src = tmp_path / "codes.txt"
+        src.write_text("4520961\n9999999\n", encoding="utf-8")
+        result = main(["--batch", "--input", str(src), "--format", "csv"])
+        assert result == 0
+
+        rows = list(csv.reader(io.StringIO(capsys.readouterr().out)))
+        assert rows[0][:2] == ["postal", "zipcode"]
+        assert [r[0] for r in rows[1:]] == ["4520961", "4520961", "9999999"]
+        assert rows[1][rows[0].index("town")] == "春日砂賀東"
+        assert rows[3] == ["9999999"]
+
+    def test_batch_with_postal(self):
+        """Test --batch rejects a positional postal code."""
+        with pytest.raises(SystemExit):
+            main(["--batch", "1000001"])
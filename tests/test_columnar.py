@@ -0,0 +1,138 @@
+"""Unit tests for zip2addr.columnar."""
+
+from array import array
+
+import pytest
+
+from zip2addr.api import Zip2AddrService
+from zip2addr.columnar import ColumnarIndex
+
+KEN_ALL = (
+    '13101,"100  ","1000001","ﾄｳｷｮｳﾄ","ﾁﾖﾀﾞｸ","ﾁﾖﾀﾞ","東京都","千代田区","千代田",0,0,0,0,0,0\n'
+    '13101,"100  ","1000004","ﾄｳｷｮｳﾄ","ﾁﾖﾀﾞｸ","ｵｵﾃﾏﾁ","東京都","千代田区","大手町",0,0,0,0,0,0\n'
+    '13206,"183  ","1830000","ﾄｳｷｮｳﾄ","ﾌﾁｭｳｼ","ｲｶﾆｹｲｻｲｶﾞﾅｲﾊﾞｱｲ","東京都","府中市","以下に掲載がない場合",0,0,0,0,0,0\n'
+    '23233,"452  ","4520961","ｱｲﾁｹﾝ","ｷﾖｽｼ","ﾊﾙﾋｻｶﾞﾋｶﾞｼ","愛知県","清須市","春日砂賀東",0,0,0,1,0,0\n'
+    '23233,"452  ","4520961","ｱｲﾁｹﾝ","ｷﾖｽｼ","ﾊﾙﾋﾌﾘｶﾀ","愛知県","清須市","春日振形",0,0,0,1,0,0\n'
+    '34208,"726  ","7260012","ﾋﾛｼﾏｹﾝ","ﾌﾁｭｳｼ","ﾅｶｽﾁｮｳ","広島県","府中市","中須町",0,0,0,0,0,0\n'
+)
+
+
+@pytest.fixture
+def index(make_db):
+    return ColumnarIndex.from_db(make_db(KEN_ALL))
+
+
+CODES = ["1000004", "452-0961", "０００００００", "bad", "", "7260012", "1000004"]
+
+
+def _names(index, cols):
+    return [
+        (
+            jis,
+            index.prefectures[p] if p >= 0 else None,
+            index.cities[c] if c >= 0 else None,
+            town,
+        )
+        for jis, p, c, town in zip(*cols)
+    ]
+
+
+EXPECTED = [
+    (13101, "東京都", "千代田区", "大手町"),
+    (23233, "愛知県", "清須市", "春日砂賀東"),
+    (-1, None, None, None),
+    (-1, None, None, None),
+    (-1, None, None, None),
+    (34208, "広島県", "府中市", "中須町"),
+    (13101, "東京都", "千代田区", "大手町"),
+]
+
+
+class TestColumnarIndex:
+    """Unit tests for ColumnarIndex."""
+
+    def test_from_db(self, index):
+        """Test one entry per zipcode and the name tables."""
+        assert len(index) == 5
+        assert list(index.keys) == [1000001, 1000004, 1830000, 4520961, 7260012]
+        assert index.prefectures == ("東京都", "愛知県", "広島県")
+        # Same city name in two prefectures
+        assert index.cities == ("千代田区", "府中市", "清須市", "府中市")
+
+    def test_lookup(self, index):
+        """Test columns without NumPy, in input order."""
+        cols = index.lookup(CODES, numpy=False)
+        assert isinstance(cols.jis_code, array)
+        assert isinstance(cols.town, list)
+        assert _names(index, cols) == EXPECTED
+
+    def test_lookup_ints(self, index):
+        """Test integer codes."""
+        cols = index.lookup([1000001, 7260012, 1000002, -5], numpy=False)
+        assert list(cols.jis_code) == [13101, 34208, -1, -1]
+
+    def test_lookup_numpy_scalars(self, index):
+        """Test lists of NumPy integer scalars, with and without NumPy arrays."""
+        np = pytest.importorskip("numpy")
+        codes = [np.int64(1000001), np.int32(7260012), np.uint32(1000002)]
+        for numpy in (False, True):
+            cols = index.lookup(codes, numpy=numpy)
+            assert list(cols.jis_code) == [13101, 34208, -1]
+
+    def test_lookup_without_numpy(self, index, monkeypatch):
+        """Test the default falls back to arrays when NumPy is missing."""
+        monkeypatch.setattr("zip2addr.columnar._numpy", lambda: None)
+        cols = index.lookup([1000001, "7260012", 1000002], numpy=None)
+        assert isinstance(cols.jis_code, array)
+        assert list(cols.jis_code) == [13101, 34208, -1]
+
+    def test_lookup_empty(self, index):
+        """Test no codes and an empty index."""
+        assert index.lookup([], numpy=False) == (array("i"), array("h"), array("i"), [])
+        cols = ColumnarIndex.from_rows(()).lookup(["1000001"], numpy=False)
+        assert list(cols.city) == [-1]
+        assert cols.town == [None]
+
+    def test_lookup_numpy(self, index):
+        """Test NumPy arrays match the fallback."""
+        np = pytest.importorskip("numpy")
+        cols = index.lookup(CODES)
+        assert isinstance(cols.jis_code, np.ndarray)
+        assert _names(index, cols) == EXPECTED
+        codes = np.array([1000001, 7260012, 1000002, 9999999], dtype=np.int64)
+        assert index.lookup(codes).jis_code.tolist() == [13101, 34208, -1, -1]
+        empty = ColumnarIndex.from_rows(())
+        assert empty.lookup(codes).town.tolist() == [None] * 4
+
+    def test_numpy_required(self, index, monkeypatch):
+        """Test numpy=True without NumPy raises ImportError."""
+        monkeypatch.setattr("zip2addr.columnar._numpy", lambda: None)
+        with pytest.raises(ImportError):
+            index.lookup(CODES, numpy=True)
+        assert index.lookup(CODES).town == [e[3] for e in EXPECTED]
+
+
+class TestServiceColumns:
+    """Unit tests for Zip2AddrService.lookup_columns."""
+
+    def test_lookup_columns(self, make_db):
+        """Test lookups match lookup_many and close() drops the index."""
+        with Zip2AddrService(make_db(KEN_ALL)) as service:
+            cols = service.lookup_columns(CODES, numpy=False)
+            index = service.columnar_index
+            for rows, (_, pref, city, town) in zip(
+                service.lookup_many(CODES), _names(index, cols)
+            ):
+                first = rows[0] if rows else None
+                assert pref == (first and first.prefecture)
+                assert city == (first and first.city)
+                assert town == (first and first.town)
+            service.close()
+            assert service.columnar_index is not index
+
+    def test_no_db(self, tmp_path):
+        """Test a missing DB gives no matches."""
+        service = Zip2AddrService(str(tmp_path / "missing.db"))
+        assert service.columnar_index is None
+        assert list(service.lookup_columns(["1000001"], numpy=False).jis_code) == [-1]
+
@@ -0,0 +1,125 @@
+"""Unit tests for zip2addr.enrich."""
+
+import io
+
+import pytest
+
+from zip2addr.cli import main
+from zip2addr import enrich as enrich_module
+from zip2addr.enrich import _iter_chunks, enrich
+
+INPUT = (
+    "id,postal,note\n"
+    "1,100-0001,a\n"
+    "2,4520961,\"multi\nline\"\n"
+    "3,9999999,c\n"
+    "4,bad,d\n"
+    "5,１００－０００１,e\n"
+)
+
+
+class TestEnrich:
+    """Unit tests for enrich function."""
+
+    @pytest.mark.parametrize("processes", [1, 2])
+    def test_enrich(self, db, processes):
+        """Test rows keep their order and gain the address columns."""
+        out = io.StringIO()
+        stats = enrich(
+            io.StringIO(INPUT),
+            out,
+            "postal",
+            db_path=db,
+            processes=processes,
+            chunk_size=2,
+        )
+        assert (stats.rows, stats.matched) == (5, 3)
+        assert stats.rows_per_sec > 0
+        assert out.getvalue() == (
+            "id,postal,note,prefecture,city,town\n"
+            "1,100-0001,a,東京都,千代田区,千代田\n"
+            '2,4520961,"multi\nline",愛知県,清須市,春日砂賀東\n'
+            "3,9999999,c,,,\n"
+            "4,bad,d,,,\n"
+            "5,１００－０００１,e,東京都,千代田区,千代田\n"
+        )
+
+    def test_enrich_files(self, db, tmp_path):
+        """Test paths, fields, prefix and delimiter options."""
+        src = tmp_path / "in.tsv"
+        src.write_text("postal\tname\n1000001\tx\n", encoding="cp932")
+        dest = tmp_path / "out.tsv"
+        enrich(
+            str(src),
+            str(dest),
+            "postal",
+            fields=("city", "prefecture"),
+            processes=1,
+            db_path=db,
+            delimiter="\t",
+            prefix="addr_",
+            encoding="cp932",
+        )
+        assert dest.read_text(encoding="cp932") == (
+            "postal\tname\taddr_city\taddr_prefecture\n1000001\tx\t千代田区\t東京都\n"
+        )
+
+    def test_enrich_memo_eviction(self, db, monkeypatch):
+        """Test evicting the memo keeps codes the current chunk needs."""
+        monkeypatch.setattr(enrich_module, "_MEMO_SIZE", 3)
+        out = io.StringIO()
+        enrich(
+            io.StringIO("postal\n1000001\n1000002\n1000005\n1000001\n1000003\n"),
+            out,
+            "postal",
+            fields=("city",),
+            db_path=db,
+            processes=1,
+            chunk_size=3,
+        )
+        assert out.getvalue() == (
+            "postal,city\n1000001,千代田区\n1000002,\n1000005,\n"
+            "1000001,千代田区\n1000003,\n"
+        )
+
+    def test_enrich_errors(self, db):
+        """Test unknown columns and fields are rejected."""
+        with pytest.raises(ValueError, match="Column 'zip' not found"):
+            enrich(io.StringIO(INPUT), io.StringIO(), "zip", db_path=db)
+        with pytest.raises(ValueError, match="Unknown field"):
+            enrich(io.StringIO(INPUT), io.StringIO(), "postal", fields=("nope",))
+        with pytest.raises(ValueError, match="processes"):
+            enrich(io.StringIO(INPUT), io.StringIO(), "postal", processes=0)
+
+    def test_iter_chunks_keeps_records_whole(self):
+        """Test chunks are never cut inside a quoted multi-line field."""
+        lines = io.StringIO('a\n"b\nc"\nd\ne\n')
+        assert list(_iter_chunks(lines, 2)) == [
+            ["a\n", '"b\n', 'c"\n'],
+            ["d\n", "e\n"],
+        ]
+
+
+class TestEnrichCLI:
+    """Unit tests for `zip2addr enrich`."""
+
+    def test_cli_enrich(self, db, tmp_path, capsys):
+        """Test the command writes the enriched file and reports throughput."""
+        src = tmp_path / "in.csv"
+        src.write_text(INPUT, encoding="utf-8")
+        dest = tmp_path / "out.csv"
+        argv = ["enrich", str(src), "-o", str(dest), "-c", "postal", "--db", db]
+        assert main(argv + ["-j", "1", "--fields", "city"]) == 0
+        assert dest.read_text(encoding="utf-8").splitlines()[:2] == [
+            "id,postal,note,city",
+            "1,100-0001,a,千代田区",
+        ]
+        assert "Enriched 5 rows (3 matched)" in capsys.readouterr().err
+
+    def test_cli_enrich_missing_column(self, db, tmp_path):
+        """Test a missing column is a usage error."""
+        src = tmp_path / "in.csv"
+        src.write_text(INPUT, encoding="utf-8")
+        with pytest.raises(SystemExit) as exc:
+            main(["enrich", str(src), "-c", "zip", "--db", db])
+        assert exc.value.code == 2
@@ -0,0 +1,309 @@
+"""Unit tests for scripts/generate_db.py."""
+
+import importlib.util
+import json
+import os
+import sqlite3
+
+import pytest
+
+from zip2addr import api
+from zip2addr.api import Zip2AddrService, lookup
+from zip2addr.schema import read_build_id, read_data_version
+
+SCRIPT = os.path.join(os.path.dirname(__file__), "..", "scripts", "generate_db.py")
+spec = importlib.util.spec_from_file_location("generate_db", SCRIPT)
+generate_db = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(generate_db)
+
+KEN_ALL = (
+    '13101,"100  ","1000001","ﾄｳｷｮｳﾄ","ﾁﾖﾀﾞｸ","ﾁﾖﾀﾞ","東京都","千代田区","千代田",0,0,0,0,0,0\n'
+    '23233,"452  ","4520961","ｱｲﾁｹﾝ","ｷﾖｽｼ","ﾊﾙﾋｻｶﾞﾋｶﾞｼ","愛知県","清須市","春日砂賀東",0,0,0,1,0,0\n'
+    '23233,"452  ","4520961","ｱｲﾁｹﾝ","ｷﾖｽｼ","ﾊﾙﾋﾌﾘｶﾀ","愛知県","清須市","春日振形",0,0,0,1,0,0\n'
+    "\n"
+)
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "utf_ken_all.csv"
+    path.write_text(KEN_ALL, encoding="utf-8")
+    return str(path)
+
+
+class TestIterRows:
+    """Unit tests for iter_rows function."""
+
+    def test_iter_rows(self):
+        """Test CSV lines become INSERT parameter tuples."""
+        rows = list(generate_db.iter_rows(KEN_ALL.splitlines()))
+        assert len(rows) == 3
+        assert rows[0][:3] == ("1000001", "13101", "100")
+        assert rows[0][6:9] == ("東京都", "千代田区", "千代田")
+        assert rows[1][9:] == (0, 0, 0, 1, 0, 0)
+
+    def test_iter_rows_short_row(self):
+        """Test missing trailing columns become empty strings and None."""
+        rows = list(generate_db.iter_rows(["13101,100,100-0001,ﾄｳｷｮｳﾄ"]))
+        assert rows == [("1000001", "13101", "100", "ﾄｳｷｮｳﾄ") + ("",) * 5 + (None,) * 6]
+
+
+def _row(zipcode, town, kana=""):
+    return (zipcode, "01408", "048", "ﾎｯｶｲﾄﾞｳ", "ﾆｷﾁｮｳ", kana, "北海道", "仁木町", town)
+
+
+class TestCleanRows:
+    """Unit tests for the town cleaning applied before insert."""
+
+    def test_merge_continuations(self):
+        """Test a town split over rows of one zipcode is joined."""
+        rows = [
+            _row("0482331", "大江（１丁目、２丁目「６５１番地」以外、", "ｵｵｴ(1ﾁｮｳﾒ､"),
+            _row("0482331", "３丁目５、１３－４番地）", "3ﾁｮｳﾒ5､13-4ﾊﾞﾝﾁ)"),
+            _row("0482332", "然別", "ｼｶﾘﾍﾞﾂ"),
+        ]
+        merged = list(generate_db.merge_continuations(rows))
+        assert [r[8] for r in merged] == [
+            "大江（１丁目、２丁目「６５１番地」以外、３丁目５、１３－４番地）",
+            "然別",
+        ]
+        assert merged[0][5] == "ｵｵｴ(1ﾁｮｳﾒ､3ﾁｮｳﾒ5､13-4ﾊﾞﾝﾁ)"
+
+    def test_merge_repeated_kana(self):
+        """Test kana repeated on continuation rows is not doubled."""
+        rows = [_row("0482331", "大江（１丁目、", "ｵｵｴ"), _row("0482331", "２丁目）", "ｵｵｴ")]
+        (merged,) = generate_db.merge_continuations(rows)
+        assert merged[5] == "ｵｵｴ"
+
+    def test_merge_unclosed_at_zipcode_change(self):
+        """Test an unclosed row is kept as is when the zipcode changes."""
+        rows = [_row("0482331", "大江（１丁目、"), _row("0482332", "然別")]
+        assert list(generate_db.merge_continuations(rows)) == rows
+
+    @pytest.mark.parametrize(
+        "town, kana, expected",
+        [
+            ("千代田", "ﾁﾖﾀﾞ", ("千代田", "ﾁﾖﾀﾞ", None)),
+            ("以下に掲載がない場合", "ｲｶﾆｹｲｻｲｶﾞﾅｲﾊﾞｱｲ", ("", "", "以下に掲載がない場合")),
+            (
+                "猿払村の次に番地がくる場合",
+                "ｻﾙﾌﾂﾑﾗﾉﾂｷﾞﾆﾊﾞﾝﾁｶﾞｸﾙﾊﾞｱｲ",
+                ("", "", "猿払村の次に番地がくる場合"),
+            ),
+            ("三宅村一円", "ﾐﾔｹﾑﾗｲﾁｴﾝ", ("", "", "三宅村一円")),
+            # A real town called 一円 stays
+            ("一円", "ｲﾁｴﾝ", ("一円", "ｲﾁｴﾝ", None)),
+            (
+                "大通西（１～１９丁目）",
+                "ｵｵﾄﾞｵﾘﾆｼ(1-19ﾁｮｳﾒ)",
+                ("大通西", "ｵｵﾄﾞｵﾘﾆｼ", "１～１９丁目"),
+            ),
+            (
+                "丸の内ＪＰタワー（１階）",
+                "ﾏﾙﾉｳﾁJPﾀﾜｰ(1ｶｲ)",
+                ("丸の内ＪＰタワー１階", "ﾏﾙﾉｳﾁJPﾀﾜｰ1ｶｲ", None),
+            ),
+        ],
+    )
+    def test_clean_town(self, town, kana, expected):
+        """Test placeholders are emptied and annotations split off."""
+        assert generate_db.clean_town(town, kana) == expected
+
+    def test_create_db_cleans_towns(self, tmp_path):
+        """Test lookups return cleaned towns and notes are stored."""
+        path = tmp_path / "ken_all.csv"
+        path.write_text(
+            '01101,"060  ","0600000","ﾎｯｶｲﾄﾞｳ","ｻｯﾎﾟﾛｼﾁｭｳｵｳｸ","ｲｶﾆｹｲｻｲｶﾞﾅｲﾊﾞｱｲ","北海道","札幌市中央区","以下に掲載がない場合",0,0,0,0,0,0\n'
+            '01101,"060  ","0600042","ﾎｯｶｲﾄﾞｳ","ｻｯﾎﾟﾛｼﾁｭｳｵｳｸ","ｵｵﾄﾞｵﾘﾆｼ(1-3ﾁｮｳﾒ)","北海道","札幌市中央区","大通西（１～３丁目）",0,0,1,0,0,0\n'
+            '01408,"048  ","0482331","ﾎｯｶｲﾄﾞｳ","ﾖｲﾁｸﾞﾝﾆｷﾁｮｳ","ｵｵｴ(1ﾁｮｳﾒ､","北海道","余市郡仁木町","大江（１丁目、",0,0,1,0,0,0\n'
+            '01408,"048  ","0482331","ﾎｯｶｲﾄﾞｳ","ﾖｲﾁｸﾞﾝﾆｷﾁｮｳ","2ﾁｮｳﾒ)","北海道","余市郡仁木町","２丁目）",0,0,1,0,0,0\n',
+            encoding="utf-8",
+        )
+        out = str(tmp_path / "out.db")
+        assert generate_db.create_db(str(path), out, snapshot=True) == 3
+        assert [r.town for r in lookup("0600000", db_path=out)] == [""]
+        (row,) = lookup("0600042", db_path=out)
+        assert (row.town, row.town_kana, row.chome) == ("大通西", "ｵｵﾄﾞｵﾘﾆｼ", 1)
+        assert (row.town_note, row.chome_numbers) == ("１～３丁目", [1, 2, 3])
+        for backend in ("sqlite", "memory", "snapshot"):
+            with Zip2AddrService(db_path=out, backend=backend) as service:
+                assert service.lookup("0600042") == [row]
+                assert service.lookup_json("0600042") == json.dumps(
+                    row.to_dict(), ensure_ascii=False
+                ).encode("utf-8")
+        (row,) = lookup("0482331", db_path=out)
+        assert (row.town, row.chome_numbers) == ("大江", [1, 2])
+        with sqlite3.connect(out) as conn:
+            notes = conn.execute(
+                "SELECT zipcode, town_note FROM address ORDER BY zipcode"
+            ).fetchall()
+            assert notes == [
+                ("0482331", "１丁目、２丁目"),
+                ("0600000", "以下に掲載がない場合"),
+                ("0600042", "１～３丁目"),
+            ]
+
+
+class TestCreateDb:
+    """Unit tests for create_db function."""
+
+    def test_create_db(self, csv_path, tmp_path):
+        """Test the generated DB can be looked up."""
+        out = str(tmp_path / "out.db")
+        assert generate_db.create_db(csv_path, out) == 3
+        assert not os.path.exists(out + ".tmp")
+
+        result = lookup("452-0961", db_path=out)
+        assert [r.town for r in result] == ["春日砂賀東", "春日振形"]
+        assert result[0].multiple_town == 1
+        assert result[0].prefecture == "愛知県"
+        assert result[0].city_kana == "ｷﾖｽｼ"
+
+    def test_create_db_service_backends(self, csv_path, tmp_path):
+        """Test both service backends read the v2 schema."""
+        out = str(tmp_path / "out.db")
+        generate_db.create_db(csv_path, out)
+        for backend in ("sqlite", "memory"):
+            with Zip2AddrService(db_path=out, backend=backend) as service:
+                many = service.lookup_many(["4520961", "1000001", "9999999"])
+                assert [[r.town for r in res] for res in many] == [
+                    ["春日砂賀東", "春日振形"],
+                    ["千代田"],
+                    [],
+                ]
+
+    def test_create_db_replaces_existing(self, csv_path, tmp_path):
+        """Test rebuilding replaces the previous contents."""
+        out = str(tmp_path / "out.db")
+        generate_db.create_db(csv_path, out)
+        generate_db.create_db(csv_path, out)
+        with sqlite3.connect(out) as conn:
+            assert conn.execute("SELECT COUNT(*) FROM address").fetchone() == (3,)
+
+    def test_create_db_schema(self, csv_path, tmp_path):
+        """Test the v3 schema factors out prefectures and cities."""
+        out = str(tmp_path / "out.db")
+        generate_db.create_db(csv_path, out)
+        with sqlite3.connect(out) as conn:
+            assert conn.execute("PRAGMA user_version").fetchone() == (3,)
+            assert conn.execute("SELECT COUNT(*) FROM pref").fetchone() == (2,)
+            assert conn.execute("SELECT COUNT(*) FROM city").fetchone() == (2,)
+            rows = conn.execute(
+                "SELECT zipcode, seq, town FROM address WHERE zipcode = '4520961'"
+            ).fetchall()
+            assert rows == [("4520961", 0, "春日砂賀東"), ("4520961", 1, "春日振形")]
+            # the compatibility view keeps the original column layout
+            view = conn.execute(
+                "SELECT jis_code, prefecture, city, town FROM postal WHERE zipcode = '1000001'"
+            ).fetchall()
+            assert view == [("13101", "東京都", "千代田区", "千代田")]
+            plan = " ".join(
+                r[-1]
+                for r in conn.execute(
+                    "EXPLAIN QUERY PLAN SELECT * FROM address WHERE zipcode = ?",
+                    ("1000001",),
+                )
+            )
+            assert "PRIMARY KEY" in plan
+
+    def test_create_db_failure_keeps_existing(self, tmp_path):
+        """Test a failed build leaves the existing DB untouched."""
+        out = tmp_path / "out.db"
+        out.write_bytes(b"old")
+        with pytest.raises(FileNotFoundError):
+            generate_db.create_db(str(tmp_path / "missing.csv"), str(out))
+        assert out.read_bytes() == b"old"
+        assert not os.path.exists(str(out) + ".tmp")
+
+    @pytest.mark.parametrize("search_indexes", [False, True])
+    def test_create_db_search(self, csv_path, tmp_path, search_indexes):
+        """Test search gives the same results with or without name indexes."""
+        out = str(tmp_path / "out.db")
+        generate_db.create_db(csv_path, out, search_indexes=search_indexes)
+        with Zip2AddrService(db_path=out) as service:
+            result = service.search(city="清須市")
+            assert [r.town for r in result] == ["春日砂賀東", "春日振形"]
+            result = service.search(town_kana="ﾊﾙﾋﾌ", prefix=True)
+            assert [r.town for r in result] == ["春日振形"]
+            assert [r.zipcode for r in service.search("45")] == ["4520961"] * 2
+        with sqlite3.connect(out) as conn:
+            indexes = {
+                r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+            }
+        assert "idx_address_city" in indexes
+        assert ("idx_address_town_kana" in indexes) == search_indexes
+
+    def test_create_db_ngram_index(self, csv_path, tmp_path):
+        """Test match loads the stored n-gram index instead of building one."""
+        out = str(tmp_path / "out.db")
+        generate_db.create_db(csv_path, out, ngram_index=True)
+        with sqlite3.connect(out) as conn:
+            assert conn.execute("SELECT COUNT(*) FROM ngram_doc").fetchone() == (3,)
+        with Zip2AddrService(db_path=out) as service:
+            result = service.match("清須市春日砂賀東1-2")
+            assert result[0].address.zipcode == "4520961"
+            assert result[0].address.town == "春日砂賀東"
+            assert service.matcher.load_time is not None
+            assert service.matcher.build_time is None
+
+    def test_create_db_without_ngram_index(self, csv_path, tmp_path):
+        """Test the n-gram index is only stored on request and built on demand."""
+        out = str(tmp_path / "out.db")
+        generate_db.create_db(csv_path, out)
+        with sqlite3.connect(out) as conn:
+            names = {r[0] for r in conn.execute("SELECT name FROM sqlite_master")}
+        assert not {"ngram", "ngram_doc"} & names
+        with Zip2AddrService(db_path=out) as service:
+            assert service.match("清須市春日砂賀東")[0].address.town == "春日砂賀東"
+            assert service.matcher.build_time is not None
+
+    def test_create_db_snapshot(self, csv_path, tmp_path):
+        """Test --snapshot writes a snapshot matching the DB."""
+        out = str(tmp_path / "out.db")
+        generate_db.create_db(csv_path, out, snapshot=True)
+        assert os.path.exists(str(tmp_path / "out.snap"))
+        with Zip2AddrService(db_path=out, backend="snapshot") as service:
+            assert service.lookup("4520961") == lookup("4520961", db_path=out)
+
+    def test_create_db_removes_stale_snapshot(self, csv_path, tmp_path):
+        """Test building without --snapshot removes the previous snapshot."""
+        out = str(tmp_path / "out.db")
+        generate_db.create_db(csv_path, out, snapshot=True)
+        generate_db.create_db(csv_path, out)
+        assert not os.path.exists(str(tmp_path / "out.snap"))
+
+    def test_create_db_build_id(self, csv_path, tmp_path):
+        """Test every build records a new build id."""
+        out = str(tmp_path / "out.db")
+        ids = []
+        for _ in range(2):
+            generate_db.create_db(csv_path, out)
+            with sqlite3.connect(out) as conn:
+                ids.append(read_build_id(conn))
+        assert None not in ids
+        assert ids[0] != ids[1]
+
+    def test_bundled_snapshot_must_match_db(self, csv_path, tmp_path, monkeypatch):
+        """Test lookup() only uses the bundled snapshot of the current DB."""
+        out = str(tmp_path / "out.db")
+        monkeypatch.setattr(api, "_get_db_path", lambda: out)
+        monkeypatch.setattr(api, "_bundled", None)
+        generate_db.create_db(csv_path, out, snapshot=True)
+        assert api._bundled_snapshot() is not None
+        assert len(lookup("1000001")) == 1
+        snap = str(tmp_path / "out.snap")
+        os.rename(snap, snap + ".old")
+        (tmp_path / "new.csv").write_text(KEN_ALL.splitlines()[1], encoding="utf-8")
+        generate_db.create_db(str(tmp_path / "new.csv"), out)
+        # A snapshot of the previous build left next to the rebuilt DB
+        os.rename(snap + ".old", snap)
+        assert api._bundled_snapshot() is None
+        assert lookup("1000001") == []
+        assert [len(r) for r in api.lookup_many(["1000001", "4520961"])] == [0, 1]
+
+    def test_create_db_data_version(self, csv_path, tmp_path):
+        """Test the data version is recorded in the meta table."""
+        out = str(tmp_path / "out.db")
+        generate_db.create_db(csv_path, out, data_version="20241031")
+        with sqlite3.connect(out) as conn:
+            assert read_data_version(conn) == "20241031"
@@ -0,0 +1,99 @@
+"""Import-time regression tests for the package and CLI."""
+
+import os
+import subprocess
+import sys
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+# Wall-clock budgets as multiples of an interpreter that imports nothing,
+# timed in the same run so that slow or busy hosts scale both alike. The
+# CLI's single-lookup path takes about 4.5x and the bare package about 2x.
+CLI_BUDGET = 8
+PACKAGE_BUDGET = 4
+RUNS = 5
+
+
+def _env():
+    # The package is imported from this checkout, as conftest.py does
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [SRC, env.get("PYTHONPATH")]))
+    return env
+
+
+def _importtime(module):
+    """Return {module name: cumulative us} for a fresh ``import module``."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=_env(),
+    )
+    times = {}
+    for line in proc.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        times[parts[2].strip()] = int(parts[1])
+    return times
+
+
+def _best_time(code):
+    """Return the best wall-clock time in seconds of ``python -c code``."""
+    env = _env()
+    best = float("inf")
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], capture_output=True, env=env)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+class TestImportTime:
+    """Tests for lazy imports."""
+
+    def test_package_is_lazy(self):
+        """Test importing the package loads neither the API nor metadata."""
+        modules = _importtime("zip2addr")
+        for name in ("zip2addr.api", "sqlite3", "importlib.metadata"):
+            assert name not in modules
+
+    def test_cli_is_lazy(self):
+        """Test the CLI defers modules a single lookup does not need."""
+        modules = _importtime("zip2addr.cli")
+        for name in (
+            "argparse",
+            "csv",
+            "importlib.metadata",
+            "importlib.resources",
+            "pathlib",
+            "unicodedata",
+            "zip2addr.backends",
+            "zip2addr.cache",
+            "zip2addr.matcher",
+            "zip2addr.shared",
+            "zip2addr.snapshot",
+            "zip2addr.stats",
+        ):
+            assert name not in modules
+
+    def test_lazy_attributes(self):
+        """Test lazily resolved attributes still behave like plain ones."""
+        import zip2addr
+
+        assert isinstance(zip2addr.__version__, str)
+        assert zip2addr.lookup is zip2addr.api.lookup
+        assert "lookup_many" in dir(zip2addr)
+        from zip2addr import api, backends, cache
+
+        assert api.SQLiteBackend is backends.SQLiteBackend
+        assert api.LRUCache is cache.LRUCache
+
+    def test_import_budget(self):
+        """Test the CLI fast path and the package stay within budget."""
+        baseline = _best_time("pass")
+        cli = _best_time("from zip2addr.cli import main; main(['1000001'])")
+        assert cli < CLI_BUDGET * baseline
+        assert _best_time("import zip2addr") < PACKAGE_BUDGET * baseline
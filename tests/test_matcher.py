@@ -0,0 +1,161 @@
+"""Unit tests for zip2addr.matcher."""
+
+import sqlite3
+
+import pytest
+
+from zip2addr.api import Zip2AddrService
+from zip2addr.matcher import (
+    AddressMatcher,
+    address_text,
+    build_index,
+    normalize_address,
+    postings_from_blob,
+    postings_to_blob,
+)
+
+ROWS = [
+    ("0600042", "北海道", "札幌市中央区", "大通西（１～１９丁目）"),
+    ("1000001", "東京都", "千代田区", "千代田"),
+    ("1000004", "東京都", "千代田区", "大手町"),
+    ("1000005", "東京都", "千代田区", "丸の内"),
+    ("1040061", "東京都", "中央区", "銀座"),
+    ("2310000", "神奈川県", "横浜市中区", "以下に掲載がない場合"),
+    ("2310023", "神奈川県", "横浜市中区", "山下町"),
+    ("4520961", "愛知県", "清須市", "春日砂賀東"),
+    ("4520961", "愛知県", "清須市", "春日振形"),
+    ("9960301", "山形県", "最上郡大蔵村", "南山"),
+    ("9998302", "山形県", "最上郡大蔵村", "霞ヶ関"),
+]
+
+
+def _create_match_db(path):
+    conn = sqlite3.connect(str(path))
+    conn.execute(
+        "CREATE TABLE postal (id INTEGER PRIMARY KEY, zipcode TEXT, jis_code TEXT, old_postal_code TEXT, pref_kana TEXT, city_kana TEXT, town_kana TEXT, prefecture TEXT, city TEXT, town TEXT, multiple_postal INTEGER, koaza INTEGER, chome INTEGER, multiple_town INTEGER, update_status INTEGER, change_reason INTEGER)"
+    )
+    conn.executemany(
+        "INSERT INTO postal (zipcode, prefecture, city, town) VALUES (?, ?, ?, ?)",
+        ROWS,
+    )
+    conn.commit()
+    conn.close()
+
+
+class TestNormalize:
+    """Unit tests for address normalization."""
+
+    def test_normalize_address(self):
+        """Test width, variants and street numbers are folded away."""
+        assert normalize_address("東京都千代田区丸の内１丁目２－３") == "東京都千代田区丸ノ内"
+        assert normalize_address("霞ケ関 3-4") == normalize_address("霞ヶ関")
+        assert normalize_address("大手町二丁目") == "大手町"
+        assert normalize_address("山下町12番地") == "山下町"
+
+    def test_address_text(self):
+        """Test KEN_ALL annotations and placeholders are not indexed."""
+        assert address_text("北海道", "札幌市中央区", "大通西（１～１９丁目）") == "北海道札幌市中央区大通西"
+        assert address_text("神奈川県", "横浜市中区", "以下に掲載がない場合") == "神奈川県横浜市中区"
+        assert address_text("東京都", "中央区", None) == "東京都中央区"
+
+    def test_postings_blob_roundtrip(self):
+        """Test postings survive the BLOB encoding."""
+        _, postings = build_index(ROWS)
+        for ids in postings.values():
+            assert postings_from_blob(postings_to_blob(ids)) == ids
+
+
+class TestAddressMatcher:
+    """Unit tests for AddressMatcher."""
+
+    @pytest.fixture
+    def matcher(self):
+        docs, postings = build_index(ROWS)
+        return AddressMatcher(docs, postings)
+
+    def test_ordinal(self, matcher):
+        """Test rows sharing a zipcode are numbered in lookup order."""
+        assert [(d.zipcode, d.ordinal) for d in matcher.docs[7:9]] == [
+            ("4520961", 0),
+            ("4520961", 1),
+        ]
+
+    def test_exact(self, matcher):
+        """Test a full address ranks its row first with score 1."""
+        doc, score = matcher.candidates("東京都千代田区大手町1-1-1")[0]
+        assert doc.zipcode == "1000004"
+        assert score == 1.0
+
+    def test_typo(self, matcher):
+        """Test a mistyped character still finds the row."""
+        (doc, score), *_ = matcher.candidates("愛知県清須市春日振型")
+        assert (doc.zipcode, doc.ordinal) == ("4520961", 1)
+        assert score < 1.0
+
+    def test_partial(self, matcher):
+        """Test addresses without prefecture or with variant spellings match."""
+        assert matcher.candidates("千代田区丸之内")[0][0].zipcode == "1000005"
+        assert matcher.candidates("大蔵村霞が関")[0][0].zipcode == "9998302"
+        assert matcher.candidates("札幌市中央区大通西5丁目")[0][0].zipcode == "0600042"
+
+    def test_no_match(self, matcher):
+        """Test unrelated or empty input returns nothing."""
+        assert matcher.candidates("") == []
+        assert matcher.candidates("xyz") == []
+
+    def test_limit(self, matcher):
+        """Test results are capped and sorted by score."""
+        result = matcher.candidates("東京都千代田区", limit=2)
+        assert len(result) == 2
+        assert result[0][1] >= result[1][1]
+
+    def test_single_bigram(self, matcher):
+        """Test a query too short to pair bigrams still finds rows."""
+        assert matcher.candidates("銀座")[0][0].zipcode == "1040061"
+
+    def test_shared_postings(self, matcher):
+        """Test postings hold one int object per document."""
+        first = [ids[0] for ids in matcher.postings.values() if ids[0] == 1]
+        assert len(first) > 1
+        assert all(i is first[0] for i in first)
+
+
+class TestServiceMatch:
+    """Unit tests for Zip2AddrService.match."""
+
+    def test_match(self, tmp_path):
+        """Test matches resolve to full rows, built in memory without an index."""
+        db = tmp_path / "test.db"
+        _create_match_db(db)
+        with Zip2AddrService(db_path=str(db)) as service:
+            result = service.match("清須市春日振形", limit=1)
+            assert len(result) == 1
+            assert result[0].address.town == "春日振形"
+            assert 0.5 < result[0].score < 1.0
+            assert service.matcher.build_time is not None
+
+    def test_match_legacy_rows_out_of_order(self, tmp_path):
+        """Test rows of a zipcode stored apart still resolve to their own row."""
+        db = tmp_path / "test.db"
+        conn = sqlite3.connect(str(db))
+        conn.execute(
+            "CREATE TABLE postal (id INTEGER PRIMARY KEY, zipcode TEXT, jis_code TEXT, old_postal_code TEXT, pref_kana TEXT, city_kana TEXT, town_kana TEXT, prefecture TEXT, city TEXT, town TEXT, multiple_postal INTEGER, koaza INTEGER, chome INTEGER, multiple_town INTEGER, update_status INTEGER, change_reason INTEGER)"
+        )
+        conn.executemany(
+            "INSERT INTO postal (zipcode, prefecture, city, town) VALUES (?, ?, ?, ?)",
+            [
+                ("1000001", "東京都", "千代田区", "丸の内"),
+                ("1000002", "東京都", "千代田区", "霞が関"),
+                ("1000001", "東京都", "千代田区", "大手町"),
+            ],
+        )
+        conn.commit()
+        conn.close()
+        with Zip2AddrService(db_path=str(db)) as service:
+            result = service.match("東京都千代田区大手町", limit=1)
+            assert result[0].address.town == "大手町"
+
+    def test_match_no_db(self, tmp_path):
+        """Test a missing DB matches nothing."""
+        with Zip2AddrService(db_path=str(tmp_path / "missing.db")) as service:
+            assert service.match("東京都千代田区") == []
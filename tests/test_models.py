@@ -1,6 +1,11 @@
 """Unit tests for zip2addr.models module."""
 
-from zip2addr.models import Zip2Addr
+import dataclasses
+import pickle
+
+import pytest
+
+from zip2addr.models import Zip2Addr, chome_numbers
 
 
 class TestZip2AddrModel:
@@ -43,6 +48,36 @@ class TestZip2AddrModel:
         assert addr.prefecture == "東京都"
         assert addr.city == "千代田区"
         assert addr.town == "千代田"
+        assert addr.town_note is None
+        assert addr.chome_numbers == []
+
+    def test_zip2addr_town_note(self):
+        """Test the town note and the 丁目 numbers it covers."""
+        row = ("0600042",) + (None,) * 7 + ("大通西",) + (None,) * 6 + ("１～３丁目",)
+        addr = Zip2Addr.from_row(row)
+        assert addr.town_note == "１～３丁目"
+        assert addr.chome_numbers == [1, 2, 3]
+        assert addr.to_dict()["town_note"] == "１～３丁目"
+        assert Zip2Addr("0600000", town_note="以下に掲載がない場合").chome_numbers == []
+
+    @pytest.mark.parametrize(
+        "note, expected",
+        [
+            ("１～３丁目", [1, 2, 3]),
+            ("５丁目", [5]),
+            ("１、３～４丁目", [1, 3, 4]),
+            ("１丁目、２丁目", [1, 2]),
+            ("１丁目１番地", []),
+            ("次のビルを除く", []),
+            (None, []),
+        ],
+    )
+    def test_chome_numbers(self, note, expected):
+        """Test 丁目 lists and ranges are expanded."""
+        assert chome_numbers(note) == expected
+        # Parsed notes are cached; callers still get a list of their own
+        chome_numbers(note).append(0)
+        assert chome_numbers(note) == expected
 
     def test_zip2addr_to_dict(self):
         """Test Zip2Addr.to_dict method."""
@@ -107,3 +142,36 @@ class TestZip2AddrModel:
         assert addr.chome == 3
         assert addr.update_status == 1
         assert addr.change_reason == 0
+
+    def test_zip2addr_frozen_and_slotted(self):
+        """Test Zip2Addr is immutable, hashable and has no per-instance dict."""
+        addr = Zip2Addr(zipcode="1000001", prefecture="東京都")
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            addr.prefecture = "大阪府"
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            addr.unknown = 1
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            del addr.unknown
+        assert not hasattr(addr, "__dict__")
+        assert hash(addr) == hash(Zip2Addr(zipcode="1000001", prefecture="東京都"))
+        assert dataclasses.replace(addr, prefecture="大阪府").prefecture == "大阪府"
+
+    def test_zip2addr_from_row_shared(self):
+        """Test identical rows share one instance and repeated strings are interned."""
+        row = ("1000001", "13101", "100", "ﾄｳｷｮｳﾄ", "ﾁﾖﾀﾞｸ", "ﾁﾖﾀﾞ")
+        row += ("".join(["東京", "都"]), "千代田区", "千代田", None, None, None, None, 0, 0)
+        other = tuple(row)
+        other = other[:6] + ("".join(["東", "京都"]),) + other[7:]
+        assert row[6] is not other[6]
+
+        first = Zip2Addr.from_row(row)
+        second = Zip2Addr.from_row(list(other))
+        assert first is second
+        third = Zip2Addr.from_row(row[:8] + ("丸の内",) + row[9:])
+        assert third is not first
+        assert third.prefecture is first.prefecture
+
+    def test_zip2addr_pickle(self):
+        """Test Zip2Addr round-trips through pickle."""
+        addr = Zip2Addr(zipcode="1000001", prefecture="東京都", koaza=1)
+        assert pickle.loads(pickle.dumps(addr)) == addr
@@ -0,0 +1,91 @@
+"""Unit tests for zip2addr.pool module."""
+
+import sqlite3
+import threading
+
+import pytest
+
+from zip2addr.pool import ConnectionPool
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = tmp_path / "test db.db"
+    conn = sqlite3.connect(str(path))
+    conn.execute("CREATE TABLE postal (zipcode TEXT PRIMARY KEY)")
+    conn.execute("INSERT INTO postal VALUES ('1000001')")
+    conn.commit()
+    conn.close()
+    return str(path)
+
+
+class TestConnectionPool:
+    """Unit tests for ConnectionPool class."""
+
+    def test_connection_is_read_only(self, db):
+        """Test pooled connections cannot write."""
+        with ConnectionPool(db) as pool:
+            with pool.connection() as conn:
+                with pytest.raises(sqlite3.OperationalError):
+                    conn.execute("INSERT INTO postal VALUES ('2000002')")
+
+    def test_connection_reused(self, db):
+        """Test released connections are handed out again."""
+        with ConnectionPool(db) as pool:
+            with pool.connection() as first:
+                pass
+            with pool.connection() as second:
+                assert second is first
+
+    def test_idle_connections_bounded(self, db):
+        """Test connections beyond size are closed on release."""
+        with ConnectionPool(db, size=1) as pool:
+            a = pool.acquire()
+            b = pool.acquire()
+            assert a is not b
+            pool.release(a)
+            pool.release(b)
+            assert pool._idle.qsize() == 1
+            with pytest.raises(sqlite3.ProgrammingError):
+                b.execute("SELECT 1")
+
+    def test_close(self, db):
+        """Test close releases idle and in-use connections."""
+        pool = ConnectionPool(db)
+        conn = pool.acquire()
+        pool.close()
+        pool.release(conn)
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+        with pytest.raises(RuntimeError):
+            pool.acquire()
+
+    def test_invalid_size(self, db):
+        """Test pool rejects a non-positive size."""
+        with pytest.raises(ValueError):
+            ConnectionPool(db, size=0)
+
+    def test_threads(self, db):
+        """Test concurrent use from several threads."""
+        errors = []
+
+        with ConnectionPool(db, size=2) as pool:
+
+            def worker():
+                try:
+                    for _ in range(50):
+                        with pool.connection() as conn:
+                            row = conn.execute(
+                                "SELECT zipcode FROM postal WHERE zipcode = ?",
+                                ("1000001",),
+                            ).fetchone()
+                            assert row == ("1000001",)
+                except Exception as e:  # pragma: no cover - reported below
+                    errors.append(e)
+
+            threads = [threading.Thread(target=worker) for _ in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        assert errors == []
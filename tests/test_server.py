@@ -0,0 +1,158 @@
+"""Unit tests for zip2addr.server."""
+
+import http.client
+import json
+import sqlite3
+import threading
+
+import pytest
+
+from zip2addr.api import Zip2AddrService
+from zip2addr.cli import main
+from zip2addr.server import LookupServer
+
+
+@pytest.fixture(params=[None, 2])
+def server(request, db):
+    service = Zip2AddrService(db)
+    server = LookupServer(("127.0.0.1", 0), service, threads=request.param, max_batch=3)
+    thread = threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    service.close()
+
+
+@pytest.fixture
+def conn(server):
+    conn = http.client.HTTPConnection(*server.server_address, timeout=5)
+    yield conn
+    conn.close()
+
+
+def _request(conn, method, path, body=None, headers=None):
+    conn.request(method, path, body=body, headers=headers or {})
+    resp = conn.getresponse()
+    data = resp.read()
+    return resp, json.loads(data) if data else None
+
+
+class TestLookupServer:
+    """Tests for the HTTP endpoints."""
+
+    def test_get(self, conn, server):
+        """Test GET /lookup/{code} returns every row."""
+        resp, data = _request(conn, "GET", "/lookup/452-0961")
+        assert resp.status == 200
+        assert [r["town"] for r in data] == ["春日砂賀東", "春日振形"]
+        assert resp.getheader("ETag") == server.etag
+        assert "max-age=86400" in resp.getheader("Cache-Control")
+
+    def test_keep_alive(self, conn):
+        """Test several requests share one connection."""
+        for code in ("1000001", "4520961", "1000001"):
+            resp, _ = _request(conn, "GET", f"/lookup/{code}")
+            assert resp.status == 200
+            assert not resp.will_close
+        sock = conn.sock
+        _request(conn, "GET", "/lookup/1000001")
+        assert conn.sock is sock
+
+    def test_get_errors(self, conn):
+        """Test unknown, invalid and unrouted requests."""
+        resp, data = _request(conn, "GET", "/lookup/9999999")
+        assert (resp.status, data) == (404, [])
+        resp, data = _request(conn, "GET", "/lookup/123")
+        assert resp.status == 400
+        assert "error" in data
+        resp, _ = _request(conn, "GET", "/nothing")
+        assert resp.status == 404
+
+    def test_etag(self, conn, server):
+        """Test a matching If-None-Match is answered with 304."""
+        resp, data = _request(
+            conn, "GET", "/lookup/1000001", headers={"If-None-Match": server.etag}
+        )
+        assert (resp.status, data) == (304, None)
+        resp, _ = _request(
+            conn, "GET", "/lookup/1000001", headers={"If-None-Match": '"other"'}
+        )
+        assert resp.status == 200
+
+    def test_post(self, conn):
+        """Test POST /lookup answers one list per code, in order."""
+        body = json.dumps(["4520961", "bad", "100-0001"])
+        resp, data = _request(conn, "POST", "/lookup", body=body)
+        assert resp.status == 200
+        assert [[r["town"] for r in rows] for rows in data] == [
+            ["春日砂賀東", "春日振形"],
+            [],
+            ["千代田"],
+        ]
+
+    def test_post_errors(self, conn):
+        """Test malformed and oversized batches are rejected."""
+        resp, _ = _request(conn, "POST", "/lookup", body="{")
+        assert resp.status == 400
+        resp, _ = _request(conn, "POST", "/lookup", body=json.dumps([1, 2]))
+        assert resp.status == 400
+        resp, _ = _request(conn, "POST", "/lookup", body=json.dumps(["1"] * 4))
+        assert resp.status == 413
+        # The connection is still usable after errors
+        resp, _ = _request(conn, "GET", "/lookup/1000001")
+        assert resp.status == 200
+
+    def test_healthz(self, conn, server):
+        """Test /healthz reports the data version."""
+        resp, data = _request(conn, "GET", "/healthz")
+        assert data == {"status": "ok", "data_version": server.data_version}
+
+
+class TestDataVersion:
+    """Tests for the data version reported by the server."""
+
+    def test_data_version(self, db):
+        """Test /healthz and the ETag use the version recorded in the DB."""
+        with Zip2AddrService(db) as service:
+            server = LookupServer(("127.0.0.1", 0), service)
+            try:
+                # The build date, or without a meta table a token for the file
+                token = server.data_version
+                assert token and server.etag.startswith(f'"{token}-')
+                conn = sqlite3.connect(db)
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO meta VALUES ('data_version', '20241031')"
+                )
+                conn.execute("INSERT OR REPLACE INTO meta VALUES ('build_id', 'a')")
+                conn.commit()
+                service.reload()
+                assert server.data_version == "20241031"
+                assert server.etag == '"20241031-a"'
+                # Rebuilt from the same data
+                conn.execute("UPDATE meta SET value = 'b' WHERE key = 'build_id'")
+                conn.commit()
+                conn.close()
+                service.reload()
+                assert server.data_version == "20241031"
+                assert server.etag == '"20241031-b"'
+            finally:
+                server.server_close()
+
+
+class TestServeCLI:
+    """Tests for `zip2addr serve` argument handling."""
+
+    def test_help(self, capsys):
+        """Test the serve subcommand has its own options."""
+        with pytest.raises(SystemExit):
+            main(["serve", "--help"])
+        assert "--processes" in capsys.readouterr().out
+
+    def test_bad_threads(self):
+        """Test invalid worker counts are rejected."""
+        with pytest.raises(SystemExit):
+            main(["serve", "--threads", "0"])
@@ -0,0 +1,162 @@
+"""Unit tests for zip2addr.shared."""
+
+import ctypes
+import multiprocessing
+import os
+import re
+import sqlite3
+
+import pytest
+
+from zip2addr import shared
+from zip2addr.api import Zip2AddrService
+from zip2addr.snapshot import snapshot_path, write_snapshot
+
+
+def _ken_all(rows):
+    return "".join(
+        f'13101,"100  ","{1000000 + i * 7:07d}","ﾄｳｷｮｳﾄ","ｼ","ﾁｮｳ{i}",'
+        f'"東京都","市{i // 50}","町{i}",0,0,0,0,0,0\n'
+        for i in range(rows)
+    )
+
+
+def _set_build_id(path, build_id):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+    conn.execute("INSERT OR REPLACE INTO meta VALUES ('build_id', ?)", (build_id,))
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture
+def db(make_db):
+    path = make_db(_ken_all(3))
+    yield path
+    shared.release(path)
+
+
+class TestSharedBackend:
+    """Unit tests for the "shared" backend and preload()."""
+
+    def test_lookup(self, db):
+        """Test lookups match the sqlite backend."""
+        with Zip2AddrService(db) as expected:
+            with Zip2AddrService(db, backend="shared") as service:
+                for code in ["1000000", "1000007", "1000014", "9999999", "bad"]:
+                    assert service.lookup(code) == expected.lookup(code)
+                assert service.lookup_many(["1000007", "x"]) == [
+                    expected.lookup("1000007"),
+                    [],
+                ]
+
+    def test_preload_once(self, db):
+        """Test services in a process share the preloaded index."""
+        snapshot = shared.preload(db)
+        assert shared.preload(db) is snapshot
+        with Zip2AddrService(db, backend="shared") as service:
+            assert service.backend.snapshot is snapshot
+        # Closing a service leaves the index usable
+        assert len(snapshot.get("1000007")) == 1
+
+    def test_preload_reads_snapshot_file(self, db, monkeypatch):
+        """Test a snapshot next to the DB is used instead of building one."""
+        _set_build_id(db, "a" * 32)
+        write_snapshot(db)
+        monkeypatch.setattr(shared, "build_snapshot", None)
+        assert shared.preload(db).n_records == 3
+
+    def test_preload_ignores_stale_snapshot(self, db, make_db):
+        """Test a snapshot of an earlier build of the DB is not used."""
+        _set_build_id(db, "a" * 32)
+        write_snapshot(db)
+        with open(snapshot_path(db), "rb") as fh:
+            stale = fh.read()
+        make_db(_ken_all(2))
+        _set_build_id(db, "b" * 32)
+        with open(snapshot_path(db), "wb") as fh:
+            fh.write(stale)
+        assert shared.preload(db).n_records == 2
+
+    def test_release(self, db):
+        """Test release() makes the next preload load the DB again."""
+        snapshot = shared.preload(db)
+        with Zip2AddrService(db, backend="shared") as service:
+            service.lookup("1000000")
+            shared.release(db)
+            assert shared.preload(db) is not snapshot
+            # The old index stays mapped for the backend still using it
+            assert len(service.lookup("1000000")) == 1
+
+
+def _mapping_pss(mm) -> int:
+    """Proportional set size in bytes of the mapping holding ``mm``."""
+    buf = ctypes.c_char.from_buffer(mm)
+    start = ctypes.addressof(buf)
+    del buf
+    inside = False
+    with open("/proc/self/smaps") as fh:
+        for line in fh:
+            if re.match(r"[0-9a-f]+-[0-9a-f]+ ", line):
+                inside = int(line.split("-", 1)[0], 16) == start
+            elif inside and line.startswith("Pss:"):
+                return int(line.split()[1]) * 1024
+    raise AssertionError("mapping not found")
+
+
+def _worker(db, private, barrier, results):
+    if private:
+        # Forget the inherited index, so this worker loads its own copy
+        shared.release(db)
+    with Zip2AddrService(db, backend="shared") as service:
+        snapshot = service.backend.snapshot
+        rows = sum(len(r) for _, r in snapshot.iter_from())
+        barrier.wait()
+        results.put((rows, _mapping_pss(snapshot._mm)))
+        # Keep the mapping until every worker has measured
+        barrier.wait()
+
+
+@pytest.mark.skipif(
+    not os.path.exists("/proc/self/smaps") or not hasattr(os, "fork"),
+    reason="needs fork() and /proc/self/smaps",
+)
+class TestSharedMemory:
+    """Memory used by forked workers reading the index."""
+
+    WORKERS = 4
+    ROWS = 40000
+
+    def _total_pss(self, db, private):
+        ctx = multiprocessing.get_context("fork")
+        barrier = ctx.Barrier(self.WORKERS)
+        results = ctx.Queue()
+        procs = [
+            ctx.Process(target=_worker, args=(db, private, barrier, results))
+            for _ in range(self.WORKERS)
+        ]
+        for p in procs:
+            p.start()
+        measured = [results.get(timeout=60) for _ in procs]
+        for p in procs:
+            p.join(timeout=60)
+            assert p.exitcode == 0
+        assert all(rows == self.ROWS for rows, _ in measured)
+        return sum(pss for _, pss in measured)
+
+    def test_workers_share_one_copy(self, make_db):
+        """Test N workers together hold about one copy of the index.
+
+        PSS charges each page to the processes mapping it in equal parts, so
+        its sum over the workers is the memory they use between them (RSS
+        would count a shared page once per worker).
+        """
+        db = make_db(_ken_all(self.ROWS), "big.db")
+        try:
+            size = len(shared.preload(db)._mm)
+            shared_total = self._total_pss(db, private=False)
+            private_total = self._total_pss(db, private=True)
+        finally:
+            shared.release(db)
+        assert shared_total < 1.1 * size
+        assert private_total > 0.9 * self.WORKERS * size
@@ -0,0 +1,97 @@
+"""Unit tests for zip2addr.snapshot."""
+
+import pytest
+
+from zip2addr.api import Zip2AddrService, lookup
+from zip2addr.snapshot import Snapshot, snapshot_path, write_snapshot
+
+CHIYODA = (
+    '13101,"100  ","1000001","ﾄｳｷｮｳﾄ","ﾁﾖﾀﾞｸ","ﾁﾖﾀﾞ","東京都","千代田区","千代田",0,0,0,0,0,0\n'
+)
+
+
+class TestSnapshot:
+    """Unit tests for write_snapshot and Snapshot."""
+
+    def test_roundtrip(self, db):
+        """Test every zipcode reads back the same rows as the DB."""
+        assert write_snapshot(db) == 4
+        with Snapshot(snapshot_path(db)) as snap:
+            assert (snap.n_keys, snap.n_records) == (3, 4)
+            for code in ("0600000", "1000001", "4520961"):
+                assert list(snap.get(code)) == lookup(code, db_path=db)
+            assert [r.town for r in snap.get("4520961")] == ["春日砂賀東", "春日振形"]
+
+    def test_nulls(self, db):
+        """Test NULL strings and flags stay None."""
+        write_snapshot(db)
+        with Snapshot(snapshot_path(db)) as snap:
+            (row,) = snap.get("0600000")
+            (other,) = snap.get("1000001")
+        assert row.multiple_town is None
+        assert row.change_reason is None
+        assert row.prefecture == "北海道"
+        assert other.town_note is None
+        assert other.multiple_town == 0
+
+    def test_missing_keys(self, db):
+        """Test codes outside or between stored keys return nothing."""
+        write_snapshot(db)
+        with Snapshot(snapshot_path(db)) as snap:
+            for code in ("0000000", "1000000", "4520962", "9999999", "１"):
+                assert snap.get(code) == ()
+            assert snap.get_many(["1000001", "2000000"]).keys() == {"1000001"}
+
+    def test_iter_from(self, db):
+        """Test prefix iteration stays within the prefix, in zipcode order."""
+        write_snapshot(db)
+        with Snapshot(snapshot_path(db)) as snap:
+            assert [k for k, _ in snap.iter_from("")] == ["0600000", "1000001", "4520961"]
+            assert [k for k, _ in snap.iter_from("45")] == ["4520961"]
+            assert list(snap.iter_from("5")) == []
+
+    def test_not_a_snapshot(self, db, tmp_path):
+        """Test other files are rejected."""
+        with pytest.raises(ValueError):
+            Snapshot(db)
+        empty = tmp_path / "empty.snap"
+        empty.write_bytes(b"")
+        with pytest.raises(ValueError):
+            Snapshot(str(empty))
+
+    def test_snapshot_path(self):
+        """Test the snapshot sits next to the DB."""
+        assert snapshot_path("/data/zip2addr.db") == "/data/zip2addr.snap"
+        assert snapshot_path("/data/zip2addr.snap") == "/data/zip2addr.snap"
+
+
+class TestSnapshotBackend:
+    """Unit tests for the service's snapshot backend."""
+
+    def test_service(self, db):
+        """Test lookups through the snapshot backend."""
+        write_snapshot(db)
+        with Zip2AddrService(db_path=db, backend="snapshot") as service:
+            assert [r.town for r in service.lookup("452-0961")] == ["春日砂賀東", "春日振形"]
+            many = service.lookup_many(["1000001", "bad", "9999999"])
+            assert [[r.town for r in res] for res in many] == [["千代田"], [], []]
+            assert service.backend.records == 4
+            assert service.cache_info().maxsize == 0
+
+    def test_service_ignores_stale_snapshot(self, db, make_db):
+        """Test a snapshot of an earlier build of the DB is not used."""
+        write_snapshot(db)
+        with open(snapshot_path(db), "rb") as fh:
+            stale = fh.read()
+        make_db(CHIYODA)
+        with open(snapshot_path(db), "wb") as fh:
+            fh.write(stale)
+        with Zip2AddrService(db_path=db, backend="snapshot") as service:
+            assert service.backend.records == 1
+            assert service.lookup("4520961") == []
+            assert [r.town for r in service.lookup("1000001")] == ["千代田"]
+
+    def test_service_missing_snapshot(self, db):
+        """Test a DB without a snapshot behaves like a missing DB."""
+        with Zip2AddrService(db_path=db, backend="snapshot") as service:
+            assert service.lookup("1000001") == []
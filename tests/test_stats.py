@@ -0,0 +1,102 @@
+"""Unit tests for zip2addr.stats and service instrumentation."""
+
+import json
+
+import pytest
+
+from zip2addr.api import Zip2AddrService
+from zip2addr.snapshot import write_snapshot
+from zip2addr.stats import Histogram, ServiceStats
+
+
+class TestHistogram:
+    """Unit tests for Histogram."""
+
+    def test_buckets(self):
+        """Test observations land in cumulative buckets by upper bound."""
+        hist = Histogram((0.001, 0.01))
+        for v in (0.0005, 0.001, 0.005, 2.0):
+            hist.observe(v)
+        data = hist.to_dict()
+        assert data["count"] == 4
+        assert data["sum"] == pytest.approx(2.0065)
+        assert data["buckets"] == {"0.001": 2, "0.01": 3, "+Inf": 4}
+
+
+class TestServiceStats:
+    """Unit tests for ServiceStats."""
+
+    def test_counters_and_timings(self):
+        """Test counters, timings and reset."""
+        stats = ServiceStats()
+        stats.incr("lookups")
+        stats.incr("rows", 3)
+        stats.observe("query", 1e-4)
+        assert stats.counter("rows") == 3
+        assert stats.timing("query").count == 1
+        data = stats.to_dict()
+        assert data["counters"] == {"lookups": 1, "rows": 3}
+        json.dumps(data)
+        stats.reset()
+        assert stats.to_dict() == {"counters": {}, "timings": {}}
+
+    def test_subscribe(self):
+        """Test hooks receive every timing."""
+        stats = ServiceStats()
+        seen = []
+        stats.subscribe(lambda stage, seconds: seen.append(stage))
+        stats.observe("query", 1e-4)
+        stats.observe("convert", 1e-5)
+        assert seen == ["query", "convert"]
+
+
+class TestServiceInstrumentation:
+    """Tests for the stats recorded by Zip2AddrService."""
+
+    def test_disabled_by_default(self, db):
+        """Test the service records nothing unless asked to."""
+        with Zip2AddrService(db_path=db) as service:
+            service.lookup("1000001")
+            assert service.stats is None
+            assert service.backend.service_stats is None
+
+    def test_sqlite_stages(self, db):
+        """Test lookups record per-stage timings and cache counters."""
+        with Zip2AddrService(db_path=db, stats=True) as service:
+            service.lookup("452-0961")
+            service.lookup("4520961")
+            service.lookup("bad")
+            data = service.stats.to_dict()
+        assert data["counters"] == {
+            "lookups": 3,
+            "invalid": 1,
+            "cache_misses": 1,
+            "cache_hits": 1,
+            "rows": 4,
+        }
+        for stage in ("normalize", "acquire", "query", "convert"):
+            assert data["timings"][stage]["count"] == (3 if stage == "normalize" else 1)
+        assert data["timings"]["lookup"]["count"] == 2
+
+    def test_lookup_many(self, db):
+        """Test lookup_many records codes, rows and cache counters."""
+        stats = ServiceStats()
+        with Zip2AddrService(db_path=db, stats=stats) as service:
+            service.lookup_many(["1000001", "4520961", "1000001", "9999999"])
+            service.lookup_many(["1000001"])
+        assert stats.counter("lookup_many_codes") == 5
+        assert stats.counter("rows") == 5
+        assert stats.counter("cache_misses") == 3
+        assert stats.counter("cache_hits") == 1
+        assert stats.timing("lookup_many").count == 2
+
+    @pytest.mark.parametrize("backend", ["memory", "snapshot"])
+    def test_other_backends(self, db, backend):
+        """Test backends without a pool record query time only."""
+        write_snapshot(db)
+        with Zip2AddrService(db_path=db, backend=backend, stats=True) as service:
+            service.lookup("1000001")
+            data = service.stats.to_dict()
+        assert data["timings"]["query"]["count"] == 1
+        assert "acquire" not in data["timings"]
+        assert "cache_hits" not in data["counters"]
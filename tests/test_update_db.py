@@ -0,0 +1,233 @@
+"""Unit tests for scripts/update_db.py."""
+
+import importlib.util
+import os
+import shutil
+import sqlite3
+import time
+
+import pytest
+
+from zip2addr import shared
+from zip2addr.api import Zip2AddrService, lookup
+from zip2addr.schema import read_data_version
+from zip2addr.snapshot import Snapshot, snapshot_path
+
+SCRIPTS = os.path.join(os.path.dirname(__file__), "..", "scripts")
+
+
+def _load(name):
+    spec = importlib.util.spec_from_file_location(
+        name, os.path.join(SCRIPTS, name + ".py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+generate_db = _load("generate_db")
+update_db = _load("update_db")
+
+KEN_ALL = (
+    '13101,"100  ","1000001","ﾄｳｷｮｳﾄ","ﾁﾖﾀﾞｸ","ﾁﾖﾀﾞ","東京都","千代田区","千代田",0,0,0,0,0,0\n'
+    '23233,"452  ","4520961","ｱｲﾁｹﾝ","ｷﾖｽｼ","ﾊﾙﾋｻｶﾞﾋｶﾞｼ","愛知県","清須市","春日砂賀東",0,0,0,1,0,0\n'
+    '23233,"452  ","4520961","ｱｲﾁｹﾝ","ｷﾖｽｼ","ﾊﾙﾋﾌﾘｶﾀ","愛知県","清須市","春日振形",0,0,0,1,0,0\n'
+)
+DEL = (
+    '23233,"452  ","4520961","ｱｲﾁｹﾝ","ｷﾖｽｼ","ﾊﾙﾋｻｶﾞﾋｶﾞｼ","愛知県","清須市","春日砂賀東",0,0,0,1,0,0\n'
+)
+ADD = (
+    '01101,"060  ","0600000","ﾎｯｶｲﾄﾞｳ","ｻｯﾎﾟﾛｼﾁｭｳｵｳｸ","ｲｶﾆｹｲｻｲｶﾞﾅｲﾊﾞｱｲ","北海道","札幌市中央区","以下に掲載がない場合",0,0,0,0,1,0\n'
+    '23233,"452  ","4520961","ｱｲﾁｹﾝ","ｷﾖｽｼ","ﾊﾙﾋｻｶﾞﾆｼ","愛知県","清須市","春日砂賀西",0,0,0,1,1,0\n'
+)
+
+
+@pytest.fixture
+def db(tmp_path):
+    csv_path = tmp_path / "utf_ken_all.csv"
+    csv_path.write_text(KEN_ALL, encoding="utf-8")
+    out = str(tmp_path / "zip2addr.db")
+    generate_db.create_db(str(csv_path), out, data_version="20240930")
+    return out
+
+
+@pytest.fixture
+def diff(tmp_path):
+    add = tmp_path / "utf_add_2410.csv"
+    add.write_text(ADD, encoding="utf-8")
+    delete = tmp_path / "utf_del_2410.csv"
+    delete.write_text(DEL, encoding="utf-8")
+    return str(add), str(delete)
+
+
+def _data_version(path):
+    with sqlite3.connect(path) as conn:
+        return read_data_version(conn)
+
+
+class TestApplyDiff:
+    """Unit tests for apply_diff function."""
+
+    def test_apply_diff(self, db, diff):
+        """Test deletions and additions are applied and the version recorded."""
+        assert update_db.apply_diff(db, *diff, data_version="20241031") == (2, 1)
+        assert not os.path.exists(db + ".tmp")
+        assert _data_version(db) == "20241031"
+
+        assert [r.town for r in lookup("4520961", db_path=db)] == [
+            "春日振形",
+            "春日砂賀西",
+        ]
+        (row,) = lookup("0600000", db_path=db)
+        assert (row.prefecture, row.city, row.update_status) == ("北海道", "札幌市中央区", 1)
+        assert len(lookup("1000001", db_path=db)) == 1
+
+    def test_unmatched_deletion(self, db, tmp_path, capsys):
+        """Test deleted rows missing from the DB are counted, not fatal."""
+        delete = tmp_path / "utf_del.csv"
+        delete.write_text(DEL.replace("春日砂賀東", "存在しない"), encoding="utf-8")
+        assert update_db.apply_diff(db, del_csv=str(delete)) == (0, 0)
+        assert "1 deleted row(s) not found" in capsys.readouterr().err
+        assert len(lookup("4520961", db_path=db)) == 2
+
+    def test_prunes_unused_cities(self, db, tmp_path):
+        """Test cities and prefectures left without addresses are removed."""
+        delete = tmp_path / "utf_del.csv"
+        delete.write_text(KEN_ALL.splitlines()[0] + "\n", encoding="utf-8")
+        update_db.apply_diff(db, del_csv=str(delete))
+        with sqlite3.connect(db) as conn:
+            assert conn.execute("SELECT name FROM pref").fetchall() == [("愛知県",)]
+            assert conn.execute("SELECT name FROM city").fetchall() == [("清須市",)]
+
+    def test_rebuilds_ngram_index(self, tmp_path, diff):
+        """Test added rows can be found by Zip2AddrService.match."""
+        csv_path = tmp_path / "utf_ken_all.csv"
+        csv_path.write_text(KEN_ALL, encoding="utf-8")
+        db = str(tmp_path / "zip2addr.db")
+        generate_db.create_db(str(csv_path), db, ngram_index=True)
+        update_db.apply_diff(db, *diff)
+        with sqlite3.connect(db) as conn:
+            assert conn.execute("SELECT COUNT(*) FROM ngram_doc").fetchone() == (4,)
+        with Zip2AddrService(db) as service:
+            assert service.match("清須市春日砂賀西")[0].address.town == "春日砂賀西"
+            assert all(
+                m.address.town != "春日砂賀東" for m in service.match("春日砂賀東")
+            )
+
+    def test_rewrites_snapshot(self, db, diff):
+        """Test an existing snapshot is rewritten from the updated DB."""
+        generate_db.write_snapshot(db)
+        update_db.apply_diff(db, *diff)
+        with Snapshot(snapshot_path(db)) as snap:
+            assert [r.town for r in snap.get("4520961")] == ["春日振形", "春日砂賀西"]
+
+    def test_bad_file_leaves_db_unchanged(self, db, diff):
+        """Test a missing diff file fails before the DB is touched."""
+        with pytest.raises(FileNotFoundError):
+            update_db.apply_diff(db, diff[0], db + ".missing")
+        assert _data_version(db) == "20240930"
+        assert len(lookup("4520961", db_path=db)) == 2
+
+    def test_legacy_db_rejected(self, tmp_path, diff):
+        """Test DBs with the legacy postal table are not updated."""
+        path = str(tmp_path / "legacy.db")
+        with sqlite3.connect(path) as conn:
+            conn.execute("CREATE TABLE postal (zipcode TEXT)")
+        with pytest.raises(ValueError, match="schema version 0"):
+            update_db.apply_diff(path, *diff)
+
+
+class TestReload:
+    """Unit tests for Zip2AddrService.reload and watch."""
+
+    @pytest.mark.parametrize("backend", ["sqlite", "memory", "snapshot", "shared"])
+    def test_reload_picks_up_update(self, db, diff, backend):
+        """Test a running service sees updated data after reload()."""
+        generate_db.write_snapshot(db)
+        with Zip2AddrService(db, backend=backend) as service:
+            assert len(service.lookup("4520961")) == 2
+            assert service.lookup("0600000") == []
+            assert service.data_version == "20240930"
+            update_db.apply_diff(db, *diff, data_version="20241031")
+            # Still the old file until reloaded
+            assert service.lookup("0600000") == []
+            assert service.data_version == "20240930"
+            service.reload()
+            assert [r.town for r in service.lookup("4520961")] == [
+                "春日振形",
+                "春日砂賀西",
+            ]
+            assert len(service.lookup("0600000")) == 1
+            assert service.data_version == "20241031"
+        shared.release(db)
+
+    def test_old_backend_outlives_reload(self, db, diff):
+        """Test lookups holding the old backend finish on the old data."""
+        generate_db.write_snapshot(db)
+        with Zip2AddrService(db, backend="snapshot") as service:
+            old = service.backend
+            update_db.apply_diff(db, *diff)
+            service.reload()
+            assert service.backend is not old
+            # Not unmapped under a lookup still using it
+            assert len(old.get("4520961")) == 2
+            assert len(service.backend.get("4520961")) == 2
+
+    def test_reload_clears_caches(self, db, diff):
+        """Test results cached before a reload are not served after it."""
+        with Zip2AddrService(db) as service:
+            assert service.lookup("0600000") == []
+            assert service.lookup_json("0600000") == b"null"
+            update_db.apply_diff(db, *diff)
+            service.reload()
+            assert len(service.lookup("0600000")) == 1
+            assert service.lookup_json("0600000") != b"null"
+
+    def test_reload_other_path(self, db, diff, tmp_path):
+        """Test reload() can switch to another DB file."""
+        new_db = str(tmp_path / "new.db")
+        shutil.copyfile(db, new_db)
+        update_db.apply_diff(new_db, *diff, data_version="20241031")
+        with Zip2AddrService(db) as service:
+            assert service.lookup("0600000") == []
+            service.reload(new_db)
+            assert service.db_path == new_db
+            assert service.data_version == "20241031"
+            assert len(service.lookup("0600000")) == 1
+
+    def test_watch(self, db, diff):
+        """Test a watched service reloads once the DB is replaced."""
+        with Zip2AddrService(db) as service:
+            assert service.lookup("0600000") == []
+            service.watch(0.01)
+            update_db.apply_diff(db, *diff, data_version="20241031")
+            deadline = time.monotonic() + 5
+            while service.data_version != "20241031":
+                assert time.monotonic() < deadline, "not reloaded"
+                time.sleep(0.01)
+            assert len(service.lookup("0600000")) == 1
+            watcher = service._watcher
+        # close() stops the thread
+        assert watcher is not None and watcher.is_set()
+        with pytest.raises(ValueError):
+            service.watch(0)
+
+
+class TestCleanedRows:
+    """Unit tests for diffs touching rows cleaned at build time."""
+
+    ROW = (
+        '01101,"060  ","0600042","ﾎｯｶｲﾄﾞｳ","ｻｯﾎﾟﾛｼﾁｭｳｵｳｸ","ｵｵﾄﾞｵﾘﾆｼ(1-3ﾁｮｳﾒ)",'
+        '"北海道","札幌市中央区","大通西（１～３丁目）",0,0,1,0,0,0\n'
+    )
+
+    def test_add_and_delete_annotated_row(self, db, tmp_path):
+        """Test raw diff rows are cleaned the same way as at build time."""
+        add = tmp_path / "add.csv"
+        add.write_text(self.ROW, encoding="utf-8")
+        update_db.apply_diff(db, add_csv=str(add))
+        (row,) = lookup("0600042", db_path=db)
+        assert (row.town, row.chome_numbers) == ("大通西", [1, 2, 3])
+
+        update_db.apply_diff(db, del_csv=str(add))
+        assert lookup("0600042", db_path=db) == []